@@ -0,0 +1,362 @@
+import gzip
+import hashlib  # Datos deterministas a partir de IDs y consultas
+import json
+import random  # Latencia variable y errores inyectados
+import re
+import threading
+import time
+from contextlib import contextmanager
+from copy import deepcopy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import clientes_service
+
+
+VIDEOS_POR_CANAL = 500  # Largo de la playlist de subidas de cada canal simulado
+
+
+def _numero(texto):
+    """Entero estable derivado de un texto (mismo ID -> mismos datos en cada corrida)"""
+    return int.from_bytes(hashlib.md5(texto.encode()).digest()[:6], 'big')
+
+
+def item_video(video_id, partes):
+    """Item sintético de videos.list con la forma de las respuestas reales, solo con las partes pedidas"""
+    numero = _numero(video_id)
+    item = {'kind': 'youtube#video', 'etag': f"e{numero:x}", 'id': video_id}
+    if 'snippet' in partes:
+        canal = f"UC{numero % 200:022d}"
+        item['snippet'] = {
+            'publishedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1_500_000_000 + numero % 250_000_000)),
+            'channelId': canal,
+            'title': f"Video simulado {video_id}",
+            'description': 'Descripción simulada de un video de prueba. ' * 8,
+            'thumbnails': {
+                calidad: {'url': f"https://i.ytimg.com/vi/{video_id}/{calidad}.jpg", 'width': ancho, 'height': alto}
+                for calidad, ancho, alto in (('default', 120, 90), ('medium', 320, 180), ('high', 480, 360))
+            },
+            'channelTitle': f"Canal simulado {numero % 200}",
+            'tags': ['django', 'python', 'simulado'][:numero % 4],
+            'categoryId': '28',
+            'liveBroadcastContent': 'none',
+        }
+    if 'contentDetails' in partes:
+        horas = numero % 3
+        item['contentDetails'] = {
+            'duration': f"PT{f'{horas}H' if horas else ''}{numero % 60}M{numero % 59}S",
+            'dimension': '2d',
+            'definition': 'hd',
+            'caption': 'false',
+        }
+    if 'statistics' in partes:
+        item['statistics'] = {
+            'viewCount': str(numero % 5_000_000),
+            'likeCount': str(numero % 50_000),
+            'favoriteCount': '0',
+            'commentCount': str(numero % 2_000),
+        }
+    return item
+
+
+def _pagina(total, por_pagina, token):
+    """Rango de la página pedida y el token de la siguiente (None si es la última)"""
+    inicio = int(token) if token else 0
+    fin = min(inicio + por_pagina, total)
+    return range(inicio, fin), (str(fin) if fin < total else None)
+
+
+def respuesta_search(params):
+    """search.list: IDs estables por consulta, paginados hasta 500 resultados como la API real"""
+    por_pagina = int(params.get('maxResults', 5))
+    indices, siguiente = _pagina(500, por_pagina, params.get('pageToken'))
+    semilla = _numero(params.get('q', '')) % 1_000_000
+    items = [
+        {'kind': 'youtube#searchResult', 'id': {'kind': 'youtube#video', 'videoId': f"sim{semilla:06d}{indice:04d}"}}
+        for indice in indices
+    ]
+    if 'snippet' in params.get('part', ''):
+        for item in items:
+            item['snippet'] = item_video(item['id']['videoId'], 'snippet')['snippet']
+    respuesta = {'kind': 'youtube#searchListResponse', 'pageInfo': {'totalResults': 500}, 'items': items}
+    if siguiente:
+        respuesta['nextPageToken'] = siguiente
+    return respuesta
+
+
+def respuesta_videos(params):
+    """videos.list: un item por ID pedido (los IDs que empiezan con 'borrado' no existen)"""
+    partes = set(params.get('part', '').split(','))
+    ids = [video_id for video_id in params.get('id', '').split(',') if video_id and not video_id.startswith('borrado')]
+    return {'kind': 'youtube#videoListResponse', 'items': [item_video(video_id, partes) for video_id in ids]}
+
+
+def respuesta_channels(params):
+    """channels.list: la playlist de subidas es UU + el ID del canal sin 'UC'"""
+    return {'kind': 'youtube#channelListResponse', 'items': [
+        {'id': canal, 'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + canal[2:]}}}
+        for canal in params.get('id', '').split(',') if canal
+    ]}
+
+
+def respuesta_playlist_items(params):
+    """playlistItems.list: VIDEOS_POR_CANAL subidas por canal, de la más reciente a la más vieja"""
+    playlist = params.get('playlistId', '')
+    indices, siguiente = _pagina(VIDEOS_POR_CANAL, int(params.get('maxResults', 5)), params.get('pageToken'))
+    respuesta = {'kind': 'youtube#playlistItemListResponse', 'items': [
+        {'contentDetails': {'videoId': f"pl{_numero(playlist) % 100_000:05d}{indice:04d}"}} for indice in indices
+    ]}
+    if siguiente:
+        respuesta['nextPageToken'] = siguiente
+    return respuesta
+
+
+def parsear_fields(texto):
+    """
+    Árbol de selección del parámetro fields (respuesta parcial)
+
+    'items(id,snippet(title,thumbnails/high/url)),nextPageToken' ->
+    {'items': {'id': None, 'snippet': {...}}, 'nextPageToken': None};
+    None en una hoja significa "el valor completo".
+    """
+    def elemento(i):
+        fin = i
+        while fin < len(texto) and texto[fin] not in ',()/':
+            fin += 1
+        nombre = texto[i:fin].strip()
+        if fin < len(texto) and texto[fin] == '/':
+            hijo, subarbol, fin = elemento(fin + 1)
+            return nombre, {hijo: subarbol}, fin
+        if fin < len(texto) and texto[fin] == '(':
+            subarbol, fin = lista(fin + 1)
+            if fin >= len(texto) or texto[fin] != ')':
+                raise ValueError(f"fields inválido: {texto}")
+            return nombre, subarbol, fin + 1
+        return nombre, None, fin
+
+    def lista(i):
+        arbol = {}
+        while True:
+            nombre, subarbol, i = elemento(i)
+            arbol[nombre] = _unir(arbol[nombre], subarbol) if nombre in arbol else subarbol
+            if i < len(texto) and texto[i] == ',':
+                i += 1
+                continue
+            return arbol, i
+
+    arbol, fin = lista(0)
+    if fin != len(texto):
+        raise ValueError(f"fields inválido: {texto}")
+    return arbol
+
+
+def _unir(arbol, otro):
+    """Une dos selecciones del mismo campo ('a/b' y 'a/c' -> a(b,c))"""
+    if arbol is None or otro is None:
+        return None
+    unido = dict(arbol)
+    for nombre, subarbol in otro.items():
+        unido[nombre] = _unir(unido[nombre], subarbol) if nombre in unido else subarbol
+    return unido
+
+
+def aplicar_fields(datos, arbol):
+    """Deja en `datos` solo lo seleccionado por `arbol` (las listas se filtran elemento a elemento)"""
+    if arbol is None:
+        return datos
+    if isinstance(datos, list):
+        return [aplicar_fields(elemento, arbol) for elemento in datos]
+    if isinstance(datos, dict):
+        return {clave: aplicar_fields(valor, arbol[clave]) for clave, valor in datos.items() if clave in arbol}
+    return datos
+
+
+RESPUESTAS = {
+    'search': respuesta_search,
+    'videos': respuesta_videos,
+    'channels': respuesta_channels,
+    'playlistItems': respuesta_playlist_items,
+}
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    """Atiende las rutas de la API de datos y del protocolo de subida resumable"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, como los servidores de Google
+    disable_nagle_algorithm = True  # Encabezados y cuerpo van en escrituras separadas: sin esto +40 ms (ACK diferido)
+
+    def log_message(self, *args):
+        pass  # Sin una línea por petición en la salida del benchmark
+
+    def _cuerpo(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(largo) if largo else b''
+
+    def _responder(self, estado, datos=None, encabezados=None):
+        contenido = json.dumps(datos).encode() if datos is not None else b''
+        self.send_response(estado)
+        for nombre, valor in (encabezados or {}).items():
+            self.send_header(nombre, valor)
+        if datos is not None:
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            # Como Google: solo comprime si el cliente lo acepta y su User-Agent dice "gzip"
+            if 'gzip' in self.headers.get('Accept-Encoding', '') and 'gzip' in self.headers.get('User-Agent', ''):
+                contenido = gzip.compress(contenido, compresslevel=6)
+                self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+        self.server.simulador.contar_bytes(getattr(self, '_ruta', 'otras'), len(contenido))
+
+    def _simular(self, ruta):
+        """Aplica la latencia y decide si la petición falla; retorna True si ya se respondió"""
+        servidor = self.server.simulador
+        self._ruta = ruta
+        servidor.contar(ruta)
+        time.sleep(servidor.latencia_aleatoria())
+        if servidor.fallar():
+            servidor.contar(ruta, error=True)
+            self._responder(503, {'error': {'code': 503, 'message': 'Backend Error (simulado)'}})
+            return True
+        return False
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        recurso = partes.path.rstrip('/').rsplit('/', 1)[-1]
+        if recurso not in RESPUESTAS:
+            self._responder(404, {'error': {'code': 404, 'message': f"Ruta no simulada: {partes.path}"}})
+            return
+        if self._simular(recurso):
+            return
+        params = {clave: valores[0] for clave, valores in parse_qs(partes.query).items()}
+        try:
+            arbol = parsear_fields(params['fields']) if params.get('fields') else None
+        except ValueError as e:
+            self._responder(400, {'error': {'code': 400, 'message': str(e)}})
+            return
+        self._responder(200, aplicar_fields(RESPUESTAS[recurso](params), arbol))
+
+    def do_POST(self):
+        # Inicio de sesión resumable: /upload/youtube/v3/videos?uploadType=resumable
+        self._cuerpo()
+        if self._simular('inicio_subida'):
+            return
+        sesion = self.server.simulador.nueva_sesion()
+        self._responder(200, encabezados={'Location': f"{self.server.simulador.url}sesiones/{sesion}"})
+
+    def do_PUT(self):
+        cuerpo = self._cuerpo()
+        if self._simular('fragmento'):
+            return
+        datos = self.server.simulador.sesiones.get(self.path.rsplit('/', 1)[-1])
+        if datos is None:
+            self._responder(404, {'error': {'code': 404, 'message': 'Sesión de subida no encontrada'}})
+            return
+
+        rango = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', self.headers.get('Content-Range', ''))
+        if rango and int(rango[1]) == datos['recibidos']:
+            datos['recibidos'] += len(cuerpo)  # Solo se cuentan los bytes: no se guarda el video
+        total = (rango[3] if rango else self.headers.get('Content-Range', '').rsplit('/', 1)[-1])
+
+        if total != '*' and datos['recibidos'] == int(total):
+            video_id = f"sub{datos['numero']:08d}"
+            self._responder(200, item_video(video_id, {'snippet'}))
+        elif datos['recibidos']:
+            self._responder(308, encabezados={'Range': f"bytes=0-{datos['recibidos'] - 1}"})
+        else:
+            self._responder(308)
+
+
+class _Servidor(ThreadingHTTPServer):
+    request_queue_size = 128  # El backlog por defecto (5) serializa las ráfagas concurrentes
+    daemon_threads = True
+
+
+class ServidorAPISimulada:
+    """
+    Servidor HTTP local que imita la YouTube Data API v3
+
+    Responde search, videos, channels y playlistItems con datos sintéticos y
+    deterministas (generados a partir de cada ID o consulta, no grabados de
+    la API) con la forma de las respuestas reales, y el protocolo de subida resumable
+    (POST de inicio, PUT por fragmento con 308/Range). Aplica el parámetro
+    fields y comprime con gzip como la API real. Cada petición espera
+    `latencia` ± `variacion` segundos y falla con 503 con probabilidad
+    `tasa_errores`. Uso:
+
+        with ServidorAPISimulada(latencia=0.05) as servidor, servidor.activo():
+            YouTubeService().buscar_videos('django')
+    """
+
+    def __init__(self, latencia=0.0, variacion=0.0, tasa_errores=0.0, semilla=0):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_errores = tasa_errores
+        self._aleatorio = random.Random(semilla)  # Reproducible entre corridas
+        self._lock = threading.Lock()
+        self.sesiones = {}
+        self.peticiones = {}  # ruta -> cantidad
+        self.errores = {}  # ruta -> 503 inyectados
+        self.bytes_respuesta = {}  # ruta -> bytes de cuerpo enviados (comprimidos si se negoció gzip)
+        self._servidor = None
+
+    def __enter__(self):
+        self._servidor = _Servidor(('127.0.0.1', 0), _Manejador)
+        self._servidor.simulador = self
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._servidor.server_port}/"
+
+    def latencia_aleatoria(self):
+        with self._lock:
+            return max(0.0, self.latencia + self._aleatorio.uniform(-self.variacion, self.variacion))
+
+    def fallar(self):
+        with self._lock:
+            return self._aleatorio.random() < self.tasa_errores
+
+    def contar(self, ruta, error=False):
+        with self._lock:
+            contadores = self.errores if error else self.peticiones
+            contadores[ruta] = contadores.get(ruta, 0) + 1
+
+    def contar_bytes(self, ruta, cantidad):
+        with self._lock:
+            self.bytes_respuesta[ruta] = self.bytes_respuesta.get(ruta, 0) + cantidad
+
+    def nueva_sesion(self):
+        with self._lock:
+            numero = len(self.sesiones) + 1
+            self.sesiones[str(numero)] = {'numero': numero, 'recibidos': 0}
+        return numero
+
+    def documento(self):
+        """Documento discovery de YouTube v3 con todas las URLs apuntando a este servidor"""
+        documento = deepcopy(clientes_service.obtener_documento('youtube', 'v3'))
+        documento['rootUrl'] = documento['mtlsRootUrl'] = self.url
+        documento['baseUrl'] = self.url + documento['servicePath']
+        return documento
+
+    @contextmanager
+    def activo(self):
+        """
+        Dirige clientes_service (y con él los servicios síncrono, asíncrono y
+        de subida) a este servidor mientras dure el bloque
+        """
+        documentos = dict(clientes_service._documentos)
+        hilo_local = clientes_service._hilo_local
+        clientes_service._documentos[('youtube', 'v3')] = self.documento()
+        clientes_service._hilo_local = threading.local()  # Clientes ya construidos apuntan a Google
+        try:
+            yield self
+        finally:
+            clientes_service._documentos.clear()
+            clientes_service._documentos.update(documentos)
+            clientes_service._hilo_local = hilo_local
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class VideosConfig(AppConfig):
     name = 'videos'
+
+    def ready(self):
+        from . import signals  # noqa: F401  Registra los receptores de señales
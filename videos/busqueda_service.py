@@ -0,0 +1,53 @@
+from django.db import connection  # Motor de base de datos activo
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+
+# Columnas cubiertas por el índice FULLTEXT (migración 0004)
+COLUMNAS_TEXTO = ('titulo', 'descripcion', 'etiquetas')
+
+# Peso de cada columna en el ranking del respaldo sin FULLTEXT
+PESOS = {'titulo': 3, 'etiquetas': 2, 'descripcion': 1}
+
+LONGITUD_MINIMA = 3  # innodb_ft_min_token_size por defecto: términos más cortos no están indexados
+
+
+def buscar_videos(queryset, texto):
+    """
+    Filtra videos por texto en titulo/descripcion/etiquetas con ranking de relevancia
+
+    En MySQL usa MATCH ... AGAINST sobre el índice FULLTEXT. En otros motores
+    (SQLite en pruebas) o con términos demasiado cortos para el índice, usa
+    LIKE ponderado por columna.
+
+    Returns:
+        QuerySet anotado con 'relevancia' (mayor = más relevante)
+    """
+    terminos = texto.split()
+    if not terminos:
+        return queryset.annotate(relevancia=Value(0, output_field=IntegerField()))
+
+    if connection.vendor == 'mysql' and all(len(termino) >= LONGITUD_MINIMA for termino in terminos):
+        tabla = queryset.model._meta.db_table
+        columnas = ', '.join(f"{tabla}.{columna}" for columna in COLUMNAS_TEXTO)
+        relevancia = RawSQL(
+            f"MATCH ({columnas}) AGAINST (%s IN NATURAL LANGUAGE MODE)", (texto,), output_field=FloatField()
+        )
+        return queryset.annotate(relevancia=relevancia).filter(relevancia__gt=0)
+
+    return _buscar_con_like(queryset, terminos)
+
+
+def _buscar_con_like(queryset, terminos):
+    """Respaldo portable: cada término suma el peso de cada columna donde aparece"""
+    coincide = Q()
+    relevancia = Value(0, output_field=IntegerField())
+    for termino in terminos:
+        for columna, peso in PESOS.items():
+            condicion = Q(**{f"{columna}__icontains": termino})
+            coincide |= condicion
+            relevancia = relevancia + Case(
+                When(condicion, then=Value(peso)), default=Value(0), output_field=IntegerField()
+            )
+
+    return queryset.filter(coincide).annotate(relevancia=relevancia)
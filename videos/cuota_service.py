@@ -0,0 +1,263 @@
+import threading  # Creación perezosa del gestor
+import time  # Reloj de recarga y esperas
+from contextlib import contextmanager
+from contextvars import ContextVar  # Consumidor actual (también dentro de sync_to_async)
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .metricas_service import medir_llamada, registro
+from .models import ConsumoCuota, CuotaDiaria
+
+
+# Unidades de cuota por método de la API (https://developers.google.com/youtube/v3/determine_quota_cost)
+COSTOS = {
+    'youtube.search.list': 100,
+    'youtube.videos.list': 1,
+    'youtube.channels.list': 1,
+    'youtube.playlistItems.list': 1,
+    'youtube.videos.insert': 1600,
+    'youtube.videos.update': 50,
+    'youtube.videos.delete': 50,
+}
+COSTO_POR_DEFECTO = 1  # Casi todos los .list cuestan 1
+
+ZONA_CUOTA = ZoneInfo('America/Los_Angeles')  # La cuota de YouTube se reinicia a medianoche del Pacífico
+
+_consumidor = ContextVar('consumidor_cuota', default='')
+
+
+def inicio_dia_cuota():
+    """Instante en que empezó el día de cuota actual de la API"""
+    return timezone.now().astimezone(ZONA_CUOTA).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class CuotaAgotada(Exception):
+    """La llamada no se envió porque no hay cuota disponible"""
+
+    def __init__(self, metodo, costo, espera):
+        self.metodo = metodo
+        self.costo = costo
+        self.espera = espera  # Segundos hasta que haya cuota (None: hasta mañana)
+        cuando = f"en {espera:.0f} s" if espera is not None else "mañana (límite diario alcanzado)"
+        super().__init__(f"Cuota de YouTube insuficiente para {metodo} ({costo} unidades); disponible {cuando}")
+
+
+class GestorCuota:
+    """
+    Token bucket de unidades de cuota compartido en la base de datos
+
+    Los tokens se recargan a limite/86400 por segundo hasta `rafaga`, así un
+    pico de tráfico no consume la cuota de todo el día en una hora; además
+    nunca se supera `limite` en el día de cuota (medianoche del Pacífico).
+
+    Cada reserva es un único UPDATE condicionado sobre la fila del día
+    (CuotaDiaria): recarga, comprueba y descuenta en la misma sentencia, así
+    todos los procesos ven el mismo balde sin bloqueos ni sondeos. Llamar a
+    la API dentro de un transaction.atomic retiene el bloqueo de esa fila
+    hasta el commit: las llamadas van fuera de las transacciones.
+    """
+
+    def __init__(self, limite_diario=10000, rafaga=5000, espera_maxima=0, prefijo='yt:cuota'):
+        self.limite_diario = limite_diario
+        self.capacidad = max(rafaga, max(COSTOS.values()))  # Un insert siempre debe caber en el balde
+        self.tasa = limite_diario / 86400  # Tokens por segundo
+        self.espera_maxima = espera_maxima  # 0: rechazar de inmediato; >0: esperar hasta N segundos
+        self.prefijo = prefijo
+
+    @staticmethod
+    def costo(metodo):
+        """Unidades que cuesta un método ('youtube.search.list', ...)"""
+        return COSTOS.get(metodo, COSTO_POR_DEFECTO)
+
+    def _dia(self):
+        """(clave, día): una fila por día de cuota, el estado se reinicia solo a medianoche del Pacífico"""
+        dia = inicio_dia_cuota().date()
+        return f"{self.prefijo}:{dia.isoformat()}", dia
+
+    def _tokens(self, ahora):
+        """Expresión SQL con los tokens del balde recargados hasta `ahora`"""
+        # Greatest: un proceso con el reloj atrasado no resta tokens
+        recarga = Greatest(Value(ahora) - F('recargado'), Value(0.0)) * Value(self.tasa)
+        return Least(F('tokens') + recarga, Value(float(self.capacidad)), output_field=FloatField())
+
+    def _crear_dia(self, clave, dia, ahora):
+        """Fila del día con el balde lleno (si otro proceso la creó primero, no hace nada)"""
+        _, creada = CuotaDiaria.objects.get_or_create(
+            clave=clave, defaults={'dia': dia, 'tokens': float(self.capacidad), 'recargado': ahora}
+        )
+        if creada:
+            # Los días viejos solo sirven de historial: se conserva un mes
+            CuotaDiaria.objects.filter(clave__startswith=f"{self.prefijo}:", dia__lt=dia - timedelta(days=31)).delete()
+
+    def reservar(self, metodo, unidades=None):
+        """
+        Intenta reservar la cuota de una llamada, sin esperar
+
+        Returns:
+            0 si quedó reservada; si no, segundos hasta que haya tokens
+            (None: el límite del día está agotado)
+        """
+        costo = self.costo(metodo) if unidades is None else unidades
+        clave, dia = self._dia()
+        ahora = time.time()
+        tokens = self._tokens(ahora)
+
+        for _ in range(3):
+            # En MySQL las asignaciones del SET se evalúan en orden: `tokens` usa el `recargado` previo
+            if CuotaDiaria.objects.filter(
+                GreaterThanOrEqual(tokens, costo), clave=clave, consumido__lte=self.limite_diario - costo
+            ).update(
+                tokens=tokens - costo,
+                recargado=Greatest(F('recargado'), Value(ahora)),
+                consumido=F('consumido') + costo
+            ):
+                self._anotar(clave, metodo, costo)
+                registro.incrementar('youtube_cuota_unidades_total', costo, metodo=metodo)
+                return 0
+
+            fila = CuotaDiaria.objects.filter(clave=clave).values('tokens', 'recargado', 'consumido').first()
+            if fila is None:
+                self._crear_dia(clave, dia, ahora)  # Primera llamada del día
+                continue
+            if fila['consumido'] + costo > self.limite_diario:
+                return None  # Solo el cambio de día libera cuota
+            disponibles = min(self.capacidad, fila['tokens'] + max(0.0, ahora - fila['recargado']) * self.tasa)
+            if disponibles < costo:
+                return (costo - disponibles) / self.tasa
+            # Otro proceso cambió la fila entre el UPDATE y la lectura: reintentar
+        return 0.05
+
+    @staticmethod
+    def _anotar(clave, metodo, costo):
+        """Suma el costo al método y al consumidor actuales (ver a_cuenta_de)"""
+        consumo = ConsumoCuota.objects.filter(cuota_id=clave, metodo=metodo, consumidor=_consumidor.get())
+        if consumo.update(unidades=F('unidades') + costo):
+            return
+        try:
+            with transaction.atomic():
+                consumo.create(cuota_id=clave, metodo=metodo, consumidor=_consumidor.get(), unidades=costo)
+        except IntegrityError:
+            consumo.update(unidades=F('unidades') + costo)  # Otro proceso la creó entre medio
+
+    def rechazar(self, metodo, costo, espera):
+        """Registra un rechazo y retorna la excepción a lanzar"""
+        CuotaDiaria.objects.filter(clave=self._dia()[0]).update(rechazos=F('rechazos') + 1)
+        registro.incrementar('youtube_cuota_rechazos_total', metodo=metodo)
+        return CuotaAgotada(metodo, costo, espera)
+
+    def consumir(self, metodo, unidades=None, esperar=None):
+        """
+        Reserva la cuota de una llamada antes de enviarla
+
+        Args:
+            metodo: ID del método de la API ('youtube.videos.list')
+            unidades: Costo explícito (por defecto el de COSTOS)
+            esperar: Segundos máximos a esperar tokens (por defecto espera_maxima)
+
+        Raises:
+            CuotaAgotada: Si no hay cuota y no alcanza con esperar
+        """
+        costo = self.costo(metodo) if unidades is None else unidades
+        esperar = self.espera_maxima if esperar is None else esperar
+        plazo = time.monotonic() + esperar
+
+        while (espera := self.reservar(metodo, costo)) != 0:
+            if espera is None or time.monotonic() + espera > plazo:
+                raise self.rechazar(metodo, costo, espera)
+            time.sleep(espera)
+
+    def alcanza(self, metodo, unidades=None):
+        """True si la llamada cabría ahora mismo (sin consumir)"""
+        costo = self.costo(metodo) if unidades is None else unidades
+        estado = self.estado(detalle=False)
+        return estado['tokens'] >= costo and estado['restante_dia'] >= costo
+
+    def estado(self, detalle=True):
+        """
+        Métricas del día de cuota actual
+
+        Args:
+            detalle: Incluir las unidades por método y por consumidor (una consulta más)
+        """
+        clave, dia = self._dia()
+        ahora = time.time()
+        fila = CuotaDiaria.objects.filter(clave=clave).first()
+        tokens = self.capacidad if fila is None else min(
+            self.capacidad, fila.tokens + max(0.0, ahora - fila.recargado) * self.tasa
+        )
+        consumido = fila.consumido if fila else 0
+        estado = {
+            'dia': dia.isoformat(),
+            'limite_diario': self.limite_diario,
+            'consumido': consumido,
+            'restante_dia': self.limite_diario - consumido,
+            'tokens': round(tokens, 1),
+            'capacidad': self.capacidad,
+            'recarga_por_hora': round(self.tasa * 3600, 1),
+            'rechazos': fila.rechazos if fila else 0,
+        }
+        if detalle:
+            por_metodo, por_consumidor = {}, {}
+            consumos = ConsumoCuota.objects.filter(cuota_id=clave).values_list('metodo', 'consumidor', 'unidades')
+            for metodo, consumidor, unidades in consumos:
+                por_metodo[metodo] = por_metodo.get(metodo, 0) + unidades
+                if consumidor:
+                    por_consumidor[consumidor] = por_consumidor.get(consumidor, 0) + unidades
+            estado.update(por_metodo=por_metodo, por_consumidor=por_consumidor)
+        return estado
+
+
+_gestor = None
+_gestor_lock = threading.Lock()
+
+
+def obtener_gestor_cuota():
+    """Gestor de cuota configurado en settings.YOUTUBE_CUOTA (uno por proceso)"""
+    global _gestor
+    with _gestor_lock:
+        if _gestor is None:
+            config = getattr(settings, 'YOUTUBE_CUOTA', {})
+            _gestor = GestorCuota(
+                limite_diario=config.get('LIMITE_DIARIO', 10000),
+                rafaga=config.get('RAFAGA', 5000),
+                espera_maxima=config.get('ESPERA_MAXIMA', 0)
+            )
+    return _gestor
+
+
+@contextmanager
+def a_cuenta_de(consumidor):
+    """
+    Atribuye a `consumidor` la cuota reservada dentro del bloque
+
+    El gestor la suma en estado()['por_consumidor'], así una tarea puede
+    llevar su propio presupuesto dentro de la cuota común.
+    """
+    token = _consumidor.set(consumidor)
+    try:
+        yield
+    finally:
+        _consumidor.reset(token)
+
+
+def ejecutar(peticion, **kwargs):
+    """Ejecuta una petición de googleapiclient después de reservar su cuota, midiéndola"""
+    obtener_gestor_cuota().consumir(peticion.methodId)
+
+    with medir_llamada(peticion.methodId) as medicion:
+        medicion['enviados'] = len(peticion.body or '')
+        postproc = peticion.postproc
+
+        def contar_bytes(respuesta, contenido):
+            medicion['recibidos'] = len(contenido)  # Cuerpo crudo, antes de parsear el JSON
+            return postproc(respuesta, contenido)
+
+        peticion.postproc = contar_bytes
+        return peticion.execute(**kwargs)
@@ -0,0 +1,183 @@
+import time  # Medición de tiempos por lote
+from itertools import islice  # Consumir el stream por lotes
+
+from django.db import connection, transaction  # Conexión y transacciones
+
+from .miniaturas_service import actualizar_miniaturas
+from .models import Tag, Video, VideoTag
+from .totales_service import invalidar_todos_los_totales
+
+
+# Columnas que vienen de YouTube y pueden cambiar entre sincronizaciones
+CAMPOS_YOUTUBE = [
+    'titulo', 'descripcion', 'canal_id', 'canal_nombre', 'fecha_publicacion',
+    'url_thumbnail', 'url_video', 'duracion', 'vistas', 'likes', 'comentarios', 'etiquetas',
+]
+
+
+class IngestaService:
+    """Guarda en la tabla Video los diccionarios producidos por YouTubeService"""
+
+    def __init__(self, tamano_lote=500):
+        self.tamano_lote = tamano_lote  # Filas por INSERT ... ON DUPLICATE KEY UPDATE
+
+    def guardar_videos(self, videos, agregado_por=None, categoria='otro'):
+        """
+        Inserta o actualiza videos en lotes (bulk upsert por youtube_id)
+
+        Cada lote corre en su propia transacción. Las filas idénticas a las
+        guardadas se omiten y solo se actualizan las columnas que cambiaron.
+
+        Args:
+            videos: Iterable (puede ser un generador) de diccionarios de video
+                completos, con todos los CAMPOS_YOUTUBE (obtener_detalles_videos
+                con campos=None o 'detalle')
+            agregado_por: Usuario asignado a los videos nuevos
+            categoria: Categoría local asignada a los videos nuevos
+
+        Returns:
+            list: Un diccionario por lote con conteos y duración en segundos
+
+        Raises:
+            ValueError: Si un video no trae todos los CAMPOS_YOUTUBE; los lotes
+                anteriores ya quedaron guardados, el del video incompleto no
+        """
+
+        videos = iter(videos)
+        resultados = []
+        miniaturas = {}  # youtube_id -> url_thumbnail de videos nuevos o con otra miniatura
+
+        while True:
+            lote = list(islice(videos, self.tamano_lote))  # Siguiente lote del stream
+            if not lote:
+                break
+            self._validar_lote(lote)  # Antes de abrir la transacción
+
+            inicio = time.perf_counter()
+            with transaction.atomic():
+                conteos = self._guardar_lote(lote, agregado_por, categoria, miniaturas)
+            conteos['lote'] = len(resultados) + 1
+            conteos['segundos'] = time.perf_counter() - inicio
+            resultados.append(conteos)
+
+        # bulk_create no emite señales: los totales cacheados se invalidan aquí
+        if any(conteos['insertados'] or conteos['actualizados'] for conteos in resultados):
+            invalidar_todos_los_totales()
+
+        if miniaturas:
+            actualizar_miniaturas(miniaturas)  # Fuera de las transacciones: puede descargar imágenes
+
+        return resultados
+
+    @staticmethod
+    def _validar_lote(lote):
+        """
+        Rechaza videos parciales: el upsert escribe todas las columnas (un
+        INSERT sin fecha_publicacion viola NOT NULL) y update_fields es común
+        a todo el lote
+        """
+        for datos in lote:
+            faltantes = [campo for campo in CAMPOS_YOUTUBE if campo not in datos]
+            if faltantes:
+                raise ValueError(
+                    f"Video {datos.get('youtube_id')!r} incompleto, faltan: {', '.join(faltantes)} "
+                    "(pide los detalles con campos='detalle')"
+                )
+
+    def _guardar_lote(self, lote, agregado_por, categoria, miniaturas):
+        """Upsert de un lote; retorna conteos de insertados/actualizados/sin cambios"""
+
+        # Último valor por youtube_id (un lote no puede repetir la clave única)
+        por_id = {datos['youtube_id']: datos for datos in lote}
+
+        existentes = {
+            fila['youtube_id']: fila
+            for fila in Video.objects.filter(youtube_id__in=por_id).values('youtube_id', *CAMPOS_YOUTUBE)
+        }
+
+        objetos = []
+        campos_cambiados = set()
+        sin_cambios = 0
+        tags_por_video = {}  # youtube_id -> nombres, solo para videos nuevos o con tags cambiados
+
+        for youtube_id, datos in por_id.items():
+            valores = {campo: self._ajustar(campo, datos[campo]) for campo in CAMPOS_YOUTUBE}
+            actual = existentes.get(youtube_id)
+
+            if actual is not None:
+                cambiados = {campo for campo, valor in valores.items() if actual[campo] != valor}
+                if not cambiados:
+                    sin_cambios += 1  # Nada que escribir
+                    continue
+                campos_cambiados |= cambiados
+
+            if actual is None or 'url_thumbnail' in cambiados:
+                miniaturas[youtube_id] = valores['url_thumbnail']
+
+            if actual is None or 'etiquetas' in cambiados:
+                tags_por_video[youtube_id] = Tag.normalizar(valores['etiquetas'])
+
+            objetos.append(Video(youtube_id=youtube_id, agregado_por=agregado_por, categoria=categoria, **valores))
+
+        if objetos:
+            opciones = {}
+            if connection.features.supports_update_conflicts_with_target:
+                opciones['unique_fields'] = ['youtube_id']  # PostgreSQL/SQLite; MySQL lo infiere
+            Video.objects.bulk_create(
+                objetos,
+                update_conflicts=True,
+                # Sin columnas cambiadas (lote solo con inserciones) basta con tocar 'actualizado'
+                update_fields=sorted(campos_cambiados) + ['actualizado'],
+                **opciones
+            )
+
+        if tags_por_video:
+            self._sincronizar_tags(tags_por_video)
+
+        return {
+            'filas': len(por_id),
+            'insertados': len(por_id) - len(existentes),
+            'actualizados': len(existentes) - sin_cambios,
+            'sin_cambios': sin_cambios,
+        }
+
+    @staticmethod
+    def _sincronizar_tags(tags_por_video):
+        """Reemplaza los tags de los videos indicados (por youtube_id)"""
+        # bulk_create con update_conflicts no retorna PKs en MySQL: se consultan
+        video_ids = dict(Video.objects.filter(youtube_id__in=tags_por_video).values_list('youtube_id', 'id'))
+        sincronizar_tags({video_ids[youtube_id]: lista for youtube_id, lista in tags_por_video.items()})
+
+    @staticmethod
+    def _ajustar(campo, valor):
+        """Recorta textos al max_length de la columna (MySQL estricto rechaza el exceso)"""
+        max_length = Video._meta.get_field(campo).max_length
+        if max_length and isinstance(valor, str):
+            return valor[:max_length]
+        return valor
+
+
+def sincronizar_tags(tags_por_video):
+    """
+    Reemplaza los tags normalizados de varios videos con upserts masivos
+
+    Args:
+        tags_por_video: dict id de Video -> lista de nombres normalizados
+    """
+    nombres = {nombre for lista in tags_por_video.values() for nombre in lista}
+    Tag.objects.bulk_create([Tag(nombre=nombre) for nombre in nombres], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.filter(nombre__in=nombres).values_list('nombre', 'id'))
+    for nombre in nombres - tag_ids.keys():
+        # Con collation *_ai_ci 'canción' y 'cancion' son la misma fila
+        tag_ids[nombre] = Tag.objects.filter(nombre=nombre).values_list('id', flat=True).first()
+
+    VideoTag.objects.filter(video_id__in=tags_por_video).delete()
+    VideoTag.objects.bulk_create(
+        [
+            VideoTag(video_id=video_id, tag_id=tag_ids[nombre])
+            for video_id, lista in tags_por_video.items()
+            for nombre in lista
+            if tag_ids[nombre] is not None
+        ],
+        ignore_conflicts=True  # Dos nombres pueden resolver al mismo tag por collation
+    )
@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+from asgiref.sync import async_to_sync
+from google.oauth2.credentials import Credentials
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from videos import cuota_service
+from videos.api_simulada import ServidorAPISimulada, item_video
+from videos.cuota_service import GestorCuota
+from videos.management.commands.benchmark_indices import Command as BenchmarkIndices, bd_desechable
+from videos.normalizacion import VideoNormalizado
+from videos.upload_service import YouTubeUploadService
+from videos.youtube_async_service import YouTubeServiceAsync
+from videos.youtube_service import CacheMemoria, CacheRespuestas, YouTubeService, obtener_cache_respuestas
+
+
+ESCENARIOS = ['buscar', 'detalles', 'detalles_lista', 'canal', 'buscar_async', 'subir', 'inicio', 'mis_videos', 'normalizar']
+PERCENTILES = (50, 90, 95, 99)
+PARTES = {'snippet', 'contentDetails', 'statistics'}
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordenados:
+        return None
+    return ordenados[max(0, -(-len(ordenados) * p // 100) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide las rutas críticas (búsqueda, detalles, subida, vistas de lista) contra una API de '
+        'YouTube simulada en localhost, con respuestas sintéticas y una base de prueba desechable, '
+        'y emite throughput y percentiles de latencia en JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--videos', type=int, default=10_000,
+            help='Videos sintéticos sembrados en la base de prueba'
+        )
+        parser.add_argument(
+            '--conservar', action='store_true',
+            help='Conservar la base de prueba sembrada para la próxima corrida (sin él se destruye al terminar)'
+        )
+        parser.add_argument('--repeticiones', type=int, default=20, help='Mediciones por escenario')
+        parser.add_argument('--latencia', type=float, default=0.05, help='Segundos de latencia por petición simulada')
+        parser.add_argument('--variacion', type=float, default=0.02, help='± segundos aleatorios sobre la latencia')
+        parser.add_argument('--errores', type=float, default=0.0, help='Probabilidad de 503 por petición (0-1)')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla de latencias y errores')
+        parser.add_argument('--mib-subida', type=float, default=4, help='Tamaño del video de la subida simulada')
+        parser.add_argument(
+            '--escenarios', default=','.join(ESCENARIOS),
+            help=f"Escenarios separados por coma ({', '.join(ESCENARIOS)})"
+        )
+        parser.add_argument('--salida', default=None, help='Archivo JSON de resultados (por defecto stdout)')
+
+    def handle(self, *args, **options):
+        escenarios = [nombre.strip() for nombre in options['escenarios'].split(',') if nombre.strip()]
+        desconocidos = set(escenarios) - set(ESCENARIOS)
+        if desconocidos:
+            self.stderr.write(self.style.ERROR(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}"))
+            return
+
+        servidor = ServidorAPISimulada(
+            latencia=options['latencia'],
+            variacion=options['variacion'],
+            tasa_errores=options['errores'],
+            semilla=options['semilla']
+        )
+        self.mib_subida = options['mib_subida']
+        resultados = {}
+
+        # Filas sintéticas, cuota y videos "subidos" van a una base de prueba: la real no se toca
+        with bd_desechable(options['conservar']):
+            # El progreso va a stderr: stdout queda solo para el JSON
+            self.usuario = BenchmarkIndices(stdout=sys.stderr).sembrar(options['videos'], 50)[0]
+
+            # Cuota propia del benchmark: ni lo frena ni gasta la del día
+            gestor_previo = cuota_service._gestor
+            cuota_service._gestor = GestorCuota(limite_diario=10 ** 12, rafaga=10 ** 12, prefijo='benchmark:cuota')
+            try:
+                hosts = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+                with servidor, servidor.activo(), hosts:
+                    for nombre in escenarios:
+                        self.stderr.write(f"Escenario {nombre}...")
+                        resultados[nombre] = self.medir(getattr(self, f"escenario_{nombre}"), options['repeticiones'])
+            finally:
+                cuota_service._gestor = gestor_previo
+
+        informe = json.dumps({
+            'configuracion': {
+                clave: options[clave]
+                for clave in ('videos', 'repeticiones', 'latencia', 'variacion', 'errores', 'semilla', 'mib_subida')
+            },
+            'escenarios': resultados,
+            'servidor': {
+                'respuestas': 'sintéticas (generadas por api_simulada, no grabadas de la API real)',
+                'peticiones': servidor.peticiones,
+                'errores_inyectados': servidor.errores,
+                'bytes_respuesta': servidor.bytes_respuesta,
+            },
+        }, indent=2)
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(informe)
+            self.stderr.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+        else:
+            self.stdout.write(informe)
+
+    def medir(self, escenario, repeticiones):
+        """Ejecuta `escenario(iteracion)` N veces y resume sus tiempos (las fallidas cuentan aparte)"""
+        tiempos = []
+        errores = {}
+        extras = []
+        inicio_total = time.perf_counter()
+
+        for iteracion in range(repeticiones):
+            inicio = time.perf_counter()
+            try:
+                extra = escenario(iteracion)
+            except Exception as e:
+                errores[type(e).__name__] = errores.get(type(e).__name__, 0) + 1
+                continue
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if extra is not None:
+                extras.append(extra)
+
+        segundos = time.perf_counter() - inicio_total
+        tiempos.sort()
+        resumen = {
+            'ok': len(tiempos),
+            'errores': errores,
+            'segundos': round(segundos, 3),
+            'por_segundo': round(len(tiempos) / segundos, 2) if segundos else None,
+            'media_ms': round(sum(tiempos) / len(tiempos), 2) if tiempos else None,
+            **{f"p{p}_ms": round(percentil(tiempos, p), 2) if tiempos else None for p in PERCENTILES},
+            'max_ms': round(tiempos[-1], 2) if tiempos else None,
+        }
+        if extras:
+            resumen['mib_por_segundo'] = round(sum(extras) / len(extras) / 1024 / 1024, 2)
+        return resumen
+
+    @staticmethod
+    def servicio():
+        """YouTubeService con caché vacía: cada iteración llega a la API simulada"""
+        return YouTubeService(cache=CacheRespuestas(CacheMemoria(), ttls=obtener_cache_respuestas().ttls))
+
+    def escenario_buscar(self, iteracion):
+        self.servicio().buscar_videos(f"django {iteracion}", max_resultados=25)
+
+    def escenario_detalles(self, iteracion):
+        # 200 IDs desconocidos: 4 lotes de videos.list en paralelo
+        self.servicio().obtener_detalles_videos([f"det{iteracion:05d}{numero:04d}" for numero in range(200)])
+
+    def escenario_detalles_lista(self, iteracion):
+        # Los mismos 200 IDs con los campos de una grilla: part y fields más chicos
+        self.servicio().obtener_detalles_videos(
+            [f"lis{iteracion:05d}{numero:04d}" for numero in range(200)], campos='lista'
+        )
+
+    def escenario_canal(self, iteracion):
+        self.servicio().obtener_videos_canal(f"UC{iteracion:022d}", max_resultados=120)
+
+    def escenario_buscar_async(self, iteracion):
+        async def buscar():
+            async with YouTubeServiceAsync(cache=self.servicio().cache) as servicio:
+                return await servicio.buscar_varios([f"async {iteracion} {numero}" for numero in range(5)], 25)
+        async_to_sync(buscar)()
+
+    def escenario_subir(self, iteracion):
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as archivo:
+            archivo.write(os.urandom(int(self.mib_subida * 1024 * 1024)))
+        try:
+            servicio = YouTubeUploadService()
+            servicio.subir_video(Credentials(token='benchmark'), archivo.name, f"Benchmark {iteracion}", '')
+            return servicio.estadisticas['bytes_por_segundo']
+        finally:
+            os.remove(archivo.name)
+
+    def escenario_normalizar(self, iteracion):
+        # Solo CPU: 10.000 items completos de videos.list -> VideoNormalizado
+        if not hasattr(self, 'items'):
+            self.items = [item_video(f"norm{numero:05d}", PARTES) for numero in range(10_000)]
+        for item in self.items:
+            VideoNormalizado.desde_item(item)
+
+    def escenario_inicio(self, iteracion):
+        respuesta = Client().get('/')
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"inicio respondió {respuesta.status_code}")
+
+    def escenario_mis_videos(self, iteracion):
+        cliente = Client()
+        cliente.force_login(self.usuario)
+        respuesta = cliente.get('/mis-videos/')
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"mis_videos respondió {respuesta.status_code}")
@@ -0,0 +1,63 @@
+import statistics  # Mediana de tiempos
+import time
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from videos import clientes_service
+from videos.clientes_service import cliente_api, cliente_usuario
+
+
+class Command(BaseCommand):
+    help = 'Compara el costo de construir clientes de la API con build() frente a clientes_service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=50, help='Mediciones por variante')
+        parser.add_argument(
+            '--video', default=None,
+            help='ID de un video para incluir una llamada real a videos.list (requiere red y API Key)'
+        )
+
+    def handle(self, *args, **options):
+        servicio, version = settings.YOUTUBE_API_SERVICE_NAME, settings.YOUTUBE_API_VERSION
+        credenciales = Credentials(token='benchmark')  # Solo se adjuntan al cliente
+        video = options['video']
+
+        def llamar(youtube):
+            if video:
+                youtube.videos().list(id=video, part='id').execute()
+            else:
+                youtube.videos().list(id='x', part='id')  # Solo construir la petición
+
+        # Primer uso de la fábrica en el proceso: incluye parsear el documento discovery
+        clientes_service._documentos.clear()
+        inicio = time.perf_counter()
+        llamar(cliente_api())
+        self.stdout.write(f"Fábrica, primer uso (parseo del documento): {(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+        variantes = {
+            'build() con API Key': lambda: llamar(build(servicio, version, developerKey=settings.YOUTUBE_API_KEY)),
+            'cliente_api()': lambda: llamar(cliente_api()),
+        }
+        if video:
+            # Con build() cada iteración abre una conexión nueva (TLS incluido)
+            self.stdout.write(self.style.WARNING(f"Incluye videos.list real de {video}"))
+        else:
+            # Las credenciales de prueba no son válidas: solo se mide la construcción
+            variantes['build() con credenciales'] = lambda: llamar(build(servicio, version, credentials=credenciales))
+            variantes['cliente_usuario()'] = lambda: llamar(cliente_usuario(credenciales))
+
+        for nombre, variante in variantes.items():
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                variante()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+
+            tiempos.sort()
+            self.stdout.write(self.style.SUCCESS(
+                f"{nombre}: mediana {statistics.median(tiempos):.2f} ms, "
+                f"p95 {tiempos[int(len(tiempos) * 0.95) - 1]:.2f} ms, máx {tiempos[-1]:.2f} ms"
+            ))
@@ -0,0 +1,135 @@
+import random  # Datos sintéticos
+import statistics  # Mediana de tiempos
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from videos.models import Video
+from videos.paginacion import CAMPOS_LISTA
+
+
+PREFIJO = 'bench'  # youtube_id de las filas sintéticas
+CATEGORIAS = ['programacion', 'bases_datos', 'redes', 'seguridad', 'otro']
+
+
+@contextmanager
+def bd_desechable(conservar=False):
+    """
+    Ejecuta el bloque contra una base de datos de prueba con las migraciones
+    aplicadas (test_<NAME>, como manage.py test) y la destruye al salir: ni
+    las filas sintéticas ni los cambios de índices tocan la base real
+
+    Args:
+        conservar: Reutilizar la base de una corrida anterior y no destruirla
+            (evita volver a sembrar millones de filas)
+    """
+    nombre_real = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=conservar)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_real, verbosity=0, keepdb=conservar)
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra N videos sintéticos en una base de prueba desechable y compara planes EXPLAIN '
+        'y tiempos con y sin los índices compuestos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000, help='Videos sintéticos a sembrar')
+        parser.add_argument('--usuarios', type=int, default=50, help='Usuarios entre los que se reparten')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Ejecuciones por consulta')
+        parser.add_argument(
+            '--conservar', action='store_true',
+            help='Conservar la base de prueba sembrada para la próxima corrida (sin él se destruye al terminar)'
+        )
+
+    def handle(self, *args, **options):
+        with bd_desechable(options['conservar']):
+            self.comparar(options)
+
+    def comparar(self, options):
+        usuarios = self.sembrar(options['filas'], options['usuarios'])
+        consultas = self.consultas(usuarios[0])
+        indices = Video._meta.indexes
+
+        # Primero sin los índices compuestos, luego con ellos
+        with connection.schema_editor() as editor:
+            for indice in indices:
+                editor.remove_index(Video, indice)
+        try:
+            self.medir('SIN índices compuestos', consultas, options['repeticiones'])
+        finally:
+            with connection.schema_editor() as editor:
+                for indice in indices:
+                    editor.add_index(Video, indice)
+        self.medir('CON índices compuestos', consultas, options['repeticiones'])
+
+    def sembrar(self, filas, cantidad_usuarios):
+        """Completa la tabla hasta tener `filas` videos sintéticos"""
+        usuarios = [
+            User.objects.get_or_create(username=f"{PREFIJO}_{numero}")[0]
+            for numero in range(cantidad_usuarios)
+        ]
+        existentes = Video.objects.filter(youtube_id__startswith=PREFIJO).count()
+        ahora = timezone.now()
+        aleatorio = random.Random(existentes)  # Reproducible
+
+        for inicio in range(existentes, filas, 10_000):
+            Video.objects.bulk_create([
+                Video(
+                    youtube_id=f"{PREFIJO}{numero:012d}",
+                    titulo=f"Video sintético {numero}",
+                    descripcion='Lorem ipsum dolor sit amet. ' * 20,
+                    url_video=f"https://www.youtube.com/watch?v={PREFIJO}{numero}",
+                    url_thumbnail='https://i.ytimg.com/vi/bench/hqdefault.jpg',
+                    canal_id=f"UC{aleatorio.randrange(500):022d}",
+                    canal_nombre='Canal sintético',
+                    duracion='PT10M',
+                    fecha_publicacion=ahora - timedelta(minutes=aleatorio.randrange(5_000_000)),
+                    vistas=aleatorio.randrange(1_000_000),
+                    likes=aleatorio.randrange(10_000),
+                    categoria=aleatorio.choice(CATEGORIAS),
+                    agregado_por=aleatorio.choice(usuarios),
+                )
+                for numero in range(inicio, min(inicio + 10_000, filas))
+            ], batch_size=2_000)
+            self.stdout.write(f"Sembradas {min(inicio + 10_000, filas)}/{filas}", ending='\r')
+
+        self.stdout.write('')
+        return usuarios
+
+    @staticmethod
+    def consultas(usuario):
+        """Formas de consulta de las vistas de lista"""
+        lista = Video.objects.only(*CAMPOS_LISTA)
+        canal = Video.objects.filter(youtube_id__startswith=PREFIJO).values_list('canal_id', flat=True).first()
+        return {
+            'inicio': lista.order_by('-fecha_publicacion', '-pk')[:25],
+            'mis_videos': lista.filter(agregado_por=usuario).order_by('-fecha_publicacion', '-pk')[:11],
+            'mis_videos + categoría': lista.filter(
+                agregado_por=usuario, categoria='redes'
+            ).order_by('-fecha_publicacion', '-pk')[:11],
+            'canal': lista.filter(canal_id=canal).order_by('-fecha_publicacion', '-pk')[:50],
+        }
+
+    def medir(self, titulo, consultas, repeticiones):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {titulo} =="))
+        for nombre, queryset in consultas.items():
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(queryset.all())  # .all() clona: sin caché de resultados
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"\n{nombre}: mediana {statistics.median(tiempos):.2f} ms, máx {max(tiempos):.2f} ms"
+            ))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,101 @@
+import os
+import time  # Espera entre sondeos de la cola
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from videos.models import UploadJob
+from videos.upload_service import procesar_job_en_hilo, tomar_siguiente_job
+
+
+class Command(BaseCommand):
+    help = 'Worker que procesa las subidas en cola (UploadJob) fuera del ciclo de peticiones HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--espera', type=float, default=2.0, help='Segundos entre sondeos si la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Vaciar la cola y terminar')
+        parser.add_argument(
+            '--abandono', type=int, default=10,
+            help='Minutos sin progreso tras los que una subida se considera abandonada'
+        )
+        parser.add_argument(
+            '--hilos', type=int, default=getattr(settings, 'YOUTUBE_UPLOAD_HILOS', 4),
+            help='Subidas simultáneas en este worker'
+        )
+        parser.add_argument(
+            '--por-usuario', type=int, default=getattr(settings, 'YOUTUBE_UPLOAD_POR_USUARIO', 2),
+            help='Subidas simultáneas por usuario (entre todos los workers)'
+        )
+        parser.add_argument(
+            '--max-global', type=int, default=getattr(settings, 'YOUTUBE_UPLOAD_MAX_GLOBAL', 8),
+            help='Subidas simultáneas en total (entre todos los workers y transmisiones)'
+        )
+        parser.add_argument(
+            '--presupuesto', type=int, default=getattr(settings, 'YOUTUBE_PRESUPUESTO_SUBIDAS', 6400),
+            help='Unidades de cuota diarias para videos.insert (1600 por video)'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(minutes=options['abandono'])
+
+        # Transmisiones cuyo navegador nunca terminó de enviar el archivo
+        for job in UploadJob.objects.filter(estado=UploadJob.RECIBIENDO, actualizado__lt=limite):
+            self.descartar(job, 'El navegador no envió el archivo')
+
+        # Trabajos 'subiendo' sin latido reciente quedaron de un worker caído: vuelven a la cola
+        recuperados = 0
+        for job in UploadJob.objects.filter(estado=UploadJob.SUBIENDO, actualizado__lt=limite):
+            if not os.path.exists(job.archivo_path) or os.path.getsize(job.archivo_path) < job.bytes_totales:
+                # Transmisión cortada a mitad de la recepción: el archivo está incompleto
+                self.descartar(job, 'El archivo quedó incompleto')
+                continue
+            recuperados += UploadJob.objects.filter(pk=job.pk, estado=UploadJob.SUBIENDO).update(
+                estado=UploadJob.PENDIENTE
+            )
+        if recuperados:
+            self.stdout.write(self.style.WARNING(f"{recuperados} subidas interrumpidas vuelven a la cola"))
+
+        hilos = max(1, options['hilos'])
+        en_curso = {}  # futuro -> job
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='subida') as pool:
+            while True:
+                # Llenar los hilos libres respetando los límites por usuario y global y la cuota
+                while len(en_curso) < hilos:
+                    job = tomar_siguiente_job(options['por_usuario'], options['presupuesto'], options['max_global'])
+                    if job is None:
+                        break
+                    self.stdout.write(f"Subiendo #{job.pk}: {job.titulo}")
+                    en_curso[pool.submit(procesar_job_en_hilo, job)] = job
+
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['espera'])
+                    continue
+
+                terminados, _ = wait(en_curso, timeout=options['espera'], return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    del en_curso[futuro]
+                    self.informar(*futuro.result())
+
+    def informar(self, job, estadisticas):
+        if job.estado == UploadJob.COMPLETADO:
+            self.stdout.write(self.style.SUCCESS(
+                f"#{job.pk} completado: {job.video.youtube_id} "
+                f"({estadisticas['bytes_por_segundo'] / 1024 / 1024:.2f} MiB/s, "
+                f"{estadisticas['fragmentos']} fragmentos, {estadisticas['reintentos']} reintentos)"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"#{job.pk} falló: {job.error}"))
+
+    def descartar(self, job, motivo):
+        """Marca el job como fallido y borra su archivo"""
+        job.estado = UploadJob.ERROR
+        job.error = motivo
+        job.save(update_fields=['estado', 'error', 'actualizado'])
+        if os.path.exists(job.archivo_path):
+            os.remove(job.archivo_path)
+        self.stdout.write(self.style.ERROR(f"#{job.pk} descartado: {motivo}"))
@@ -0,0 +1,136 @@
+import math  # Redondeo de unidades de cuota
+import time  # Medición de throughput y pausas
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from videos.models import Video
+from videos.totales_service import invalidar_todos_los_totales
+from videos.cuota_service import CuotaAgotada, a_cuenta_de, obtener_gestor_cuota
+from videos.youtube_service import TAMANO_LOTE, YouTubeService
+
+
+# Niveles de prioridad: (nivel, condición, intervalo mínimo entre refrescos)
+# Los videos recientes o muy vistos cambian rápido; los viejos casi no cambian.
+NIVELES = [
+    (0, lambda ahora: Q(fecha_publicacion__gte=ahora - timedelta(days=7)), timedelta(hours=1)),
+    (1, lambda ahora: Q(fecha_publicacion__gte=ahora - timedelta(days=30)) | Q(vistas__gte=100_000), timedelta(hours=6)),
+    (2, lambda ahora: Q(fecha_publicacion__gte=ahora - timedelta(days=365)), timedelta(days=1)),
+]
+NIVEL_ESTABLE = (3, timedelta(days=7))  # Todo lo demás
+
+CONSUMIDOR = 'refrescar_estadisticas'  # Nombre con que el GestorCuota suma lo gastado por este comando
+
+
+class Command(BaseCommand):
+    help = 'Refresca vistas/likes/comentarios de los videos en lotes de 50, priorizando los más activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--presupuesto', type=int,
+            default=getattr(settings, 'YOUTUBE_PRESUPUESTO_ESTADISTICAS', 2000),
+            help='Unidades de cuota diarias disponibles para el refresco (1 unidad = 50 videos)'
+        )
+        parser.add_argument('--lote', type=int, default=500, help='Videos consultados por iteración')
+        parser.add_argument('--max-videos', type=int, default=None, help='Detenerse tras refrescar N videos')
+        parser.add_argument(
+            '--intervalo', type=int, default=None,
+            help='Modo worker: repetir cada N segundos en lugar de terminar'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.refrescar(options['presupuesto'], options['lote'], options['max_videos'])
+            if options['intervalo'] is None:
+                break
+            time.sleep(options['intervalo'])
+
+    def refrescar(self, presupuesto, tamano_lote, max_videos):
+        """Una pasada: refresca los videos pendientes hasta agotar el presupuesto del día"""
+        servicio = YouTubeService()
+        inicio = time.perf_counter()
+        videos_refrescados = 0
+        unidades = 0
+
+        while max_videos is None or videos_refrescados < max_videos:
+            cuota = obtener_gestor_cuota().estado()
+            # El presupuesto propio, sin pasar de lo que queda de la cuota común del día
+            disponibles = min(presupuesto - cuota['por_consumidor'].get(CONSUMIDOR, 0), cuota['restante_dia'])
+            if disponibles <= 0:
+                self.stdout.write(self.style.WARNING('Presupuesto diario de cuota agotado'))
+                break
+
+            limite = min(tamano_lote, disponibles * TAMANO_LOTE)
+            if max_videos is not None:
+                limite = min(limite, max_videos - videos_refrescados)
+
+            pendientes = self.pendientes(timezone.now(), limite)
+            if not pendientes:
+                break
+
+            try:
+                with a_cuenta_de(CONSUMIDOR):
+                    estadisticas = servicio.obtener_estadisticas([video.youtube_id for video in pendientes])
+            except CuotaAgotada as e:
+                # La cuota compartida la consumieron otros procesos: la próxima pasada sigue desde aquí
+                self.stdout.write(self.style.WARNING(str(e)))
+                break
+            ahora = timezone.now()
+
+            for video in pendientes:
+                # Los videos eliminados de YouTube también se marcan para no reintentarlos cada vez
+                for campo, valor in estadisticas.get(video.youtube_id, {}).items():
+                    setattr(video, campo, valor)
+                video.estadisticas_actualizadas = ahora
+
+            # El progreso queda en estadisticas_actualizadas: tras una caída se continúa donde quedó
+            Video.objects.bulk_update(
+                pendientes, ['vistas', 'likes', 'comentarios', 'estadisticas_actualizadas'], batch_size=TAMANO_LOTE
+            )
+
+            videos_refrescados += len(pendientes)
+            unidades += math.ceil(len(pendientes) / TAMANO_LOTE)
+
+        if videos_refrescados:
+            invalidar_todos_los_totales()  # bulk_update no emite señales
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{videos_refrescados} videos refrescados en {segundos:.1f}s "
+            f"({videos_refrescados / segundos if segundos else 0:.1f} videos/s, "
+            f"{unidades / videos_refrescados if videos_refrescados else 0:.3f} unidades/video, "
+            f"{unidades} unidades)"
+        ))
+
+    @staticmethod
+    def pendientes(ahora, limite):
+        """
+        Hasta `limite` videos cuyo intervalo de refresco venció, de los niveles más activos a los estables
+
+        Cada nivel es un rango sobre el índice de estadisticas_actualizadas
+        (nunca refrescados o anteriores a su intervalo), recorrido en el orden
+        de esa misma columna: los más atrasados primero, sin anotar ni ordenar
+        la tabla entera. La condición del nivel se evalúa sobre las filas del
+        rango, que suelen ser pocas.
+        """
+        elegidos = {}
+        for _, condicion, intervalo in NIVELES + [(NIVEL_ESTABLE[0], None, NIVEL_ESTABLE[1])]:
+            faltan = limite - len(elegidos)
+            if faltan <= 0:
+                break
+            vencidos = Video.objects.filter(
+                Q(estadisticas_actualizadas__isnull=True) | Q(estadisticas_actualizadas__lt=ahora - intervalo)
+            )
+            if condicion is not None:
+                vencidos = vencidos.filter(condicion(ahora))
+            if elegidos:
+                vencidos = vencidos.exclude(pk__in=list(elegidos))  # Ya tomados por un nivel anterior
+            for video in (
+                vencidos.order_by('estadisticas_actualizadas')
+                .only('id', 'youtube_id', 'vistas', 'likes', 'comentarios', 'estadisticas_actualizadas')[:faltan]
+            ):
+                elegidos[video.pk] = video
+        return list(elegidos.values())
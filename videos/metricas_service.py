@@ -0,0 +1,168 @@
+import bisect  # Bucket de cada observación
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger('videos.metricas')
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# nombre -> (tipo, descripción, buckets) de las métricas que se exportan
+METRICAS = {
+    'youtube_api_llamadas_total': ('counter', 'Llamadas a la API de YouTube por método y resultado', None),
+    'youtube_api_duracion_segundos': ('histogram', 'Latencia de las llamadas a la API de YouTube', BUCKETS_SEGUNDOS),
+    'youtube_api_bytes_enviados_total': ('counter', 'Bytes enviados a la API (cuerpos y fragmentos de subida)', None),
+    'youtube_api_bytes_recibidos_total': ('counter', 'Bytes de respuesta recibidos de la API', None),
+    'youtube_cuota_unidades_total': ('counter', 'Unidades de cuota reservadas por método', None),
+    'youtube_cuota_rechazos_total': ('counter', 'Llamadas no enviadas por falta de cuota', None),
+    'youtube_cuota_restante_dia': ('gauge', 'Unidades que quedan en el día de cuota', None),
+    'youtube_cuota_tokens': ('gauge', 'Tokens disponibles en el balde de cuota', None),
+    'miniaturas_total': ('counter', 'Miniaturas por resultado (disco, generada, descargada, error)', None),
+    'miniaturas_podas_total': ('counter', 'Podas LRU del almacén de miniaturas en disco', None),
+    'http_peticiones_total': ('counter', 'Peticiones atendidas por vista, método y estado', None),
+    'http_duracion_segundos': ('histogram', 'Tiempo de respuesta por vista', BUCKETS_SEGUNDOS),
+    'db_consultas_por_peticion': ('histogram', 'Consultas SQL por petición', BUCKETS_CONSULTAS),
+    'db_duracion_segundos': ('histogram', 'Tiempo en la base de datos por petición', BUCKETS_SEGUNDOS),
+}
+
+
+class Registro:
+    """
+    Contadores, gauges e histogramas en memoria con formato de exposición de Prometheus
+
+    Es por proceso, como los clientes de Prometheus: con varios workers cada
+    uno expone los suyos y Prometheus los suma al consultar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._valores = {}  # (nombre, etiquetas) -> número
+        self._histogramas = {}  # (nombre, etiquetas) -> [conteos por bucket..., +Inf, suma]
+
+    @staticmethod
+    def _etiquetas(etiquetas):
+        return tuple(sorted((clave, str(valor)) for clave, valor in etiquetas.items()))
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, self._etiquetas(etiquetas))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def fijar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            self._valores[(nombre, self._etiquetas(etiquetas))] = valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        buckets = METRICAS[nombre][2]
+        clave = (nombre, self._etiquetas(etiquetas))
+        with self._lock:
+            conteos = self._histogramas.setdefault(clave, [0] * (len(buckets) + 1) + [0.0])
+            conteos[bisect.bisect_left(buckets, valor)] += 1  # Bucket "le" más chico que lo contiene
+            conteos[-1] += valor
+
+    def limpiar(self):
+        with self._lock:
+            self._valores.clear()
+            self._histogramas.clear()
+
+    @staticmethod
+    def _formatear(etiquetas, extra=()):
+        pares = [*etiquetas, *extra]
+        if not pares:
+            return ''
+        escapar = lambda valor: valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{clave}="{escapar(valor)}"' for clave, valor in pares) + '}'
+
+    def exportar(self):
+        """Texto en el formato de exposición de Prometheus (text/plain; version=0.0.4)"""
+        with self._lock:
+            valores = dict(self._valores)
+            histogramas = {clave: list(conteos) for clave, conteos in self._histogramas.items()}
+
+        lineas = []
+        for nombre, (tipo, descripcion, buckets) in METRICAS.items():
+            series = sorted(
+                (etiquetas, dato) for (metrica, etiquetas), dato in (histogramas if buckets else valores).items()
+                if metrica == nombre
+            )
+            if not series:
+                continue
+            lineas += [f"# HELP {nombre} {descripcion}", f"# TYPE {nombre} {tipo}"]
+            for etiquetas, dato in series:
+                if not buckets:
+                    lineas.append(f"{nombre}{self._formatear(etiquetas)} {dato}")
+                    continue
+                acumulado = 0
+                for limite, conteo in zip([*buckets, '+Inf'], dato[:-1]):
+                    acumulado += conteo
+                    lineas.append(f"{nombre}_bucket{self._formatear(etiquetas, [('le', str(limite))])} {acumulado}")
+                lineas.append(f"{nombre}_sum{self._formatear(etiquetas)} {round(dato[-1], 6)}")
+                lineas.append(f"{nombre}_count{self._formatear(etiquetas)} {acumulado}")
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()  # Registro del proceso
+
+
+def resultado_error(error):
+    """Etiqueta corta de un error: 'http_503' para respuestas HTTP, si no el nombre de la excepción"""
+    estado = (
+        getattr(getattr(error, 'resp', None), 'status', None)  # googleapiclient.errors.HttpError
+        or getattr(getattr(error, 'response', None), 'status_code', None)  # httpx.HTTPStatusError
+    )
+    return f"http_{estado}" if estado else type(error).__name__
+
+
+@contextmanager
+def medir_llamada(metodo):
+    """
+    Mide una llamada a la API: latencia, bytes, resultado y un log estructurado
+
+    El bloque puede completar los bytes en el dict que recibe:
+
+        with medir_llamada('youtube.videos.list') as medicion:
+            respuesta = ...
+            medicion['recibidos'] = len(contenido)
+    """
+    medicion = {'enviados': 0, 'recibidos': 0}
+    resultado = 'ok'
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    except Exception as e:
+        resultado = resultado_error(e)
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        registro.incrementar('youtube_api_llamadas_total', metodo=metodo, resultado=resultado)
+        registro.observar('youtube_api_duracion_segundos', segundos, metodo=metodo)
+        if medicion['enviados']:
+            registro.incrementar('youtube_api_bytes_enviados_total', medicion['enviados'], metodo=metodo)
+        if medicion['recibidos']:
+            registro.incrementar('youtube_api_bytes_recibidos_total', medicion['recibidos'], metodo=metodo)
+        logger.debug('llamada_api', extra={'metricas': {
+            'metodo': metodo,
+            'resultado': resultado,
+            'ms': round(segundos * 1000, 2),
+            **medicion,
+        }})
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos de `extra={'metricas': {...}}`"""
+
+    def format(self, record):
+        datos = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'evento': record.getMessage(),
+            **getattr(record, 'metricas', {}),
+        }
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
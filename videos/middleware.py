@@ -0,0 +1,52 @@
+import time
+
+from django.db import connection
+
+from .metricas_service import logger, registro
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición: tiempo total, consultas SQL y tiempo en la base de datos
+
+    Las métricas se agrupan por nombre de vista (no por URL, para no crear
+    una serie por cada ID) y cada petición deja una línea de log estructurado.
+    Va primero en MIDDLEWARE para incluir las consultas de sesión y auth.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = {'cantidad': 0, 'segundos': 0.0}
+
+        def contar(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                consultas['cantidad'] += 1
+                consultas['segundos'] += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contar):
+            response = self.get_response(request)
+        segundos = time.perf_counter() - inicio
+
+        coincidencia = request.resolver_match
+        vista = coincidencia.view_name if coincidencia else 'sin_ruta'
+        registro.incrementar('http_peticiones_total', vista=vista, metodo=request.method, estado=response.status_code)
+        registro.observar('http_duracion_segundos', segundos, vista=vista)
+        registro.observar('db_consultas_por_peticion', consultas['cantidad'], vista=vista)
+        registro.observar('db_duracion_segundos', consultas['segundos'], vista=vista)
+
+        logger.info('peticion', extra={'metricas': {
+            'vista': vista,
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'ms': round(segundos * 1000, 2),
+            'consultas': consultas['cantidad'],
+            'ms_bd': round(consultas['segundos'] * 1000, 2),
+        }})
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_youtube_credentials'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='estadisticas_actualizadas',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Declarado en models.py desde el inicio pero ausente de 0001_initial
+        migrations.CreateModel(
+            name='YouTubeCredentials',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='youtube_creds', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
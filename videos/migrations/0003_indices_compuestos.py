@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_estadisticas_actualizadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['fecha_publicacion'], name='video_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['agregado_por', 'fecha_publicacion'], name='video_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['agregado_por', 'categoria', 'fecha_publicacion'], name='video_usr_cat_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['canal_id', 'fecha_publicacion'], name='video_canal_fecha_idx'),
+        ),
+    ]
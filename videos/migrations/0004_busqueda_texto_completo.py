@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+INDICE = 'video_busqueda_ft'
+
+
+def crear_indice_fulltext(apps, schema_editor):
+    # Solo MySQL/MariaDB: en SQLite (pruebas) la búsqueda usa el respaldo con LIKE
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        f"CREATE FULLTEXT INDEX {INDICE} ON videos_video (titulo, descripcion, etiquetas)"
+    )
+
+
+def borrar_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(f"DROP INDEX {INDICE} ON videos_video")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0003_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_fulltext, borrar_indice_fulltext),
+    ]
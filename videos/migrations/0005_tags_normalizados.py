@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_busqueda_texto_completo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='etiquetas',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='VideoTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='videos.tag')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='videos.video')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='videos', through='videos.VideoTag', to='videos.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='videotag',
+            index=models.Index(fields=['tag', 'video'], name='videotag_tag_video_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='videotag',
+            constraint=models.UniqueConstraint(fields=('video', 'tag'), name='videotag_unico'),
+        ),
+    ]
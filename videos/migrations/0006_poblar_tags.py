@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+LOTE = 2000  # Videos procesados por iteración
+
+
+def normalizar(texto):
+    # Copia de Tag.normalizar: las migraciones no deben depender del código actual del modelo
+    nombres = (etiqueta.strip().lower()[:100] for etiqueta in texto.split(','))
+    return list(dict.fromkeys(nombre for nombre in nombres if nombre))
+
+
+def poblar_tags(apps, schema_editor):
+    Video = apps.get_model('videos', 'Video')
+    Tag = apps.get_model('videos', 'Tag')
+    VideoTag = apps.get_model('videos', 'VideoTag')
+
+    filas = Video.objects.exclude(etiquetas='').values_list('id', 'etiquetas').order_by('id')
+    ultimo_id = 0
+    while True:
+        lote = list(filas.filter(id__gt=ultimo_id)[:LOTE])
+        if not lote:
+            break
+        ultimo_id = lote[-1][0]
+
+        por_video = {video_id: normalizar(etiquetas) for video_id, etiquetas in lote}
+        nombres = {nombre for lista in por_video.values() for nombre in lista}
+
+        Tag.objects.bulk_create([Tag(nombre=nombre) for nombre in nombres], ignore_conflicts=True)
+        ids = dict(Tag.objects.filter(nombre__in=nombres).values_list('nombre', 'id'))
+        for nombre in nombres - ids.keys():
+            # Con collation *_ai_ci 'canción' y 'cancion' son la misma fila
+            ids[nombre] = Tag.objects.filter(nombre=nombre).values_list('id', flat=True).first()
+
+        VideoTag.objects.bulk_create(
+            [
+                VideoTag(video_id=video_id, tag_id=ids[nombre])
+                for video_id, lista in por_video.items()
+                for nombre in lista
+                if ids[nombre] is not None
+            ],
+            ignore_conflicts=True,
+            batch_size=5000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_tags_normalizados'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_poblar_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('subiendo', 'Subiendo'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo_path', models.CharField(max_length=500)),
+                ('titulo', models.CharField(max_length=300)),
+                ('descripcion', models.TextField(blank=True)),
+                ('categoria', models.CharField(max_length=50)),
+                ('privacidad', models.CharField(default='private', max_length=20)),
+                ('bytes_enviados', models.BigIntegerField(default=0)),
+                ('bytes_totales', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_jobs', to=settings.AUTH_USER_MODEL)),
+                ('video', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='videos.video')),
+            ],
+            options={
+                'ordering': ['creado'],
+                'indexes': [models.Index(fields=['estado', 'creado'], name='uploadjob_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0007_upload_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='sesion_uri',
+            field=models.TextField(blank=True),
+        ),
+    ]
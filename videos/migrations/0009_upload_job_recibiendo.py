@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0008_upload_job_sesion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadjob',
+            name='estado',
+            field=models.CharField(choices=[('recibiendo', 'Recibiendo'), ('pendiente', 'Pendiente'), ('subiendo', 'Subiendo'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20),
+        ),
+    ]
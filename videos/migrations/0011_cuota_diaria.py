@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0010_lotes_subida'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuotaDiaria',
+            fields=[
+                ('clave', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('dia', models.DateField(db_index=True)),
+                ('tokens', models.FloatField()),
+                ('recargado', models.FloatField()),
+                ('consumido', models.PositiveIntegerField(default=0)),
+                ('rechazos', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConsumoCuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(max_length=100)),
+                ('consumidor', models.CharField(blank=True, max_length=50)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('cuota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='videos.cuotadiaria')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cuota', 'metodo', 'consumidor'), name='consumocuota_unico')],
+            },
+        ),
+    ]
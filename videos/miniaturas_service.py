@@ -0,0 +1,283 @@
+import hashlib  # ETag de cada variante
+import os
+import re
+import shutil
+import tempfile  # Escrituras atómicas (temporal + rename)
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor  # Precarga en paralelo durante la ingesta
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import httpx  # Descarga de la miniatura original
+from PIL import Image, ImageOps, UnidentifiedImageError  # Variantes redimensionadas en WebP
+from django.conf import settings
+
+from .metricas_service import registro
+
+
+HOSTS_PERMITIDOS = frozenset({'i.ytimg.com', 'i9.ytimg.com', 'img.youtube.com'})  # Solo miniaturas de YouTube
+MAX_BYTES_ORIGINAL = 2 * 1024 * 1024  # Una miniatura maxres ronda los 200 KB
+PROPORCION = 16 / 9  # Las tarjetas muestran 16:9: se recortan las barras negras de hqdefault (4:3)
+ORIGINAL = 'original'  # Nombre del archivo descargado dentro del directorio del video
+
+_ID_VALIDO = re.compile(r'[\w-]{1,20}')  # youtube_id: también evita rutas como '..'
+
+
+class MiniaturaNoDisponible(Exception):
+    """La miniatura no se pudo descargar o convertir (la vista redirige a la original)"""
+
+
+class AlmacenMiniaturas:
+    """
+    Miniaturas de YouTube en disco, con variantes WebP por ancho y desalojo LRU
+
+    Estructura: <directorio>/<2 primeros caracteres>/<youtube_id>/original y
+    <ancho>.webp. El mtime de cada archivo marca su último uso (se actualiza a
+    lo sumo cada `toque` segundos, para no escribir en cada lectura); cuando
+    el total supera `max_bytes` se borran los menos usados hasta bajar al 90 %.
+
+    El total se mide una vez y después se lleva como contador (+ al guardar,
+    - al podar o invalidar): el directorio solo se recorre al podar, y
+    nunca con el lock tomado.
+
+    Varios procesos pueden compartir el directorio: cada archivo se escribe
+    en un temporal y se renombra, y la poda vuelve a medir el disco.
+    """
+
+    def __init__(self, directorio, max_bytes, anchos, calidad=80, timeout=10, toque=3600, max_age=7 * 86400):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.anchos = tuple(anchos)
+        self.calidad = calidad  # Calidad WebP (0-100)
+        self.timeout = timeout  # Segundos para descargar la original
+        self.toque = toque
+        self.max_age = max_age  # Cache-Control de las respuestas
+        self._lock = threading.Lock()  # Protege solo el contador
+        self._poda = threading.Lock()  # Una poda a la vez por proceso
+        self._bytes = None  # Tamaño total estimado (None = aún sin medir)
+
+    def _ruta(self, youtube_id, nombre=None):
+        if not _ID_VALIDO.fullmatch(youtube_id):
+            raise ValueError(f"ID de video inválido: {youtube_id!r}")
+        carpeta = os.path.join(self.directorio, youtube_id[:2], youtube_id)
+        return carpeta if nombre is None else os.path.join(carpeta, nombre)
+
+    def _variante(self, youtube_id, ancho):
+        if ancho not in self.anchos:
+            raise ValueError(f"Ancho no soportado: {ancho}")
+        return self._ruta(youtube_id, f"{ancho}.webp")
+
+    def leer(self, youtube_id, ancho):
+        """Bytes de la variante si ya está en disco (None si hay que generarla)"""
+        return self._leer(self._variante(youtube_id, ancho))
+
+    def _leer(self, ruta):
+        try:
+            with open(ruta, 'rb') as archivo:
+                contenido = archivo.read()
+                ultimo_uso = os.fstat(archivo.fileno()).st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - ultimo_uso > self.toque:
+            try:
+                os.utime(ruta)  # Marca de uso para el LRU
+            except FileNotFoundError:
+                pass  # La podó otro proceso entre la lectura y el toque
+        return contenido
+
+    def generar(self, youtube_id, ancho, url_original):
+        """
+        Descarga la original si hace falta, genera la variante y la guarda
+
+        Raises:
+            MiniaturaNoDisponible: Si la descarga o la conversión fallan
+        """
+        ruta = self._variante(youtube_id, ancho)
+        original = self._leer(self._ruta(youtube_id, ORIGINAL))
+        if original is None:
+            original = self._descargar(url_original)
+            self._guardar(self._ruta(youtube_id, ORIGINAL), original)
+
+        try:
+            with Image.open(BytesIO(original)) as imagen:
+                variante = ImageOps.fit(
+                    imagen.convert('RGB'), (ancho, round(ancho / PROPORCION)), Image.Resampling.LANCZOS
+                )
+        except (UnidentifiedImageError, OSError) as e:
+            raise MiniaturaNoDisponible(f"Imagen inválida para {youtube_id}: {e}") from e
+
+        salida = BytesIO()
+        variante.save(salida, 'WEBP', quality=self.calidad, method=4)  # method 4: buen balance tamaño/CPU
+        contenido = salida.getvalue()
+        self._guardar(ruta, contenido)
+        return contenido
+
+    def _descargar(self, url):
+        partes = urlsplit(url)
+        if partes.scheme != 'https' or partes.hostname not in HOSTS_PERMITIDOS:
+            raise MiniaturaNoDisponible(f"URL de miniatura no permitida: {url}")
+        try:
+            # Sin seguir redirecciones: un 3xx podría llevar fuera de HOSTS_PERMITIDOS (SSRF)
+            with httpx.stream('GET', url, timeout=self.timeout, follow_redirects=False) as respuesta:
+                if respuesta.status_code != 200:
+                    raise MiniaturaNoDisponible(f"{url} respondió {respuesta.status_code}")
+                contenido = bytearray()
+                for bloque in respuesta.iter_bytes():
+                    contenido += bloque
+                    if len(contenido) > MAX_BYTES_ORIGINAL:
+                        raise MiniaturaNoDisponible(f"{url} supera {MAX_BYTES_ORIGINAL} bytes")
+        except httpx.HTTPError as e:
+            raise MiniaturaNoDisponible(f"No se pudo descargar {url}: {e}") from e
+        registro.incrementar('miniaturas_total', resultado='descargada')
+        return bytes(contenido)
+
+    def _guardar(self, ruta, contenido):
+        carpeta = os.path.dirname(ruta)
+        os.makedirs(carpeta, exist_ok=True)
+        try:
+            previo = os.stat(ruta).st_size  # Otro hilo o proceso ya la generó: se reemplaza
+        except FileNotFoundError:
+            previo = 0
+        descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)  # Atómico: un lector nunca ve un archivo a medias
+        except BaseException:
+            os.remove(temporal)
+            raise
+
+        if self._sumar(len(contenido) - previo) > self.max_bytes:
+            self.podar()
+
+    def _sumar(self, diferencia):
+        """Ajusta el total estimado y lo devuelve; la primera vez mide el directorio (fuera del lock)"""
+        if self._bytes is None:
+            medido = self._medir()[1]  # Ya incluye el archivo recién escrito
+            with self._lock:
+                if self._bytes is None:
+                    self._bytes = medido
+                    return medido
+        with self._lock:
+            self._bytes = max(self._bytes + diferencia, 0)
+            return self._bytes
+
+    def _medir(self):
+        """(archivos como (último uso, tamaño, ruta), total en bytes) del directorio"""
+        archivos = []
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                archivos.append((estado.st_mtime, estado.st_size, ruta))
+        return archivos, sum(tamano for _, tamano, _ in archivos)
+
+    def podar(self):
+        """Borra los archivos menos usados hasta dejar el total en el 90 % de max_bytes"""
+        if not self._poda.acquire(blocking=False):
+            return  # Ya está podando otro hilo
+        try:
+            with self._lock:
+                al_empezar = self._bytes or 0
+            archivos, total = self._medir()  # Recalibra: otros procesos también escriben
+            objetivo = self.max_bytes * 0.9  # Margen para no podar en cada escritura
+            for _, tamano, ruta in sorted(archivos):
+                if total <= objetivo:
+                    break
+                try:
+                    os.remove(ruta)
+                    os.rmdir(os.path.dirname(ruta))  # Solo si quedó vacío
+                except OSError:
+                    pass
+                total -= tamano
+            with self._lock:
+                # Lo que este proceso escribió mientras se recorría el disco no entró en la medición
+                self._bytes = total + max((self._bytes or 0) - al_empezar, 0)
+        finally:
+            self._poda.release()
+        registro.incrementar('miniaturas_podas_total')
+
+    def invalidar(self, youtube_id):
+        """Borra la original y las variantes de un video (cambió su miniatura)"""
+        carpeta = self._ruta(youtube_id)
+        liberados = 0
+        try:
+            with os.scandir(carpeta) as entradas:
+                for entrada in entradas:
+                    try:
+                        liberados += entrada.stat().st_size
+                    except FileNotFoundError:
+                        pass  # La podó otro proceso
+        except FileNotFoundError:
+            return  # Los videos nuevos no tienen nada en disco
+        shutil.rmtree(carpeta, ignore_errors=True)
+        if self._bytes is not None:
+            self._sumar(-liberados)
+
+    def precargar(self, urls, hilos=8):
+        """
+        Genera todas las variantes de varios videos en paralelo
+
+        Args:
+            urls: dict youtube_id -> url de la miniatura original
+
+        Returns:
+            int: Videos cuyas variantes quedaron en disco
+        """
+        def precargar_video(par):
+            youtube_id, url = par
+            try:
+                for ancho in self.anchos:
+                    if self.leer(youtube_id, ancho) is None:
+                        self.generar(youtube_id, ancho, url)
+            except (MiniaturaNoDisponible, ValueError):
+                registro.incrementar('miniaturas_total', resultado='error')
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            return sum(pool.map(precargar_video, urls.items()))
+
+
+_almacen = None
+_almacen_lock = threading.Lock()
+
+
+def obtener_almacen():
+    """Almacén configurado en settings.YOUTUBE_MINIATURAS (uno por proceso)"""
+    global _almacen
+    with _almacen_lock:
+        if _almacen is None:
+            config = getattr(settings, 'YOUTUBE_MINIATURAS', {})
+            _almacen = AlmacenMiniaturas(
+                directorio=config.get('DIR', os.path.join(settings.BASE_DIR, 'media', 'miniaturas')),
+                max_bytes=config.get('MAX_BYTES', 512 * 1024 * 1024),
+                anchos=config.get('ANCHOS', (160, 320, 480)),
+                calidad=config.get('CALIDAD', 80),
+                max_age=config.get('MAX_AGE', 7 * 86400)
+            )
+    return _almacen
+
+
+def actualizar_miniaturas(urls):
+    """
+    Ingesta: descarta las variantes viejas de videos nuevos o con otra miniatura
+    y, con YOUTUBE_MINIATURAS['PRECARGAR'], las genera de una vez
+
+    Args:
+        urls: dict youtube_id -> url_thumbnail
+    """
+    almacen = obtener_almacen()
+    for youtube_id in urls:
+        almacen.invalidar(youtube_id)
+    if getattr(settings, 'YOUTUBE_MINIATURAS', {}).get('PRECARGAR'):
+        almacen.precargar({youtube_id: url for youtube_id, url in urls.items() if url})
+
+
+def etag(contenido):
+    """ETag fuerte de una variante (hash del contenido: el mtime cambia con cada uso)"""
+    return '"' + hashlib.md5(contenido, usedforsecurity=False).hexdigest() + '"'
@@ -25,6 +25,7 @@ class Video(models.Model):
     vistas = models.BigIntegerField(default=0)  # Visualizaciones en YouTube
     likes = models.IntegerField(default=0)  # Me gusta
     comentarios = models.IntegerField(default=0)  # Cantidad de comentarios
+    estadisticas_actualizadas = models.DateTimeField(null=True, blank=True, db_index=True)  # Último refresco de stats
     
     # Categorización local
     categoria = models.CharField(max_length=50, choices=[  # Categorías personalizadas
@@ -34,7 +35,8 @@ class Video(models.Model):
         ('seguridad', 'Seguridad'),
         ('otro', 'Otro'),
     ])
-    etiquetas = models.CharField(max_length=500, blank=True)  # Tags separados por comas
+    etiquetas = models.TextField(blank=True)  # Tags separados por comas (copia para la búsqueda FULLTEXT)
+    tags = models.ManyToManyField('Tag', through='VideoTag', related_name='videos', blank=True)  # Tags normalizados
     
     # Relaciones
     agregado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)  # Usuario que agregó
@@ -46,6 +48,15 @@ class Video(models.Model):
     class Meta:
         ordering = ['-fecha_publicacion']  # Más recientes primero
         verbose_name_plural = 'Videos'
+        indexes = [
+            # Recorridos ordenados por fecha (inicio, paginación por cursor)
+            models.Index(fields=['fecha_publicacion'], name='video_fecha_idx'),
+            # mis_videos: filtro por usuario (y categoría) ordenado por fecha
+            models.Index(fields=['agregado_por', 'fecha_publicacion'], name='video_usuario_fecha_idx'),
+            models.Index(fields=['agregado_por', 'categoria', 'fecha_publicacion'], name='video_usr_cat_fecha_idx'),
+            # Sincronización y listados por canal
+            models.Index(fields=['canal_id', 'fecha_publicacion'], name='video_canal_fecha_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
@@ -56,9 +67,47 @@ class Video(models.Model):
 
     @property
     def lista_etiquetas(self):
-        if self.etiquetas:
-            return self.etiquetas.split(',')
-        return []
+        # Usa prefetch_related('tags') si la vista lo hizo
+        return [tag.nombre for tag in self.tags.all()]
+
+
+class Tag(models.Model):
+    """Etiqueta de YouTube normalizada (una fila por nombre)"""
+    
+    nombre = models.CharField(max_length=100, unique=True)  # En minúsculas, sin espacios extremos
+    
+    def __str__(self):
+        return self.nombre
+    
+    @staticmethod
+    def normalizar(etiquetas):
+        """
+        Nombres normalizados y sin duplicados
+        
+        Args:
+            etiquetas: Lista de tags o string separado por comas
+        """
+        if isinstance(etiquetas, str):
+            etiquetas = etiquetas.split(',')
+        nombres = (etiqueta.strip().lower()[:100] for etiqueta in etiquetas)
+        return list(dict.fromkeys(nombre for nombre in nombres if nombre))
+
+
+class VideoTag(models.Model):
+    """Tabla intermedia Video-Tag con índices en ambas direcciones"""
+    
+    video = models.ForeignKey(Video, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    
+    class Meta:
+        constraints = [
+            # (video, tag): tags de un video; también evita duplicados
+            models.UniqueConstraint(fields=['video', 'tag'], name='videotag_unico'),
+        ]
+        indexes = [
+            # (tag, video): videos de un tag y conteos por tag sin leer la tabla Video
+            models.Index(fields=['tag', 'video'], name='videotag_tag_video_idx'),
+        ]
 
 
 class Playlist(models.Model):
@@ -81,4 +130,97 @@ class YouTubeCredentials(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Credenciales de {self.user.username}"
\ No newline at end of file
+        return f"Credenciales de {self.user.username}"
+
+class LoteSubida(models.Model):
+    """Grupo de subidas enviadas juntas por la API de lotes (progreso agregado)"""
+    
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lotes_subida')
+    creado = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Lote #{self.pk} de {self.usuario}"
+
+
+class UploadJob(models.Model):
+    """Subida a YouTube en cola, procesada por el worker `manage.py procesar_subidas`"""
+    
+    RECIBIENDO = 'recibiendo'  # Transmisión: el navegador aún envía el archivo
+    PENDIENTE = 'pendiente'
+    SUBIENDO = 'subiendo'
+    COMPLETADO = 'completado'
+    ERROR = 'error'
+    
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_jobs')  # Dueño de la subida
+    lote = models.ForeignKey(LoteSubida, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    estado = models.CharField(max_length=20, default=PENDIENTE, choices=[
+        (RECIBIENDO, 'Recibiendo'),
+        (PENDIENTE, 'Pendiente'),
+        (SUBIENDO, 'Subiendo'),
+        (COMPLETADO, 'Completado'),
+        (ERROR, 'Error'),
+    ])
+    
+    # Archivo y metadatos del formulario
+    archivo_path = models.CharField(max_length=500)  # Ruta absoluta del archivo temporal
+    titulo = models.CharField(max_length=300)
+    descripcion = models.TextField(blank=True)
+    categoria = models.CharField(max_length=50)  # ID de categoría de YouTube
+    privacidad = models.CharField(max_length=20, default='private')
+    
+    # Progreso
+    sesion_uri = models.TextField(blank=True)  # URI de la sesión resumable de YouTube
+    bytes_enviados = models.BigIntegerField(default=0)  # Offset confirmado por el servidor
+    bytes_totales = models.BigIntegerField(default=0)
+    iniciado = models.DateTimeField(null=True, blank=True)  # Primera vez que se tomó: consume cuota de videos.insert
+    
+    # Resultado
+    video = models.ForeignKey(Video, on_delete=models.SET_NULL, null=True, blank=True)  # Video creado al terminar
+    error = models.TextField(blank=True)
+    
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['creado']  # FIFO
+        indexes = [
+            models.Index(fields=['estado', 'creado'], name='uploadjob_estado_idx'),  # Siguiente pendiente
+        ]
+    
+    def __str__(self):
+        return f"{self.titulo} ({self.estado})"
+    
+    @property
+    def progreso(self):
+        """Fracción subida entre 0 y 1"""
+        if self.estado == self.COMPLETADO:
+            return 1.0
+        return self.bytes_enviados / self.bytes_totales if self.bytes_totales else 0.0
+
+
+class CuotaDiaria(models.Model):
+    """Token bucket de cuota de la API de un día, compartido por todos los procesos (ver cuota_service)"""
+    
+    clave = models.CharField(max_length=100, primary_key=True)  # '<prefijo>:<día de cuota>'
+    dia = models.DateField(db_index=True)  # Día de cuota (medianoche del Pacífico); para purgar los viejos
+    tokens = models.FloatField()  # Tokens en el balde al momento de `recargado`
+    recargado = models.FloatField()  # time.time() de la última recarga
+    consumido = models.PositiveIntegerField(default=0)  # Unidades gastadas en el día
+    rechazos = models.PositiveIntegerField(default=0)  # Llamadas no enviadas por falta de cuota
+    
+    def __str__(self):
+        return f"{self.clave}: {self.consumido} unidades"
+
+
+class ConsumoCuota(models.Model):
+    """Unidades gastadas en un día por método de la API y por consumidor"""
+    
+    cuota = models.ForeignKey(CuotaDiaria, on_delete=models.CASCADE, related_name='consumos')
+    metodo = models.CharField(max_length=100)  # 'youtube.videos.list'
+    consumidor = models.CharField(max_length=50, blank=True)  # Tarea que reservó ('' = sin atribuir)
+    unidades = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cuota', 'metodo', 'consumidor'], name='consumocuota_unico'),
+        ]
@@ -0,0 +1,214 @@
+import re
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+
+import isodate  # Solo para duraciones poco comunes (semanas, fracciones de segundo)
+
+
+# Campos del video normalizado, en el orden en que se exponen
+CAMPOS = (
+    'youtube_id', 'titulo', 'descripcion', 'canal_id', 'canal_nombre', 'fecha_publicacion',
+    'url_thumbnail', 'url_video', 'duracion', 'duracion_segundos', 'vistas', 'likes', 'comentarios', 'etiquetas',
+)
+
+CALIDADES_MINIATURA = ('high', 'medium', 'standard', 'default', 'maxres')  # De la preferida a la última opción
+
+# PnDTnHnMnS: la forma que usa YouTube (PT15M30S, P1DT2H, P0D en directos)
+_DURACION = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+
+
+@lru_cache(maxsize=4096)  # Las duraciones se repiten mucho entre videos
+def duracion_en_segundos(iso):
+    """
+    Segundos de una duración ISO 8601 ('PT1H2M3S' -> 3723)
+
+    La expresión regular cubre las duraciones de YouTube; el resto pasa por
+    isodate. Una duración inválida cuenta como 0.
+    """
+    coincidencia = _DURACION.fullmatch(iso)
+    if coincidencia is not None:
+        dias, horas, minutos, segundos = (int(grupo) if grupo else 0 for grupo in coincidencia.groups())
+        return ((dias * 24 + horas) * 60 + minutos) * 60 + segundos
+    try:
+        return int(isodate.parse_duration(iso).total_seconds())
+    except (ValueError, TypeError):
+        return 0
+
+
+def mejor_miniatura(thumbnails):
+    """URL de la mejor miniatura disponible ('' si el video no trae ninguna)"""
+    for calidad in CALIDADES_MINIATURA:
+        miniatura = thumbnails.get(calidad)
+        if miniatura and miniatura.get('url'):
+            return miniatura['url']
+    return ''
+
+
+def _filtrar(disponibles, campos):
+    """Campos de `disponibles` pedidos en `campos`, en orden; youtube_id siempre se incluye"""
+    return tuple(campo for campo in disponibles if campo in campos or campo == 'youtube_id')
+
+
+@lru_cache(maxsize=64)  # Cada llamador usa siempre el mismo subconjunto
+def _campos_expuestos(campos):
+    return _filtrar(CAMPOS, campos)
+
+
+# Dónde está cada campo en un item de videos.list: (part, ruta dentro de la parte en sintaxis de fields)
+RUTAS_API = {
+    'titulo': ('snippet', 'title'),
+    'descripcion': ('snippet', 'description'),
+    'canal_id': ('snippet', 'channelId'),
+    'canal_nombre': ('snippet', 'channelTitle'),
+    'fecha_publicacion': ('snippet', 'publishedAt'),
+    'url_thumbnail': ('snippet', 'thumbnails(' + ','.join(f"{calidad}/url" for calidad in CALIDADES_MINIATURA) + ')'),
+    'etiquetas': ('snippet', 'tags'),
+    'duracion': ('contentDetails', 'duration'),
+    'duracion_segundos': ('contentDetails', 'duration'),
+    'vistas': ('statistics', 'viewCount'),
+    'likes': ('statistics', 'likeCount'),
+    'comentarios': ('statistics', 'commentCount'),
+}
+
+
+@lru_cache(maxsize=64)
+def mascara_videos(campos):
+    """
+    Parámetros part y fields mínimos de videos.list para un frozenset de campos
+
+    Ej.: {'titulo', 'vistas'} -> ('snippet,statistics', 'items(id,snippet(title),statistics(viewCount))').
+    Sin fields la API devuelve la descripción completa, todas las miniaturas
+    con sus dimensiones, localized, etc.
+    """
+    rutas = {}  # part -> rutas, en el orden de CAMPOS
+    for campo in CAMPOS:
+        if campo in campos and campo in RUTAS_API:
+            parte, ruta = RUTAS_API[campo]
+            if ruta not in rutas.setdefault(parte, []):
+                rutas[parte].append(ruta)
+
+    partes = [parte for parte in ('snippet', 'contentDetails', 'statistics') if parte in rutas]
+    seleccion = ''.join(f",{parte}({','.join(rutas[parte])})" for parte in partes)
+    return ','.join(partes) or 'id', f"items(id{seleccion})"
+
+
+class VideoNormalizado(Mapping):
+    """
+    Video de YouTube normalizado, compacto y de solo lectura para el llamador
+
+    Usa __slots__ (sin __dict__ por instancia) y difiere el trabajo que no
+    siempre se usa: fecha_publicacion se parsea, etiquetas se une y
+    duracion_segundos se calcula recién al leerlos. Se comporta como un
+    dict de solo lectura (video['titulo'], video.get(...), dict(video)), así
+    que sirve donde antes se usaba el diccionario; también como atributos
+    (video.titulo), y en plantillas de las dos formas.
+
+    `campos` limita los campos expuestos a los que pide el llamador.
+    """
+
+    __slots__ = (
+        '_campos', 'youtube_id', 'titulo', 'descripcion', 'canal_id', 'canal_nombre', '_fecha',
+        'url_thumbnail', 'duracion', 'vistas', 'likes', 'comentarios', '_etiquetas',
+    )
+
+    _INTERNOS = {'fecha_publicacion': '_fecha', 'etiquetas': '_etiquetas'}  # Campos con conversión diferida
+    _DERIVADOS = frozenset({'youtube_id', 'url_video', 'duracion_segundos'})  # No se guardan aparte
+
+    def __init__(self, youtube_id, campos=None, **valores):
+        """
+        Args:
+            youtube_id: ID del video
+            campos: Campos expuestos (por defecto todos los de CAMPOS)
+            **valores: Campos de CAMPOS; fecha_publicacion puede ser el texto
+                ISO 8601 y etiquetas la lista de tags
+        """
+        self.youtube_id = youtube_id
+        self._campos = CAMPOS if campos is None else _filtrar(CAMPOS, campos)
+        for campo, valor in valores.items():
+            setattr(self, self._INTERNOS.get(campo, campo), valor)
+
+    @classmethod
+    def desde_item(cls, item, campos=None):
+        """Construye el video a partir de un item de videos.list, exponiendo solo `campos`"""
+        snippet = item.get('snippet', {})
+        detalles = item.get('contentDetails', {})
+        estadisticas = item.get('statistics', {})
+
+        # Asignaciones directas: es el camino caliente de las sincronizaciones masivas
+        video = object.__new__(cls)
+        video._campos = CAMPOS if campos is None else _campos_expuestos(frozenset(campos))
+        video.youtube_id = item['id']
+        video.titulo = snippet.get('title', '')
+        video.descripcion = snippet.get('description', '')
+        video.canal_id = snippet.get('channelId', '')
+        video.canal_nombre = snippet.get('channelTitle', '')
+        video._fecha = snippet.get('publishedAt')  # Texto: se parsea al leerlo
+        video.url_thumbnail = mejor_miniatura(snippet.get('thumbnails', {}))
+        video.duracion = detalles.get('duration', 'PT0S')
+        video.vistas = int(estadisticas.get('viewCount', 0))
+        video.likes = int(estadisticas.get('likeCount', 0))
+        video.comentarios = int(estadisticas.get('commentCount', 0))
+        video._etiquetas = snippet.get('tags', [])  # Lista: se une al leerla
+        return video
+
+    @classmethod
+    def desde_modelo(cls, video):
+        """Construye el video a partir de una fila de la tabla Video"""
+        return cls(video.youtube_id, **{
+            campo: getattr(video, campo) for campo in CAMPOS if campo not in cls._DERIVADOS
+        })
+
+    @property
+    def fecha_publicacion(self):
+        fecha = self._fecha
+        if isinstance(fecha, str):
+            fecha = self._fecha = datetime.fromisoformat(fecha)  # Acepta la 'Z' final (Python 3.11+)
+        return fecha
+
+    @property
+    def etiquetas(self):
+        etiquetas = self._etiquetas
+        if isinstance(etiquetas, list):
+            etiquetas = self._etiquetas = ','.join(etiquetas)
+        return etiquetas
+
+    @property
+    def duracion_segundos(self):
+        return duracion_en_segundos(self.duracion)
+
+    @property
+    def url_video(self):
+        return f"https://www.youtube.com/watch?v={self.youtube_id}"
+
+    def __getitem__(self, campo):
+        if campo not in self._campos:
+            raise KeyError(campo)
+        try:
+            return getattr(self, campo)
+        except AttributeError:  # Campo pedido que el item no traía
+            raise KeyError(campo) from None
+
+    def __iter__(self):
+        return iter(self._campos)
+
+    def __len__(self):
+        return len(self._campos)
+
+    def __repr__(self):
+        return f"VideoNormalizado({self.youtube_id!r}, {self.get('titulo')!r})"
+
+    def actualizar(self, **valores):
+        """Reemplaza campos (p. ej. las estadísticas refrescadas)"""
+        for campo, valor in valores.items():
+            setattr(self, self._INTERNOS.get(campo, campo), valor)
+
+    def copia(self, campos=None):
+        """Copia independiente, opcionalmente limitada a `campos`"""
+        copia = object.__new__(type(self))
+        for slot in self.__slots__:
+            if hasattr(self, slot):
+                setattr(copia, slot, getattr(self, slot))
+        if campos is not None:
+            copia._campos = _filtrar(self._campos, campos)
+        return copia
@@ -0,0 +1,93 @@
+import base64  # Cursores opacos para la URL
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+# Columnas que muestran las vistas de lista (se omiten descripcion y etiquetas)
+CAMPOS_LISTA = (
+    'id', 'youtube_id', 'titulo', 'url_thumbnail', 'canal_nombre',
+    'vistas', 'likes', 'fecha_publicacion',
+)
+
+
+def codificar_cursor(video, campo='fecha_publicacion'):
+    """Cursor opaco con la posición (campo, id) de un video"""
+    valor = getattr(video, campo)
+    valor = valor.isoformat() if isinstance(valor, datetime) else repr(valor)
+    crudo = f"{valor}|{video.pk}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, campo='fecha_publicacion'):
+    """Retorna (valor del campo, id) o None si el cursor no es válido"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        valor, pk = crudo.split('|')
+        convertir = datetime.fromisoformat if campo == 'fecha_publicacion' else float  # relevancia
+        return convertir(valor), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class PaginaKeyset:
+    """Página obtenida con paginación por cursor sobre (-campo, -id)"""
+
+    def __init__(self, videos, siguiente, anterior):
+        self.videos = videos  # Lista de videos de la página
+        self.siguiente = siguiente  # Cursor para la página siguiente (o None)
+        self.anterior = anterior  # Cursor para la página anterior (o None)
+
+    def __iter__(self):
+        return iter(self.videos)
+
+    def __len__(self):
+        return len(self.videos)
+
+    @property
+    def has_other_pages(self):
+        return bool(self.siguiente or self.anterior)
+
+
+def paginar_keyset(queryset, despues=None, antes=None, tamano=20, campo='fecha_publicacion'):
+    """
+    Pagina por cursor en lugar de OFFSET: el costo no crece con el número de página
+
+    Args:
+        queryset: Videos a paginar (se reordenan por -campo, -id)
+        despues: Cursor del último video de la página anterior
+        antes: Cursor del primer video de la página siguiente (para retroceder)
+        tamano: Videos por página
+        campo: Columna o anotación de orden ('fecha_publicacion' o 'relevancia')
+
+    Returns:
+        PaginaKeyset
+    """
+
+    posicion_antes = decodificar_cursor(antes, campo) if antes else None
+    posicion_despues = decodificar_cursor(despues, campo) if despues else None
+
+    if posicion_antes:
+        # Retroceder: se recorre en orden ascendente desde el cursor y se invierte
+        valor, pk = posicion_antes
+        filas = list(
+            queryset.filter(Q(**{f"{campo}__gt": valor}) | Q(**{campo: valor, 'pk__gt': pk}))
+            .order_by(campo, 'pk')[:tamano + 1]
+        )
+        hay_mas = len(filas) > tamano  # Existe una página aún más reciente
+        videos = filas[:tamano][::-1]
+        anterior = codificar_cursor(videos[0], campo) if hay_mas else None
+        siguiente = codificar_cursor(videos[-1], campo) if videos else None
+        return PaginaKeyset(videos, siguiente, anterior)
+
+    if posicion_despues:
+        valor, pk = posicion_despues
+        queryset = queryset.filter(Q(**{f"{campo}__lt": valor}) | Q(**{campo: valor, 'pk__lt': pk}))
+
+    # Una fila extra indica si existe página siguiente sin hacer COUNT
+    filas = list(queryset.order_by(f"-{campo}", '-pk')[:tamano + 1])
+    videos = filas[:tamano]
+    siguiente = codificar_cursor(videos[-1], campo) if len(filas) > tamano else None
+    anterior = codificar_cursor(videos[0], campo) if posicion_despues and videos else None
+    return PaginaKeyset(videos, siguiente, anterior)
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_init, post_save  # Señales del ORM
+from django.dispatch import receiver
+
+from .ingesta_service import sincronizar_tags
+from .models import Tag, Video
+from .totales_service import invalidar_totales
+
+
+@receiver(post_init, sender=Video)
+def recordar_estado_video(sender, instance, **kwargs):
+    """Guarda el dueño y las etiquetas con que se cargó el video, para detectar cambios al guardarlo"""
+    # __dict__: con .only() sin agregado_por, leer el atributo dispararía una consulta por instancia
+    instance._agregado_por_previo = instance.__dict__.get('agregado_por_id')
+    instance._etiquetas_previas = instance.__dict__.get('etiquetas')
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def invalidar_totales_video(sender, instance, **kwargs):
+    """Al guardar o borrar un video, los totales del dueño (actual y previo) y el global dejan de ser válidos"""
+    dueno = instance.__dict__.get('agregado_por_id')
+    previo = getattr(instance, '_agregado_por_previo', None)
+    invalidar_totales(dueno)
+    if previo and previo != dueno:
+        invalidar_totales(previo)  # Cambió de dueño: el anterior pierde el video
+    instance._agregado_por_previo = dueno
+
+
+@receiver(post_save, sender=Video)
+def sincronizar_tags_video(sender, instance, created, update_fields=None, **kwargs):
+    """Mantiene Tag/VideoTag al día cuando un save() cambia `etiquetas` (la ingesta masiva los sincroniza sola)"""
+    if 'etiquetas' not in instance.__dict__ or (update_fields is not None and 'etiquetas' not in update_fields):
+        return  # Campo diferido o no guardado: no cambió
+    etiquetas = instance.etiquetas
+    # Al crear, post_init ya vio las etiquetas nuevas: se comparan contra "sin tags"
+    if (etiquetas if created else etiquetas != instance._etiquetas_previas):
+        sincronizar_tags({instance.pk: Tag.normalizar(etiquetas)})
+        instance._etiquetas_previas = etiquetas
@@ -1,3 +1,718 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+from googleapiclient.http import HttpRequest
+
+from . import busqueda_service, cuota_service, miniaturas_service
+from .api_simulada import ServidorAPISimulada, aplicar_fields, item_video, parsear_fields
+from .cuota_service import CuotaAgotada, GestorCuota, a_cuenta_de
+from .ingesta_service import IngestaService
+from .metricas_service import registro
+from .miniaturas_service import AlmacenMiniaturas, MiniaturaNoDisponible
+from .management.commands.refrescar_estadisticas import Command as RefrescarEstadisticas
+from .models import UploadJob, Video, YouTubeCredentials
+from .normalizacion import CAMPOS, VideoNormalizado, duracion_en_segundos, mascara_videos
+from .paginacion import paginar_keyset
+from .totales_service import totales_usuario
+from .upload_service import (
+    COSTO_INSERT, YouTubeUploadService, credenciales_a_dict, procesar_job, reservar_job, tomar_siguiente_job
+)
+from .youtube_async_service import YouTubeServiceAsync
+from .youtube_service import CacheDjango, CacheRespuestas
+
+
+FRAGMENTO = 256 * 1024  # Fragmento mínimo de la subida resumable
+TAMANO = 6 * FRAGMENTO
+
+
+def crear_video(youtube_id, **campos):
+    """Video mínimo válido; `campos` pisa los valores por defecto"""
+    valores = {
+        'titulo': f"Video {youtube_id}", 'descripcion': '', 'url_video': f"https://youtube.com/watch?v={youtube_id}",
+        'url_thumbnail': f"https://i.ytimg.com/vi/{youtube_id}/hqdefault.jpg",
+        'canal_id': 'UC1', 'canal_nombre': 'Canal', 'fecha_publicacion': timezone.now(), 'categoria': 'otro',
+    }
+    valores.update(campos)
+    return Video.objects.create(youtube_id=youtube_id, **valores)
+
+
+class MuerteDelWorker(BaseException):
+    """Simula un kill del proceso: no la atrapan los `except Exception` de la subida"""
+
+
+@override_settings(YOUTUBE_UPLOAD_FRAGMENTOS={'INICIAL': FRAGMENTO, 'MINIMO': FRAGMENTO, 'MAXIMO': FRAGMENTO})
+class ReanudacionSubidaTests(TestCase):
+    """Subida resumable contra la API simulada: caída a mitad, reanudación y 503 inyectados"""
+
+    def setUp(self):
+        self.servidor = self.enterContext(ServidorAPISimulada(semilla=3))
+        self.enterContext(self.servidor.activo())
+        self.enterContext(mock.patch.object(YouTubeUploadService, '_esperar'))  # Reintentos sin dormir
+
+        # Cuota propia por test: no depende (ni gasta) la del día ni la de otro test
+        self.gestor = GestorCuota(limite_diario=10 ** 9, rafaga=10 ** 9, prefijo=f"test:cuota:{self.id()}")
+        self.enterContext(mock.patch.object(cuota_service, '_gestor', self.gestor))
+
+        descriptor, self.archivo = tempfile.mkstemp(suffix='.mp4')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(os.urandom(TAMANO))
+        self.addCleanup(lambda: os.path.exists(self.archivo) and os.remove(self.archivo))
+
+        usuario = User.objects.create_user('subidas')
+        YouTubeCredentials.objects.create(user=usuario, token=credenciales_a_dict(Credentials(token='prueba')))
+        self.job = UploadJob.objects.create(
+            usuario=usuario, archivo_path=self.archivo, titulo='Reanudable', categoria='22',
+            estado=UploadJob.SUBIENDO, iniciado=timezone.now()
+        )
+
+    def cortar_tras(self, fragmentos):
+        """next_chunk que mata al worker después de `fragmentos` fragmentos confirmados"""
+        original = HttpRequest.next_chunk
+        llamadas = []
+
+        def next_chunk(peticion, *args, **kwargs):
+            if len(llamadas) == fragmentos:
+                raise MuerteDelWorker()
+            llamadas.append(1)
+            return original(peticion, *args, **kwargs)
+
+        return mock.patch.object(HttpRequest, 'next_chunk', next_chunk)
+
+    def test_reanuda_desde_la_sesion_guardada(self):
+        # Primer worker: muere tras 2 fragmentos (un kill -9 tampoco llega a borrar el archivo)
+        with self.cortar_tras(2), mock.patch('videos.upload_service.os.remove'):
+            with self.assertRaises(MuerteDelWorker):
+                procesar_job(self.job)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.estado, UploadJob.SUBIENDO)
+        self.assertEqual(self.job.bytes_enviados, 2 * FRAGMENTO)
+        self.assertTrue(self.job.sesion_uri.startswith(self.servidor.url))
+
+        # Segundo worker: retoma la sesión persistida con la API fallando a ratos
+        self.servidor.tasa_errores = 0.3
+        job, estadisticas = procesar_job(self.job)
+
+        self.assertEqual(job.estado, UploadJob.COMPLETADO, job.error)
+        self.assertEqual(self.servidor.peticiones['inicio_subida'], 1)  # Misma sesión: no se abrió otra
+        self.assertEqual(self.servidor.sesiones['1']['recibidos'], TAMANO)
+        self.assertEqual(estadisticas['bytes'], TAMANO - 2 * FRAGMENTO)  # Solo lo que faltaba
+        self.assertGreater(self.servidor.errores.get('fragmento', 0), 0)
+        self.assertEqual(estadisticas['reintentos'], self.servidor.errores['fragmento'])
+        self.assertEqual(self.gestor.estado()['por_metodo']['youtube.videos.insert'], 1600)  # Cobrada una vez
+        self.assertFalse(os.path.exists(self.archivo))
+
+    def test_sesion_vencida_empieza_otra(self):
+        UploadJob.objects.filter(pk=self.job.pk).update(
+            sesion_uri=f"{self.servidor.url}sesiones/999", bytes_enviados=2 * FRAGMENTO
+        )
+        self.job.refresh_from_db()
+
+        job, estadisticas = procesar_job(self.job)
+
+        self.assertEqual(job.estado, UploadJob.COMPLETADO, job.error)
+        self.assertEqual(self.servidor.sesiones['1']['recibidos'], TAMANO)  # Desde el byte 0
+        self.assertEqual(estadisticas['bytes'], TAMANO)
+        self.assertEqual(self.gestor.estado()['por_metodo']['youtube.videos.insert'], 1600)
+
+
+class TotalesTests(TestCase):
+    """Invalidación de los totales cacheados al guardar videos"""
+
+    def test_cambio_de_dueno_invalida_a_ambos(self):
+        anterior, nuevo = User.objects.create_user('anterior'), User.objects.create_user('nuevo')
+        crear_video('dueno1', agregado_por=anterior, vistas=10)
+        self.assertEqual(totales_usuario(anterior.id)['videos'], 1)
+        self.assertEqual(totales_usuario(nuevo.id)['videos'], 0)  # Quedan cacheados
+
+        video = Video.objects.get(youtube_id='dueno1')
+        video.agregado_por = nuevo
+        video.save()
+
+        self.assertEqual(totales_usuario(anterior.id)['videos'], 0)
+        self.assertEqual(totales_usuario(nuevo.id), {'videos': 1, 'vistas': 10, 'likes': 0, 'comentarios': 0})
+
+
+class PaginacionKeysetTests(TestCase):
+    """Recorrido por cursor hacia adelante y atrás, con fechas repetidas"""
+
+    def setUp(self):
+        base = timezone.now()
+        # Tres pares con la misma fecha: el desempate es por id
+        for i in range(7):
+            crear_video(f"pag{i}", fecha_publicacion=base - timedelta(days=i // 2))
+        self.orden = list(Video.objects.order_by('-fecha_publicacion', '-pk').values_list('youtube_id', flat=True))
+
+    def ids(self, pagina):
+        return [video.youtube_id for video in pagina]
+
+    def test_recorre_todo_sin_repetir_ni_saltear(self):
+        paginas, cursor = [], None
+        while True:
+            pagina = paginar_keyset(Video.objects.all(), despues=cursor, tamano=3)
+            paginas.append(self.ids(pagina))
+            cursor = pagina.siguiente
+            if cursor is None:
+                break
+        self.assertEqual(paginas, [self.orden[0:3], self.orden[3:6], self.orden[6:]])
+
+        # Hacia atrás desde la última página se vuelve a las mismas
+        anterior = paginar_keyset(Video.objects.all(), antes=pagina.anterior, tamano=3)
+        self.assertEqual(self.ids(anterior), self.orden[3:6])
+        primera = paginar_keyset(Video.objects.all(), antes=anterior.anterior, tamano=3)
+        self.assertEqual(self.ids(primera), self.orden[0:3])
+        self.assertIsNone(primera.anterior)
+
+    def test_cursor_invalido_es_la_primera_pagina(self):
+        pagina = paginar_keyset(Video.objects.all(), despues='no-es-un-cursor', tamano=3)
+        self.assertEqual(self.ids(pagina), self.orden[0:3])
+        self.assertIsNone(pagina.anterior)
+
+
+class BusquedaTests(TestCase):
+    """Respaldo LIKE de buscar_videos cuando no hay FULLTEXT utilizable"""
+
+    def setUp(self):
+        crear_video('bus1', titulo='Curso de Django', descripcion='', etiquetas='')
+        crear_video('bus2', titulo='Otro', descripcion='', etiquetas='django,python')
+        crear_video('bus3', titulo='Otro', descripcion='Usa django por dentro', etiquetas='')
+        crear_video('bus4', titulo='Sin relación', descripcion='', etiquetas='')
+
+    def test_like_pondera_por_columna(self):
+        resultados = busqueda_service.buscar_videos(Video.objects.all(), 'DJANGO').order_by('-relevancia')
+        self.assertEqual(
+            [(video.youtube_id, video.relevancia) for video in resultados],
+            [('bus1', 3), ('bus2', 2), ('bus3', 1)]
+        )
+
+    def test_terminos_cortos_en_mysql_usan_like(self):
+        # El índice FULLTEXT no tiene términos de menos de LONGITUD_MINIMA letras
+        with mock.patch.object(busqueda_service.connection, 'vendor', 'mysql'):
+            self.assertIn('MATCH', str(busqueda_service.buscar_videos(Video.objects.all(), 'django').query))
+            consulta = busqueda_service.buscar_videos(Video.objects.all(), 'de')
+        self.assertNotIn('MATCH', str(consulta.query))
+        self.assertEqual({video.youtube_id for video in consulta}, {'bus1', 'bus3'})
+
+    def test_texto_vacio_no_filtra(self):
+        consulta = busqueda_service.buscar_videos(Video.objects.all(), '   ')
+        self.assertEqual(consulta.count(), 4)
+        self.assertEqual({video.relevancia for video in consulta}, {0})
+
+
+class TagsTests(TestCase):
+    """Sincronización de Tag/VideoTag al guardar un video fuera de la ingesta"""
+
+    def etiquetas(self, youtube_id):
+        video = Video.objects.prefetch_related('tags').get(youtube_id=youtube_id)
+        return sorted(video.lista_etiquetas)
+
+    def test_save_sincroniza_tags(self):
+        video = crear_video('tag1', etiquetas='Django, python,django')
+        self.assertEqual(self.etiquetas('tag1'), ['django', 'python'])
+
+        video.etiquetas = 'python,orm'
+        video.save()
+        self.assertEqual(self.etiquetas('tag1'), ['orm', 'python'])
+
+        video = Video.objects.only('id', 'vistas').get(youtube_id='tag1')
+        video.vistas = 5
+        video.save()  # Sin tocar etiquetas (diferidas): los tags quedan igual
+        self.assertEqual(self.etiquetas('tag1'), ['orm', 'python'])
+
+
+def datos_video(youtube_id, **campos):
+    """Diccionario completo como los de YouTubeService.obtener_detalles_videos"""
+    datos = {
+        'youtube_id': youtube_id, 'titulo': f"Video {youtube_id}", 'descripcion': '', 'canal_id': 'UC1',
+        'canal_nombre': 'Canal', 'fecha_publicacion': timezone.now().replace(microsecond=0),
+        'url_thumbnail': f"https://i.ytimg.com/vi/{youtube_id}/hqdefault.jpg",
+        'url_video': f"https://www.youtube.com/watch?v={youtube_id}", 'duracion': 'PT1M',
+        'vistas': 0, 'likes': 0, 'comentarios': 0, 'etiquetas': '',
+    }
+    datos.update(campos)
+    return datos
+
+
+@mock.patch('videos.ingesta_service.actualizar_miniaturas')
+class IngestaTests(TestCase):
+    """Upsert por lotes de IngestaService"""
+
+    def test_inserta_y_actualiza_solo_lo_que_cambio(self, actualizar_miniaturas):
+        usuario = User.objects.create_user('ingesta')
+        ingesta = IngestaService(tamano_lote=2)
+        originales = [datos_video('ing1'), datos_video('ing2', etiquetas='a,b'), datos_video('ing3')]
+
+        lotes = ingesta.guardar_videos(iter(originales), agregado_por=usuario, categoria='redes')
+        self.assertEqual([(lote['insertados'], lote['actualizados']) for lote in lotes], [(2, 0), (1, 0)])
+        actualizar_miniaturas.assert_called_once_with({d['youtube_id']: d['url_thumbnail'] for d in originales})
+
+        cambios = [
+            dict(originales[0], vistas=100),
+            dict(originales[1], etiquetas='b,c', url_thumbnail='https://i.ytimg.com/vi/ing2/maxresdefault.jpg'),
+            originales[2],
+        ]
+        lotes = ingesta.guardar_videos(cambios, categoria='otro')
+        self.assertEqual(
+            [(lote['insertados'], lote['actualizados'], lote['sin_cambios']) for lote in lotes], [(0, 2, 0), (0, 0, 1)]
+        )
+        self.assertEqual(actualizar_miniaturas.call_args.args[0], {'ing2': cambios[1]['url_thumbnail']})
+
+        video = Video.objects.prefetch_related('tags').get(youtube_id='ing2')
+        self.assertEqual(sorted(video.lista_etiquetas), ['b', 'c'])
+        self.assertEqual(Video.objects.get(youtube_id='ing1').vistas, 100)
+        # Los datos locales de videos existentes no se pisan
+        self.assertEqual(video.agregado_por, usuario)
+        self.assertEqual(video.categoria, 'redes')
+
+    def test_rechaza_videos_incompletos(self, actualizar_miniaturas):
+        parcial = datos_video('ing4')
+        del parcial['fecha_publicacion']
+        with self.assertRaisesMessage(ValueError, 'fecha_publicacion'):
+            IngestaService().guardar_videos([datos_video('ing5'), parcial])
+        self.assertFalse(Video.objects.exists())  # El lote entero se rechaza antes de escribir
+
+
+class ColaSubidasTests(TestCase):
+    """Límites por usuario, global y de presupuesto al reservar subidas"""
+
+    def setUp(self):
+        self.gestor = GestorCuota(limite_diario=10 ** 9, rafaga=10 ** 9, prefijo=f"test:cuota:{self.id()}")
+        self.enterContext(mock.patch.object(cuota_service, '_gestor', self.gestor))
+        self.ana, self.beto = User.objects.create_user('ana'), User.objects.create_user('beto')
+
+    def encolar(self, usuario, cantidad, estado=UploadJob.PENDIENTE, **campos):
+        return [
+            UploadJob.objects.create(usuario=usuario, archivo_path='/no/existe', titulo='x', estado=estado, **campos)
+            for _ in range(cantidad)
+        ]
+
+    def tomar_todos(self, **limites):
+        tomados = []
+        while (job := tomar_siguiente_job(**limites)) is not None:
+            tomados.append(job)
+        return tomados
+
+    def test_limite_por_usuario(self):
+        self.encolar(self.ana, 3)
+        self.encolar(self.beto, 1)
+        tomados = self.tomar_todos(max_por_usuario=2)
+        self.assertEqual(sorted(job.usuario.username for job in tomados), ['ana', 'ana', 'beto'])
+
+    def test_limite_global(self):
+        self.encolar(self.ana, 2, estado=UploadJob.SUBIENDO, iniciado=timezone.now())  # De otro worker
+        self.encolar(self.beto, 3)
+        self.assertEqual(len(self.tomar_todos(max_global=4)), 2)
+        self.assertEqual(UploadJob.objects.filter(estado=UploadJob.SUBIENDO).count(), 4)
+
+    def test_presupuesto_solo_permite_reanudar(self):
+        self.encolar(self.ana, 1, estado=UploadJob.COMPLETADO, iniciado=timezone.now())  # Ya cobrado hoy
+        reanudable, = self.encolar(self.beto, 1, iniciado=timezone.now())
+        self.encolar(self.beto, 2)
+        tomados = self.tomar_todos(presupuesto=2 * COSTO_INSERT)
+        # El completado y el reanudable ya gastaron los dos videos.insert del día: solo se retoma el iniciado
+        self.assertEqual([job.pk for job in tomados], [reanudable.pk])
+
+    def test_transmision_respeta_los_limites(self):
+        self.encolar(self.ana, 2, estado=UploadJob.SUBIENDO, iniciado=timezone.now())
+        recibiendo, = self.encolar(self.ana, 1, estado=UploadJob.RECIBIENDO)
+        self.assertFalse(reservar_job(recibiendo, UploadJob.RECIBIENDO, max_por_usuario=2))
+        self.assertTrue(reservar_job(recibiendo, UploadJob.RECIBIENDO, max_por_usuario=3))
+        self.assertEqual(recibiendo.estado, UploadJob.SUBIENDO)
+        self.assertFalse(reservar_job(recibiendo, UploadJob.RECIBIENDO))  # Ya no espera el archivo
+
+
+class RelojFalso:
+    """Reemplaza time en cuota_service: sleep avanza el reloj en lugar de dormir"""
+
+    def __init__(self):
+        self.ahora = 1_000_000.0
+        self.dormido = []
+
+    def time(self):
+        return self.ahora
+
+    monotonic = time
+
+    def sleep(self, segundos):
+        self.dormido.append(segundos)
+        self.ahora += segundos
+
+
+class GestorCuotaTests(TestCase):
+    """Token bucket de cuota: recarga, esperas, límite diario y atribución"""
+
+    def setUp(self):
+        self.reloj = RelojFalso()
+        self.enterContext(mock.patch.object(cuota_service, 'time', self.reloj))
+        # 86400 por día: un token por segundo; el balde admite justo un videos.insert
+        self.gestor = GestorCuota(limite_diario=86400, rafaga=1600, prefijo=f"test:cuota:{self.id()}")
+
+    def test_rechaza_sin_tokens_y_recarga_con_el_tiempo(self):
+        self.gestor.consumir('youtube.videos.insert')
+        with self.assertRaises(CuotaAgotada) as rechazo:
+            self.gestor.consumir('youtube.search.list')
+        self.assertAlmostEqual(rechazo.exception.espera, 100)  # 100 tokens a 1 por segundo
+
+        self.reloj.ahora += 100
+        self.gestor.consumir('youtube.search.list')
+        estado = self.gestor.estado()
+        self.assertEqual(estado['consumido'], 1700)
+        self.assertEqual(estado['rechazos'], 1)
+        self.assertEqual(estado['por_metodo'], {'youtube.videos.insert': 1600, 'youtube.search.list': 100})
+
+    def test_espera_tokens_hasta_el_maximo(self):
+        self.gestor.consumir('youtube.videos.insert')
+        self.gestor.consumir('youtube.search.list', esperar=150)  # Bloquea hasta que se recargan
+        self.assertAlmostEqual(sum(self.reloj.dormido), 100)
+        with self.assertRaises(CuotaAgotada):
+            self.gestor.consumir('youtube.videos.insert', esperar=60)  # Faltan 1600 s: no espera en vano
+        self.assertAlmostEqual(sum(self.reloj.dormido), 100)
+
+    def test_limite_diario(self):
+        gestor = GestorCuota(limite_diario=2, rafaga=10 ** 6, prefijo=f"test:cuota:{self.id()}:diario")
+        gestor.consumir('youtube.videos.list')
+        gestor.consumir('youtube.videos.list')
+        with self.assertRaises(CuotaAgotada) as rechazo:
+            gestor.consumir('youtube.videos.list', esperar=3600)
+        self.assertIsNone(rechazo.exception.espera)  # Solo el cambio de día libera cuota
+        self.assertFalse(gestor.alcanza('youtube.videos.list'))
+
+    def test_atribuye_por_consumidor(self):
+        with a_cuenta_de('refrescar_estadisticas'):
+            self.gestor.consumir('youtube.videos.list')
+            self.gestor.consumir('youtube.videos.list')
+        self.gestor.consumir('youtube.videos.list')
+        estado = self.gestor.estado()
+        self.assertEqual(estado['por_metodo'], {'youtube.videos.list': 3})
+        self.assertEqual(estado['por_consumidor'], {'refrescar_estadisticas': 2})
+
+
+class ServicioAsyncTests(TestCase):
+    """YouTubeServiceAsync con la caché de base de datos (la de CACHES por defecto)"""
+
+    def setUp(self):
+        self.servidor = self.enterContext(ServidorAPISimulada(semilla=5))
+        self.enterContext(self.servidor.activo())
+        gestor = GestorCuota(limite_diario=10 ** 9, rafaga=10 ** 9, prefijo=f"test:cuota:{self.id()}")
+        self.enterContext(mock.patch.object(cuota_service, '_gestor', gestor))
+        ttls = {'busqueda': 300, 'detalles': 3600, 'estadisticas': 900, 'canal': 3600}
+        self.cache = CacheRespuestas(CacheDjango('default'), ttls, prefijo=f"test:{self.id()}")
+
+    @async_to_sync
+    async def consultar(self):
+        async with YouTubeServiceAsync(cache=self.cache) as servicio:
+            videos = await servicio.buscar_videos('django', max_resultados=5)
+            playlist = await servicio.obtener_playlist_subidas('UCprueba')
+        return videos, playlist
+
+    def test_cache_de_base_de_datos_desde_el_event_loop(self):
+        # Sin sync_to_async la caché de BD lanzaría SynchronousOnlyOperation dentro del loop
+        videos, playlist = self.consultar()
+        self.assertEqual(len(videos), 5)
+        peticiones = dict(self.servidor.peticiones)
+        self.assertEqual(peticiones, {'search': 1, 'videos': 1, 'channels': 1})
+
+        self.assertEqual(self.consultar(), (videos, playlist))
+        self.assertEqual(dict(self.servidor.peticiones), peticiones)  # Todo salió de la caché
+        self.assertEqual(self.cache.obtener_videos([video['youtube_id'] for video in videos]).keys(),
+                         {video['youtube_id'] for video in videos})
+
+
+class RefrescoEstadisticasTests(TestCase):
+    """Selección por niveles y presupuesto de refrescar_estadisticas"""
+
+    def setUp(self):
+        self.servidor = self.enterContext(ServidorAPISimulada(semilla=7))
+        self.enterContext(self.servidor.activo())
+        self.gestor = GestorCuota(limite_diario=10 ** 9, rafaga=10 ** 9, prefijo=f"test:cuota:{self.id()}")
+        self.enterContext(mock.patch.object(cuota_service, '_gestor', self.gestor))
+
+        ahora = self.ahora = timezone.now()
+        hace = lambda **delta: ahora - timedelta(**delta)  # noqa: E731
+        crear_video('nuevo', fecha_publicacion=hace(days=1), estadisticas_actualizadas=hace(hours=2))
+        crear_video('nuevo_al_dia', fecha_publicacion=hace(days=1), estadisticas_actualizadas=hace(minutes=10))
+        crear_video('viejo', fecha_publicacion=hace(days=800), estadisticas_actualizadas=hace(days=8))
+        crear_video('viejo_al_dia', fecha_publicacion=hace(days=800), estadisticas_actualizadas=hace(days=2))
+        crear_video('nunca', fecha_publicacion=hace(days=800), estadisticas_actualizadas=None)
+
+    def ids(self, limite):
+        return [video.youtube_id for video in RefrescarEstadisticas.pendientes(self.ahora, limite)]
+
+    def test_pendientes_por_nivel_y_atraso(self):
+        # Los niveles activos primero; dentro de cada nivel, los más atrasados
+        self.assertEqual(self.ids(10), ['nuevo', 'nunca', 'viejo'])
+        self.assertEqual(self.ids(2), ['nuevo', 'nunca'])
+
+    def test_presupuesto_leido_del_gestor_de_cuota(self):
+        salida = StringIO()
+        call_command('refrescar_estadisticas', presupuesto=1, stdout=salida)
+        self.assertEqual(self.gestor.estado()['por_consumidor'], {'refrescar_estadisticas': 1})
+        self.assertFalse(Video.objects.filter(estadisticas_actualizadas__isnull=True).exists())
+
+        # Mismo día con pendientes: el presupuesto ya se gastó (persiste en el gestor, no en este proceso)
+        Video.objects.update(estadisticas_actualizadas=None)
+        call_command('refrescar_estadisticas', presupuesto=1, stdout=salida)
+        self.assertIn('Presupuesto diario de cuota agotado', salida.getvalue())
+        self.assertEqual(self.servidor.peticiones['videos'], 1)
+
+        # Lo que gastan otros llamadores no cuenta contra el presupuesto propio
+        self.gestor.consumir('youtube.search.list')
+        call_command('refrescar_estadisticas', presupuesto=2, stdout=salida)
+        self.assertEqual(self.gestor.estado()['por_consumidor'], {'refrescar_estadisticas': 2})
+
+
+class MetricasTests(TestCase):
+    """MetricasMiddleware y la exportación en /metricas/"""
+
+    def setUp(self):
+        registro.limpiar()
+        self.addCleanup(registro.limpiar)
+
+    def test_mide_peticiones_por_vista(self):
+        crear_video('met1')
+        with self.assertLogs('videos.metricas', 'INFO') as logs:
+            self.assertEqual(self.client.get('/').status_code, 200)
+            self.assertEqual(self.client.get('/no-existe/').status_code, 404)
+
+        texto = registro.exportar()
+        self.assertIn('http_peticiones_total{estado="200",metodo="GET",vista="videos:inicio"} 1', texto)
+        self.assertIn('http_peticiones_total{estado="404",metodo="GET",vista="sin_ruta"} 1', texto)
+        self.assertIn('db_consultas_por_peticion_count{vista="videos:inicio"} 1', texto)
+        self.assertIn('http_duracion_segundos_bucket{vista="videos:inicio",le="+Inf"} 1', texto)
+
+        datos = logs.records[0].metricas
+        self.assertEqual((datos['vista'], datos['ruta'], datos['estado']), ('videos:inicio', '/', 200))
+        self.assertGreater(datos['consultas'], 0)  # Al menos la del listado
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_exportacion_requiere_staff_o_token(self):
+        self.assertEqual(self.client.get('/metricas/').status_code, 403)
+        self.assertEqual(self.client.get('/metricas/', HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+
+        respuesta = self.client.get('/metricas/', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = respuesta.content.decode()
+        self.assertIn('# TYPE http_peticiones_total counter', texto)
+        self.assertIn('youtube_cuota_restante_dia ', texto)  # Gauges fijados al momento del scrape
+
+
+class NormalizacionTests(TestCase):
+    """VideoNormalizado: construcción desde la API y desde el modelo, campos diferidos y subconjuntos"""
+
+    ITEM = {
+        'id': 'norm1',
+        'snippet': {
+            'title': 'Título', 'description': 'Desc', 'channelId': 'UC9', 'channelTitle': 'Canal',
+            'publishedAt': '2024-03-01T12:30:00Z', 'tags': ['uno', 'dos'],
+            'thumbnails': {'default': {'url': 'https://i.ytimg.com/d.jpg'}, 'high': {'url': 'https://i.ytimg.com/h.jpg'}},
+        },
+        'contentDetails': {'duration': 'PT1H2M3S'},
+        'statistics': {'viewCount': '10', 'likeCount': '2'},
+    }
+
+    def test_duracion_en_segundos(self):
+        casos = {
+            'PT1H2M3S': 3723, 'PT15M30S': 930, 'P1DT2H': 93600, 'P0D': 0, 'PT0S': 0,
+            'P1W': 604800, 'PT1.5S': 1,  # Formas poco comunes: pasan por isodate
+            'no-es-duracion': 0, '': 0,
+        }
+        for iso, segundos in casos.items():
+            with self.subTest(iso=iso):
+                self.assertEqual(duracion_en_segundos(iso), segundos)
+
+    def test_desde_item(self):
+        video = VideoNormalizado.desde_item(self.ITEM)
+        self.assertEqual(video['titulo'], 'Título')
+        self.assertEqual(video.url_thumbnail, 'https://i.ytimg.com/h.jpg')  # high antes que default
+        self.assertEqual((video['vistas'], video['likes'], video['comentarios']), (10, 2, 0))
+        self.assertEqual(video['duracion_segundos'], 3723)
+        self.assertEqual(video['etiquetas'], 'uno,dos')
+        self.assertEqual(video['fecha_publicacion'], datetime.fromisoformat('2024-03-01T12:30:00+00:00'))
+        self.assertEqual(video['url_video'], 'https://www.youtube.com/watch?v=norm1')
+        self.assertEqual(tuple(video), CAMPOS)
+
+    def test_campos_limitados(self):
+        video = VideoNormalizado.desde_item(self.ITEM, campos=['vistas', 'titulo'])
+        self.assertEqual(dict(video), {'youtube_id': 'norm1', 'titulo': 'Título', 'vistas': 10})
+        with self.assertRaises(KeyError):
+            video['descripcion']
+        self.assertEqual(video.descripcion, 'Desc')  # Como atributo sigue disponible
+
+        vacio = VideoNormalizado('norm2', campos={'titulo'})
+        with self.assertRaises(KeyError):
+            vacio['titulo']  # Pedido pero ausente
+        self.assertIsNone(vacio.get('titulo'))
+
+    def test_desde_modelo(self):
+        fila = crear_video('norm3', duracion='PT2M', vistas=7, etiquetas='a,b')
+        video = VideoNormalizado.desde_modelo(fila)
+        self.assertEqual(len(video), len(CAMPOS))
+        self.assertEqual(video['titulo'], 'Video norm3')
+        self.assertEqual(video['etiquetas'], 'a,b')
+        self.assertEqual(video['duracion_segundos'], 120)
+        self.assertEqual(video['fecha_publicacion'], fila.fecha_publicacion)
+
+    def test_copia_y_actualizar(self):
+        video = VideoNormalizado.desde_item(self.ITEM)
+        copia = video.copia(campos={'vistas'})
+        copia.actualizar(vistas=99, etiquetas=['tres'])
+
+        self.assertEqual(dict(copia), {'youtube_id': 'norm1', 'vistas': 99})
+        self.assertEqual(copia.etiquetas, 'tres')
+        self.assertEqual((video['vistas'], video['etiquetas']), (10, 'uno,dos'))  # El original no cambia
+        self.assertIn('titulo', video)
+
+
+class RespuestaParcialTests(TestCase):
+    """part/fields mínimos de videos.list y su interpretación en la API simulada"""
+
+    def test_mascara_videos(self):
+        self.assertEqual(
+            mascara_videos(frozenset({'titulo', 'vistas'})),
+            ('snippet,statistics', 'items(id,snippet(title),statistics(viewCount))')
+        )
+        self.assertEqual(  # duracion y duracion_segundos comparten la misma ruta
+            mascara_videos(frozenset({'duracion', 'duracion_segundos', 'likes'})),
+            ('contentDetails,statistics', 'items(id,contentDetails(duration),statistics(likeCount))')
+        )
+        self.assertEqual(mascara_videos(frozenset({'url_video'})), ('id', 'items(id)'))  # Derivado del ID
+        parte, fields = mascara_videos(frozenset({'url_thumbnail'}))
+        self.assertEqual(parte, 'snippet')
+        self.assertIn('thumbnails(high/url,medium/url,', fields)
+
+    def test_parsear_fields(self):
+        self.assertEqual(
+            parsear_fields('items(id,snippet(title,thumbnails/high/url)),nextPageToken'),
+            {'items': {'id': None, 'snippet': {'title': None, 'thumbnails': {'high': {'url': None}}}},
+             'nextPageToken': None}
+        )
+        self.assertEqual(parsear_fields('a/b,a/c'), {'a': {'b': None, 'c': None}})  # Se unen
+        self.assertEqual(parsear_fields('a,a/b'), {'a': None})  # El valor completo gana
+        for invalido in ('items(id', 'items(id))', 'a)b'):
+            with self.subTest(fields=invalido), self.assertRaises(ValueError):
+                parsear_fields(invalido)
+
+    def test_aplicar_fields(self):
+        datos = {'items': [{'id': 'x', 'snippet': {'title': 'T', 'tags': ['a']}, 'etag': 'e'}], 'kind': 'k'}
+        self.assertEqual(
+            aplicar_fields(datos, parsear_fields('items(id,snippet/title)')),
+            {'items': [{'id': 'x', 'snippet': {'title': 'T'}}]}
+        )
+        self.assertIs(aplicar_fields(datos, None), datos)
+
+    def test_mascara_conserva_los_campos_pedidos(self):
+        """Normalizar la respuesta recortada da lo mismo que la completa para los campos pedidos"""
+        todas = {'snippet', 'contentDetails', 'statistics'}
+        for campos in ({'titulo', 'vistas'}, {'url_thumbnail', 'etiquetas', 'duracion_segundos'}, set(CAMPOS)):
+            with self.subTest(campos=sorted(campos)):
+                parte, fields = mascara_videos(frozenset(campos))
+                item = item_video('vid7', set(parte.split(',')))
+                recortado = aplicar_fields({'items': [item]}, parsear_fields(fields))['items'][0]
+                completo = VideoNormalizado.desde_item(item_video('vid7', todas), campos=campos)
+                self.assertEqual(dict(VideoNormalizado.desde_item(recortado, campos=campos)), dict(completo))
+
+
+def imagen_jpeg(ancho=480, alto=360):
+    """JPEG 4:3 como las hqdefault de YouTube"""
+    salida = BytesIO()
+    Image.new('RGB', (ancho, alto), (200, 30, 30)).save(salida, 'JPEG')
+    return salida.getvalue()
+
+
+class MiniaturasTests(TestCase):
+    """Vista de miniaturas WebP y almacén en disco (sin red: la descarga se simula)"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.almacen = AlmacenMiniaturas(self.directorio, max_bytes=10 ** 9, anchos=(160, 320), max_age=60)
+        self.enterContext(mock.patch.object(miniaturas_service, '_almacen', self.almacen))
+        self.enterContext(mock.patch('videos.middleware.logger'))  # Sin la línea JSON de cada petición
+        self.descargar_real = AlmacenMiniaturas._descargar
+        self.descargar = self.enterContext(
+            mock.patch.object(AlmacenMiniaturas, '_descargar', return_value=imagen_jpeg())
+        )
+        crear_video('mini1')
+
+    def test_genera_y_sirve_desde_disco(self):
+        respuesta = self.client.get('/miniaturas/mini1/320.webp')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'image/webp')
+        self.assertEqual(respuesta['Cache-Control'], 'public, max-age=60')
+        with Image.open(BytesIO(respuesta.content)) as imagen:
+            self.assertEqual((imagen.format, imagen.size), ('WEBP', (320, 180)))  # Recortada a 16:9
+
+        with self.assertNumQueries(0):  # Ya en disco: ni BD ni descarga
+            segunda = self.client.get('/miniaturas/mini1/320.webp')
+        self.assertEqual(segunda.content, respuesta.content)
+        self.client.get('/miniaturas/mini1/160.webp')
+        self.descargar.assert_called_once()  # La original se reutiliza para otros anchos
+
+    def test_304_con_etag(self):
+        etiqueta = self.client.get('/miniaturas/mini1/160.webp')['ETag']
+        respuesta = self.client.get('/miniaturas/mini1/160.webp', HTTP_IF_NONE_MATCH=etiqueta)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+
+    def test_404(self):
+        for ruta in ('/miniaturas/otro/320.webp', '/miniaturas/mini1/999.webp', '/miniaturas/mi.ni/320.webp'):
+            with self.subTest(ruta=ruta):
+                self.assertEqual(self.client.get(ruta).status_code, 404)
+        self.descargar.assert_not_called()
+
+    def test_redirige_a_la_original_si_falla(self):
+        self.descargar.side_effect = MiniaturaNoDisponible('503')
+        respuesta = self.client.get('/miniaturas/mini1/320.webp')
+        self.assertRedirects(respuesta, 'https://i.ytimg.com/vi/mini1/hqdefault.jpg', fetch_redirect_response=False)
+
+    def test_no_sigue_redirecciones(self):
+        respuesta = mock.MagicMock(status_code=302, headers={'Location': 'http://169.254.169.254/'})
+        with mock.patch('httpx.stream') as stream:
+            stream.return_value.__enter__.return_value = respuesta
+            with self.assertRaises(MiniaturaNoDisponible):
+                self.descargar_real(self.almacen, 'https://i.ytimg.com/vi/mini1/hqdefault.jpg')
+            with self.assertRaises(MiniaturaNoDisponible):  # Host fuera de la lista: ni se pide
+                self.descargar_real(self.almacen, 'https://ejemplo.com/x.jpg')
+        stream.assert_called_once()
+        self.assertIs(stream.call_args.kwargs['follow_redirects'], False)
+
+    def test_contador_de_bytes(self):
+        self.almacen.generar('mini1', 160, 'https://i.ytimg.com/vi/mini1/hqdefault.jpg')
+        en_disco = self.almacen._medir()[1]
+        self.assertEqual(self.almacen._bytes, en_disco)
+
+        with mock.patch.object(self.almacen, '_medir', wraps=self.almacen._medir) as medir:
+            self.almacen.generar('mini1', 320, 'https://i.ytimg.com/vi/mini1/hqdefault.jpg')
+            medir.assert_not_called()  # Sumado, sin recorrer el directorio
+        self.assertEqual(self.almacen._bytes, self.almacen._medir()[1])
+
+        self.almacen.invalidar('mini1')
+        self.assertEqual(self.almacen._bytes, 0)
+
+    def test_poda_los_menos_usados(self):
+        for youtube_id in ('pod1', 'pod2', 'pod3'):
+            self.almacen.generar(youtube_id, 160, 'https://i.ytimg.com/vi/pod/hqdefault.jpg')
+        viejos = 0
+        for archivo in os.listdir(self.almacen._ruta('pod1')):
+            ruta = self.almacen._ruta('pod1', archivo)
+            os.utime(ruta, (0, 0))  # pod1 queda como el menos usado
+            viejos += os.path.getsize(ruta)
+
+        self.almacen.max_bytes = (self.almacen._bytes - viejos) / 0.9  # Alcanza con borrar pod1
+        self.almacen.podar()
+        self.assertFalse(os.path.exists(self.almacen._ruta('pod1')))
+        self.assertIsNotNone(self.almacen.leer('pod2', 160))
+        self.assertIsNotNone(self.almacen.leer('pod3', 160))
+        self.assertEqual(self.almacen._bytes, self.almacen._medir()[1])
@@ -0,0 +1,64 @@
+from django.core.cache import cache  # Caché compartida de Django
+from django.db.models import Count, Sum  # Agregados
+
+from .models import Video
+
+
+TTL_TOTALES = 600  # Respaldo: aunque falle una invalidación, los totales no quedan viejos más de 10 min
+CLAVE_VERSION = 'videos:totales:version'  # Subirla invalida los totales de todos los usuarios
+
+
+def calcular_totales(queryset):
+    """
+    Calcula cantidad y sumas de estadísticas en una sola consulta
+
+    Returns:
+        dict: {'videos', 'vistas', 'likes', 'comentarios'}
+    """
+    totales = queryset.order_by().aggregate(  # order_by() evita un ORDER BY inútil
+        videos=Count('id'),
+        vistas=Sum('vistas'),
+        likes=Sum('likes'),
+        comentarios=Sum('comentarios'),
+    )
+    return {campo: valor or 0 for campo, valor in totales.items()}  # Sum retorna None sin filas
+
+
+def _clave(usuario_id):
+    version = cache.get_or_set(CLAVE_VERSION, 1, timeout=None)
+    return f"videos:totales:{version}:{usuario_id or 'global'}"
+
+
+def totales_globales():
+    """Totales de toda la tabla Video (cacheados)"""
+    return _totales_cacheados(None, Video.objects.all())
+
+
+def totales_usuario(usuario_id):
+    """Totales de los videos agregados por un usuario (cacheados)"""
+    return _totales_cacheados(usuario_id, Video.objects.filter(agregado_por_id=usuario_id))
+
+
+def _totales_cacheados(usuario_id, queryset):
+    clave = _clave(usuario_id)
+    totales = cache.get(clave)
+    if totales is None:
+        totales = calcular_totales(queryset)
+        cache.set(clave, totales, TTL_TOTALES)
+    return totales
+
+
+def invalidar_totales(usuario_id=None):
+    """Descarta los totales globales y, si se indica, los de un usuario"""
+    claves = [_clave(None)]
+    if usuario_id:
+        claves.append(_clave(usuario_id))
+    cache.delete_many(claves)
+
+
+def invalidar_todos_los_totales():
+    """Descarta los totales de todos los usuarios (para escrituras masivas)"""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:  # La versión aún no existe o fue desalojada
+        cache.set(CLAVE_VERSION, 2, timeout=None)
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+
+def crear_archivo_subida(sufijo=''):
+    """Crea un archivo vacío en YOUTUBE_UPLOAD_DIR y retorna su objeto abierto para escritura"""
+    os.makedirs(settings.YOUTUBE_UPLOAD_DIR, exist_ok=True)
+    return tempfile.NamedTemporaryFile(
+        prefix='subida_', suffix=sufijo, dir=settings.YOUTUBE_UPLOAD_DIR, delete=False
+    )
+
+
+class ArchivoSubida(UploadedFile):
+    """
+    Archivo recibido directamente en el directorio de subidas
+
+    A diferencia de TemporaryUploadedFile no se borra al cerrarse: si la vista
+    lo marca con `conservar`, el mismo archivo pasa al UploadJob sin copiarlo.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        _, extension = os.path.splitext(name)
+        archivo = crear_archivo_subida(extension.lower()[:10])
+        super().__init__(archivo, name, content_type, size, charset, content_type_extra)
+        self.conservar = False  # La vista lo pone en True al encolar el archivo
+
+    def temporary_file_path(self):
+        """Ruta absoluta del archivo en disco"""
+        return self.file.name
+
+    def descartar(self):
+        """Cierra y borra el archivo (subida rechazada o interrumpida)"""
+        self.close()
+        try:
+            os.remove(self.temporary_file_path())
+        except FileNotFoundError:
+            pass
+
+
+class SubidaDirectaHandler(FileUploadHandler):
+    """
+    Escribe cada archivo del formulario directo en YOUTUBE_UPLOAD_DIR
+
+    Evita el camino TemporaryUploadedFile + FileSystemStorage.save, que en
+    discos distintos copia el video completo una segunda vez. Los archivos que
+    la vista no conserva se borran con `limpiar()` al terminar la petición.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.archivos = []  # Todos los archivos creados en esta petición
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = ArchivoSubida(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.archivos.append(self.file)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+        # None: ningún otro handler (p. ej. el de memoria) recibe el bloque
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.descartar()
+
+    def limpiar(self):
+        """Borra los archivos recibidos que no terminaron en un UploadJob"""
+        for archivo in self.archivos:
+            if archivo.conservar:
+                archivo.close()  # El worker lo abrirá por su ruta
+            else:
+                archivo.descartar()
+
+
+def subida_directa(vista):
+    """
+    Decorador: la vista recibe sus archivos mediante SubidaDirectaHandler
+
+    El handler debe fijarse antes de que algo lea request.POST, incluido el
+    middleware CSRF: por eso la verificación CSRF se hace aquí, después.
+    """
+    vista_protegida = csrf_protect(vista)
+
+    @csrf_exempt
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        handler = SubidaDirectaHandler(request)
+        request.upload_handlers = [handler]
+        try:
+            return vista_protegida(request, *args, **kwargs)
+        finally:
+            handler.limpiar()  # Borra archivos recibidos que no quedaron en un UploadJob
+
+    return envoltura
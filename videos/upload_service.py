@@ -1,13 +1,163 @@
 import os
+import random  # Jitter de los reintentos
+import socket
+import threading  # Transmisión: recepción y subida en paralelo
+import time
+
+import httplib2
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaUpload
 from google.auth.transport.requests import Request  # Añadido para refresco automático
+from google.oauth2.credentials import Credentials
 from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Count, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .clientes_service import cliente_usuario
+from .models import UploadJob, Video
+from .normalizacion import mejor_miniatura
+from .cuota_service import CuotaAgotada, inicio_dia_cuota, obtener_gestor_cuota
+from .metricas_service import medir_llamada
+
+ESTADOS_REINTENTABLES = (500, 502, 503, 504)  # Errores transitorios del servidor
+
+COSTO_INSERT = 1600  # Unidades de cuota de cada videos.insert
+
+MULTIPLO_FRAGMENTO = 256 * 1024  # La API exige fragmentos múltiplos de 256 KiB
+
+BLOQUE_RECEPCION = 1024 * 1024  # Bytes leídos del cuerpo de la petición por iteración
+
+
+class SubidaInterrumpida(Exception):
+    """El navegador dejó de enviar el archivo antes de completarlo"""
+
+
+class FragmentoAdaptativo:
+    """
+    Ajusta el tamaño de fragmento según el throughput medido
+    
+    Busca que cada fragmento tarde ~segundos_objetivo: en redes rápidas crece
+    (menos idas y vueltas), en redes lentas o con errores se reduce. Nunca
+    supera `maximo`, que acota la memoria usada por fragmento.
+    """
+    
+    def __init__(self, inicial, minimo, maximo, segundos_objetivo):
+        self.minimo = self._redondear(minimo)
+        self.maximo = max(self._redondear(maximo), self.minimo)
+        self.segundos_objetivo = segundos_objetivo
+        self.tamano = self._acotar(inicial)
+    
+    @staticmethod
+    def _redondear(tamano):
+        return max(MULTIPLO_FRAGMENTO, int(tamano) // MULTIPLO_FRAGMENTO * MULTIPLO_FRAGMENTO)
+    
+    def _acotar(self, tamano):
+        return min(self.maximo, max(self.minimo, self._redondear(tamano)))
+    
+    def registrar(self, bytes_enviados, segundos):
+        """Recalcula el tamaño tras un fragmento exitoso"""
+        if segundos <= 0:
+            return self.tamano
+        ideal = bytes_enviados / segundos * self.segundos_objetivo
+        self.tamano = self._acotar(min(ideal, self.tamano * 2))  # Como mucho duplica por paso
+        return self.tamano
+    
+    def reducir(self):
+        """Tras un error transitorio: fragmentos más chicos pierden menos al reintentar"""
+        self.tamano = self._acotar(self.tamano // 2)
+        return self.tamano
+
+
+class ArchivoCreciente(MediaUpload):
+    """
+    Fuente resumable que lee un archivo mientras todavía se está escribiendo
+    
+    El tamaño total se conoce de antemano (Content-Length del navegador);
+    getbytes bloquea hasta que el escritor haya recibido el rango pedido, así
+    cada fragmento sale hacia YouTube apenas termina de llegar.
+    """
+    
+    def __init__(self, ruta, tamano, mimetype='video/*', chunksize=8 * 1024 * 1024, espera=120):
+        self._fd = open(ruta, 'rb')
+        self._tamano = tamano
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self.espera = espera  # Segundos máximos sin recibir datos nuevos
+        self._disponibles = 0  # Bytes ya escritos en disco
+        self._cancelado = False
+        self._condicion = threading.Condition()
+    
+    def chunksize(self):
+        return self._chunksize
+    
+    def mimetype(self):
+        return self._mimetype
+    
+    def size(self):
+        return self._tamano
+    
+    def resumable(self):
+        return True
+    
+    def has_stream(self):
+        return False  # Fuerza getbytes: un stream exigiría los bytes ya presentes
+    
+    def avanzar(self, cantidad):
+        """El escritor avisa que `cantidad` bytes más ya están en disco"""
+        with self._condicion:
+            self._disponibles += cantidad
+            self._condicion.notify_all()
+    
+    def cancelar(self):
+        """El archivo no se completará: despierta y aborta al lector"""
+        with self._condicion:
+            self._cancelado = True
+            self._condicion.notify_all()
+    
+    def getbytes(self, begin, length):
+        fin = min(begin + length, self._tamano)
+        with self._condicion:
+            while self._disponibles < fin and not self._cancelado:
+                if not self._condicion.wait(timeout=self.espera):
+                    raise SubidaInterrumpida(f"Sin datos del navegador durante {self.espera} s")
+            if self._cancelado:
+                raise SubidaInterrumpida("El navegador interrumpió el envío del archivo")
+        self._fd.seek(begin)
+        return self._fd.read(fin - begin)
+    
+    def cerrar(self):
+        self._fd.close()
+
 
 class YouTubeUploadService:
     """Servicio para subir videos a YouTube con OAuth"""
     
+    def __init__(self, max_reintentos=None, fragmentos=None):
+        # Reintentos consecutivos por fragmento ante errores 5xx o de conexión
+        self.max_reintentos = (
+            max_reintentos if max_reintentos is not None
+            else getattr(settings, 'YOUTUBE_UPLOAD_REINTENTOS', 5)
+        )
+        # Configuración de fragmentos (bytes / segundos); ver settings.YOUTUBE_UPLOAD_FRAGMENTOS
+        self.fragmentos = {
+            'INICIAL': 8 * 1024 * 1024,
+            'MINIMO': MULTIPLO_FRAGMENTO,
+            'MAXIMO': 64 * 1024 * 1024,
+            'SEGUNDOS_OBJETIVO': 5,
+            **getattr(settings, 'YOUTUBE_UPLOAD_FRAGMENTOS', {}),
+            **(fragmentos or {}),
+        }
+        self.estadisticas = None  # Métricas de la última subida
+    
+    @staticmethod
+    def _esperar(intento):
+        """Espera exponencial con jitter: ~1s, 2s, 4s, ... hasta 64s"""
+        time.sleep(min(2 ** (intento - 1), 64) + random.random())
+    
     def obtener_url_autorizacion(self):
         """Genera URL para que usuario autorice la app"""
         
@@ -36,9 +186,16 @@ class YouTubeUploadService:
         
         return authorization_url, state
     
-    def subir_video(self, credentials, archivo_path, titulo, descripcion, categoria='22', privacidad='private'):
+    def subir_video(self, credentials, archivo_path, titulo, descripcion, categoria='22', privacidad='private',
+                    al_progresar=None, sesion_uri=None, media=None):
         """
         Sube un video a YouTube de forma fragmentada y maneja el refresco de tokens.
+        
+        al_progresar(bytes_enviados, bytes_totales, sesion_uri) se llama tras cada
+        fragmento; persistir sesion_uri permite reanudar tras una caída pasándola
+        de nuevo en `sesion_uri`. Los errores 5xx y de conexión entre fragmentos
+        se reintentan con espera exponencial. `media` permite pasar otra fuente
+        (p. ej. ArchivoCreciente) en lugar de leer `archivo_path`.
         """
         
         # --- MEJORA CRÍTICA: Refresco automático del token ---
@@ -46,12 +203,13 @@ class YouTubeUploadService:
         if not credentials.valid:
             if credentials.expired and credentials.refresh_token:
                 try:
-                    credentials.refresh(Request())
+                    with medir_llamada('oauth2.token.refresh'):
+                        credentials.refresh(Request())
                 except Exception as e:
                     raise Exception(f"No se pudo refrescar el token: {str(e)}")
 
-        # Construye el servicio de la API de YouTube
-        youtube = build('youtube', 'v3', credentials=credentials)
+        # Cliente autorizado sobre la conexión del hilo (sin reparsear el documento discovery)
+        youtube = cliente_usuario(credentials)
         
         # Metadatos del video
         body = {
@@ -66,14 +224,33 @@ class YouTubeUploadService:
             }
         }
         
-        # Preparar el archivo para la subida resumable
-        media = MediaFileUpload(
-            archivo_path,
-            mimetype='video/*',
-            chunksize=1024*1024, # 1MB por fragmento
-            resumable=True
+        # Tamaño de fragmento adaptativo (múltiplo de 256 KiB)
+        control = FragmentoAdaptativo(
+            inicial=self.fragmentos['INICIAL'],
+            minimo=self.fragmentos['MINIMO'],
+            maximo=self.fragmentos['MAXIMO'],
+            segundos_objetivo=self.fragmentos['SEGUNDOS_OBJETIVO']
         )
         
+        # Preparar el archivo para la subida resumable
+        if media is None:
+            media = MediaFileUpload(
+                archivo_path,
+                mimetype='video/*',
+                chunksize=control.tamano,
+                resumable=True
+            )
+        else:
+            media._chunksize = control.tamano
+        
+        estadisticas = {'bytes': 0, 'segundos': 0.0, 'fragmentos': 0, 'reintentos': 0}
+        self.estadisticas = estadisticas
+        inicio_subida = time.perf_counter()
+        
+        gestor_cuota = obtener_gestor_cuota()
+        if not sesion_uri:
+            gestor_cuota.consumir('youtube.videos.insert')  # Reanudar una sesión no se cobra otra vez
+        
         try:
             request = youtube.videos().insert(
                 part='snippet,status',
@@ -81,14 +258,336 @@ class YouTubeUploadService:
                 media_body=media
             )
             
+            if sesion_uri:
+                # Reanudar: con _in_error_state googleapiclient primero pregunta al servidor
+                # cuántos bytes confirmó (PUT Content-Range: bytes */total) y sigue desde ahí
+                request.resumable_uri = sesion_uri
+                request._in_error_state = True
+            
             # Ejecutar la subida por fragmentos (chunks)
             response = None
+            fallos = 0  # Fallos consecutivos (se reinicia con cada fragmento confirmado)
             while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    print(f"Progreso de subida: {int(status.progress() * 100)}%")
+                progreso_previo = request.resumable_progress
+                inicio_fragmento = time.perf_counter()
+                try:
+                    with medir_llamada('youtube.videos.insert') as medicion:
+                        status, response = request.next_chunk()
+                        # Bytes confirmados por el servidor en este fragmento
+                        confirmado = status.resumable_progress if status else media.size()
+                        medicion['enviados'] = max(confirmado - progreso_previo, 0)
+                    fallos = 0
+                except HttpError as e:
+                    if e.resp.status in (404, 410) and request.resumable_uri and sesion_uri:
+                        # La sesión guardada venció (duran ~1 semana): empezar una nueva
+                        gestor_cuota.consumir('youtube.videos.insert')
+                        request.resumable_uri = None
+                        request.resumable_progress = 0
+                        request._in_error_state = False
+                        sesion_uri = None
+                        continue
+                    if e.resp.status not in ESTADOS_REINTENTABLES or fallos >= self.max_reintentos:
+                        raise
+                    fallos += 1
+                    estadisticas['reintentos'] += 1
+                    media._chunksize = control.reducir()
+                    self._esperar(fallos)
+                    continue
+                except (ConnectionError, socket.timeout, httplib2.HttpLib2Error):
+                    if fallos >= self.max_reintentos:
+                        raise
+                    fallos += 1
+                    estadisticas['reintentos'] += 1
+                    request._in_error_state = True  # Consultar el offset real antes de reenviar
+                    media._chunksize = control.reducir()
+                    self._esperar(fallos)
+                    continue
+                
+                # Throughput del fragmento recién confirmado -> tamaño del siguiente
+                enviados = medicion['enviados']
+                estadisticas['bytes'] += enviados
+                estadisticas['fragmentos'] += 1
+                media._chunksize = control.registrar(enviados, time.perf_counter() - inicio_fragmento)
+                
+                if status and al_progresar:
+                    al_progresar(status.resumable_progress, status.total_size, request.resumable_uri)
             
+            estadisticas['segundos'] = time.perf_counter() - inicio_subida
+            estadisticas['bytes_por_segundo'] = (
+                estadisticas['bytes'] / estadisticas['segundos'] if estadisticas['segundos'] else 0.0
+            )
+            estadisticas['tamano_fragmento_final'] = control.tamano
             return response
             
+        except CuotaAgotada:
+            raise  # procesar_job la distingue para reencolar el job
         except Exception as e:
-            raise Exception(f"Error en la API de YouTube: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error en la API de YouTube: {str(e)}")
+
+
+def credenciales_desde_dict(datos):
+    """Reconstruye Credentials (con refresh_token) a partir de su forma serializada"""
+    return Credentials(
+        token=datos['token'],
+        refresh_token=datos['refresh_token'],
+        token_uri=datos['token_uri'],
+        client_id=datos['client_id'],
+        client_secret=datos['client_secret'],
+        scopes=datos['scopes']
+    )
+
+
+def credenciales_a_dict(credentials):
+    """Forma serializable de Credentials (sesión o YouTubeCredentials.token)"""
+    return {
+        'token': credentials.token,
+        'refresh_token': credentials.refresh_token,
+        'token_uri': credentials.token_uri,
+        'client_id': credentials.client_id,
+        'client_secret': credentials.client_secret,
+        'scopes': credentials.scopes
+    }
+
+
+def unidades_subida_hoy():
+    """Cuota gastada hoy en videos.insert, deducida de los jobs iniciados hoy (compartida entre workers)"""
+    return UploadJob.objects.filter(iniciado__gte=inicio_dia_cuota()).count() * COSTO_INSERT
+
+
+def _conteo_en_update(condicion, params, maximo):
+    """
+    Condición "COUNT(*) de UploadJob con `condicion` < maximo" usable en el
+    WHERE de un UPDATE sobre la misma tabla (MySQL rechaza la subconsulta
+    directa con el error 1093; a través de una tabla derivada la acepta)
+    """
+    tabla = connection.ops.quote_name(UploadJob._meta.db_table)
+    return RawSQL(
+        f"(SELECT total FROM (SELECT COUNT(*) AS total FROM {tabla} WHERE {condicion}) AS conteo) < %s",
+        (*params, maximo),
+        output_field=BooleanField()
+    )
+
+
+def reservar_job(job, estado_previo, max_por_usuario=None, presupuesto=None, max_global=None):
+    """
+    Pasa un job de `estado_previo` a 'subiendo' si los límites lo permiten
+    
+    El UPDATE condicionado al estado garantiza que dos workers no tomen el
+    mismo trabajo, sin depender de SELECT ... FOR UPDATE. Los límites se
+    vuelven a comprobar dentro de ese mismo UPDATE, así una reserva nunca se
+    apoya en un conteo leído antes por separado. Con aislamiento READ
+    COMMITTED dos UPDATE exactamente simultáneos aún podrían no ver la
+    reserva del otro: los límites son estrictos salvo esa carrera.
+    
+    Args:
+        job: UploadJob a reservar (se actualiza en memoria si se reserva)
+        estado_previo: Estado en que debe estar (PENDIENTE en la cola,
+            RECIBIENDO en una transmisión)
+        max_por_usuario: Subidas simultáneas del dueño del job (entre todos los workers)
+        presupuesto: Unidades de cuota diarias para videos.insert; reanudar un
+            job ya iniciado no vuelve a cobrarse
+        max_global: Subidas simultáneas en total (entre todos los workers y transmisiones)
+    
+    Returns:
+        bool: True si quedó reservado
+    """
+    if job.iniciado is None and not obtener_gestor_cuota().alcanza('youtube.videos.insert'):
+        return False  # Sin tokens el videos.insert fallaría enseguida
+    
+    reserva = UploadJob.objects.filter(pk=job.pk, estado=estado_previo)
+    if max_por_usuario is not None:
+        reserva = reserva.filter(_conteo_en_update(
+            'usuario_id = %s AND estado = %s', (job.usuario_id, UploadJob.SUBIENDO), max_por_usuario
+        ))
+    if max_global is not None:
+        reserva = reserva.filter(_conteo_en_update('estado = %s', (UploadJob.SUBIENDO,), max_global))
+    if presupuesto is not None:
+        # Un job nuevo solo si cabe otro videos.insert en el presupuesto del día
+        reserva = reserva.filter(Q(iniciado__isnull=False) | Q(_conteo_en_update(
+            'iniciado >= %s', (connection.ops.adapt_datetimefield_value(inicio_dia_cuota()),),
+            presupuesto // COSTO_INSERT
+        )))
+    
+    ahora = timezone.now()
+    if not reserva.update(
+        estado=UploadJob.SUBIENDO,
+        iniciado=Coalesce('iniciado', Value(ahora)),  # Conserva el primer inicio al reanudar
+        actualizado=ahora
+    ):
+        return False
+    job.estado = UploadJob.SUBIENDO
+    job.iniciado = job.iniciado or ahora
+    return True
+
+
+def tomar_siguiente_job(max_por_usuario=None, presupuesto=None, max_global=None):
+    """
+    Reserva la subida pendiente más antigua para este worker
+    
+    Args:
+        max_por_usuario: Subidas simultáneas por usuario (entre todos los workers);
+            los usuarios en el límite se saltean para no acaparar el pool
+        presupuesto: Unidades de cuota diarias para videos.insert; sin margen (o
+            sin tokens en el GestorCuota) solo se toman jobs ya iniciados
+            (reanudar una sesión no vuelve a cobrarse)
+        max_global: Subidas simultáneas en total, sumando todos los workers
+    
+    Returns:
+        UploadJob en estado 'subiendo' o None si no hay ninguno elegible
+    """
+    while True:
+        if max_global is not None and UploadJob.objects.filter(estado=UploadJob.SUBIENDO).count() >= max_global:
+            return None
+        
+        pendientes = UploadJob.objects.filter(estado=UploadJob.PENDIENTE)
+        
+        if max_por_usuario is not None:
+            ocupados = (
+                UploadJob.objects.filter(estado=UploadJob.SUBIENDO)
+                .values('usuario').annotate(activos=Count('pk')).filter(activos__gte=max_por_usuario)
+                .values_list('usuario', flat=True)
+            )
+            pendientes = pendientes.exclude(usuario__in=list(ocupados))
+        
+        sin_margen = presupuesto is not None and unidades_subida_hoy() + COSTO_INSERT > presupuesto
+        if sin_margen or not obtener_gestor_cuota().alcanza('youtube.videos.insert'):
+            pendientes = pendientes.filter(iniciado__isnull=False)
+        
+        job = pendientes.order_by('creado').first()
+        if job is None:
+            return None
+        
+        if reservar_job(job, UploadJob.PENDIENTE, max_por_usuario, presupuesto, max_global):
+            return job
+        # Otro worker lo tomó primero (o llenó el cupo): intentar con el siguiente
+
+
+def procesar_job(job, fuente=None):
+    """
+    Sube el archivo de un UploadJob, registra el Video y limpia el temporal
+    
+    Args:
+        job: UploadJob en estado 'subiendo'
+        fuente: MediaUpload alternativo (transmisión); por defecto se lee job.archivo_path
+    
+    Returns:
+        tuple: (job actualizado, estadísticas de la subida o None si no empezó)
+    """
+    servicio = YouTubeUploadService()
+    
+    def al_progresar(enviados, totales, sesion_uri):
+        # Solo se escriben las columnas de progreso (no pisa otros cambios del job)
+        UploadJob.objects.filter(pk=job.pk).update(
+            bytes_enviados=enviados,  # Offset confirmado por el servidor
+            bytes_totales=totales or 0,
+            sesion_uri=sesion_uri or '',  # Permite reanudar si el worker muere
+            actualizado=timezone.now()  # Latido del worker
+        )
+    
+    try:
+        creds = job.usuario.youtube_creds
+        credentials = credenciales_desde_dict(creds.token)
+        
+        response = servicio.subir_video(
+            credentials=credentials,
+            archivo_path=job.archivo_path,
+            titulo=job.titulo,
+            descripcion=job.descripcion,
+            categoria=job.categoria,
+            privacidad=job.privacidad,
+            al_progresar=al_progresar,
+            sesion_uri=job.sesion_uri or None,  # Reanuda una subida interrumpida
+            media=fuente
+        )
+        
+        # El token pudo refrescarse durante la subida: se guarda el vigente
+        creds.token = credenciales_a_dict(credentials)
+        creds.save(update_fields=['token'])
+        
+        if 'id' not in response:
+            raise Exception("YouTube no generó un ID de video.")
+        
+        # Guardar en DB local
+        snippet = response.get('snippet', {})
+        
+        job.video = Video.objects.create(
+            youtube_id=response['id'],
+            titulo=snippet.get('title', job.titulo),
+            descripcion=snippet.get('description', job.descripcion),
+            url_video=f"https://www.youtube.com/watch?v={response['id']}",
+            url_thumbnail=mejor_miniatura(snippet.get('thumbnails', {})),
+            canal_nombre=snippet.get('channelTitle', ''),
+            fecha_publicacion=snippet.get('publishedAt'),
+            categoria=job.categoria,
+            agregado_por=job.usuario
+        )
+        job.estado = UploadJob.COMPLETADO
+    except CuotaAgotada as e:
+        if fuente is None:
+            # Sin cuota no se envió nada: vuelve a la cola y el worker lo retoma cuando haya tokens
+            job.estado = UploadJob.PENDIENTE
+            job.iniciado = None
+            job.sesion_uri = ''
+            job.bytes_enviados = 0
+        else:
+            job.estado = UploadJob.ERROR  # En transmisión el archivo no llegará completo
+        job.error = str(e)
+    except Exception as e:
+        job.estado = UploadJob.ERROR
+        job.error = str(e)
+    finally:
+        if fuente is not None:
+            fuente.cerrar()
+        if job.estado != UploadJob.PENDIENTE and os.path.exists(job.archivo_path):
+            try:
+                os.remove(job.archivo_path)
+            except PermissionError:  # Windows: el archivo aún puede estar abierto
+                pass
+    
+    job.save(update_fields=['estado', 'video', 'error', 'iniciado', 'sesion_uri', 'bytes_enviados', 'actualizado'])
+    return job, servicio.estadisticas
+
+
+def procesar_job_en_hilo(job, fuente=None):
+    """procesar_job para hilos auxiliares: cierra su propia conexión a la BD al terminar"""
+    try:
+        return procesar_job(job, fuente=fuente)
+    finally:
+        connection.close()
+
+
+def transmitir_job(job, flujo):
+    """
+    Recibe el archivo de un UploadJob desde `flujo` y lo sube a YouTube a la vez
+    
+    Cada bloque leído del cuerpo de la petición se escribe en job.archivo_path
+    y queda disponible para ArchivoCreciente; un hilo envía los fragmentos a
+    YouTube en paralelo. Al terminar la recepción el hilo sigue con el último
+    fragmento y la vista puede responder sin esperarlo: si el proceso muere, el
+    worker reanuda desde job.sesion_uri.
+    
+    Args:
+        job: UploadJob en estado 'subiendo' con bytes_totales = tamaño anunciado
+        flujo: Objeto con read(n) (el HttpRequest)
+    
+    Returns:
+        int: Bytes recibidos (menos que bytes_totales si el envío se cortó)
+    """
+    recibidos = 0
+    with open(job.archivo_path, 'wb') as destino:
+        fuente = ArchivoCreciente(job.archivo_path, job.bytes_totales)
+        hilo = threading.Thread(target=procesar_job_en_hilo, args=(job, fuente), daemon=True)
+        hilo.start()
+        try:
+            while recibidos < job.bytes_totales and hilo.is_alive():  # Si la subida falló no se sigue leyendo
+                bloque = flujo.read(min(BLOQUE_RECEPCION, job.bytes_totales - recibidos))
+                if not bloque:
+                    break
+                destino.write(bloque)
+                destino.flush()  # Visible para el lector antes de avisarle
+                recibidos += len(bloque)
+                fuente.avanzar(len(bloque))
+        finally:
+            if recibidos < job.bytes_totales:
+                fuente.cancelar()
+    return recibidos
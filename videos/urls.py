@@ -8,9 +8,17 @@ urlpatterns = [
     path('', views.inicio, name='inicio'),
     path('mis-videos/', views.mis_videos, name='mis_videos'),
     path('video/<int:video_id>/', views.detalle_video, name='detalle_video'),
+    path('miniaturas/<str:youtube_id>/<int:ancho>.webp', views.miniatura, name='miniatura'),
+    path('api/videos/', views.videos_json, name='videos_json'),
+    path('api/cuota/', views.estado_cuota, name='estado_cuota'),
+    path('metricas/', views.metricas, name='metricas'),
     
     # --- Proceso de Subida ---
     path('subir/', views.subir_video, name='subir_video'),
+    path('subir/lote/', views.subir_lote, name='subir_lote'),
+    path('lotes/<int:lote_id>/estado/', views.estado_lote, name='estado_lote'),
+    path('subidas/<int:job_id>/estado/', views.estado_subida, name='estado_subida'),
+    path('subidas/<int:job_id>/archivo/', views.transmitir_archivo, name='transmitir_archivo'),
     
     # --- Autenticación y Google OAuth ---
     path('login/', views.login_view, name='login'),
@@ -1,22 +1,33 @@
+import hmac  # Comparación del token de métricas en tiempo constante
+import json
 import os
-import time
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout, login
-from django.core.files.storage import FileSystemStorage
-from django.db.models import Sum
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
 
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
 
 # Asumiendo que estos archivos existen en tu carpeta de app
-from .models import Video
+from .models import LoteSubida, Tag, UploadJob, Video, YouTubeCredentials
 from .youtube_service import YouTubeService
-from .upload_service import YouTubeUploadService
+from .upload_service import reservar_job, transmitir_job
+from .upload_handlers import crear_archivo_subida, subida_directa
+from .totales_service import calcular_totales, totales_globales, totales_usuario
+from .paginacion import CAMPOS_LISTA, paginar_keyset
+from .busqueda_service import buscar_videos
+from .cuota_service import obtener_gestor_cuota
+from .metricas_service import registro
+from .miniaturas_service import MiniaturaNoDisponible, etag, obtener_almacen
 
 # Definimos las categorías aquí para pasarlas al Template HTML
 YOUTUBE_CATEGORIES = [
@@ -28,56 +39,152 @@ YOUTUBE_CATEGORIES = [
     ('20', 'Gaming'),
 ]
 
+VIDEOS_POR_PAGINA = 24  # Grilla de inicio (múltiplo de 3 columnas)
+
 # --- VISTAS GENERALES ---
 
 def inicio(request):
-    videos = Video.objects.all().order_by('-fecha_publicacion')
-    total_videos = videos.count()
-    total_views = videos.aggregate(Sum('vistas'))['vistas__sum'] or 0
-    total_likes = videos.aggregate(Sum('likes'))['likes__sum'] or 0
+    # Solo una página, con las columnas que muestra la grilla
+    videos = paginar_keyset(
+        Video.objects.only(*CAMPOS_LISTA),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        tamano=VIDEOS_POR_PAGINA
+    )
+    totales = totales_globales()  # Cacheados; se invalidan al guardar/borrar videos
     
     context = {
         'videos': videos,
-        'total_videos': total_videos,
-        'total_views': total_views,
-        'total_likes': total_likes,
+        'total_videos': totales['videos'],
+        'total_views': totales['vistas'],
+        'total_likes': totales['likes'],
     }
     return render(request, 'videos/inicio.html', context)
 
 @login_required
 def mis_videos(request):
-    videos_list = Video.objects.filter(agregado_por=request.user).order_by('-fecha_publicacion')
+    videos_list = Video.objects.filter(agregado_por=request.user)
 
-    # Buscador
+    # Buscador (FULLTEXT sobre título, descripción y etiquetas, ordenado por relevancia)
     query = request.GET.get('buscar')
     if query:
-        videos_list = videos_list.filter(titulo__icontains=query)
+        videos_list = buscar_videos(videos_list, query)
 
     # Filtro Categoría
     categoria_filtro = request.GET.get('categoria')
     if categoria_filtro:
         videos_list = videos_list.filter(categoria=categoria_filtro)
 
-    # Cálculos
-    total_views = videos_list.aggregate(Sum('vistas'))['vistas__sum'] or 0
-    total_likes = videos_list.aggregate(Sum('likes'))['likes__sum'] or 0
-    total_comments = videos_list.aggregate(Sum('comentarios'))['comentarios__sum'] or 0
-    cantidad_videos = videos_list.count()
-
-    # Paginación
-    paginator = Paginator(videos_list, 10) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Filtro Tag (búsqueda por índice en la tabla intermedia)
+    tag_filtro = request.GET.get('tag')
+    if tag_filtro:
+        videos_list = videos_list.filter(tags__nombre=tag_filtro.strip().lower())
+
+    # Cálculos: totales cacheados del usuario, o una sola consulta si hay filtros
+    if query or categoria_filtro or tag_filtro:
+        totales = calcular_totales(videos_list)
+    else:
+        totales = totales_usuario(request.user.id)
+
+    # Paginación por cursor: sin COUNT ni OFFSET, y sin descripcion/etiquetas
+    page_obj = paginar_keyset(
+        videos_list.only(*CAMPOS_LISTA, 'agregado_por'),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        tamano=10,
+        campo='relevancia' if query else 'fecha_publicacion'
+    )
+
+    # Filtros actuales para conservarlos en los enlaces de paginación
+    filtros = request.GET.copy()
+    filtros.pop('despues', None)
+    filtros.pop('antes', None)
+
+    # Nube de tags: un solo GROUP BY sobre la tabla intermedia
+    nube_tags = (
+        Tag.objects.filter(videotag__video__agregado_por=request.user)
+        .annotate(total=Count('videotag'))
+        .order_by('-total', 'nombre')[:30]
+    )
+
+    # Subidas en cola o en curso (su progreso se sondea desde el navegador)
+    subidas = UploadJob.objects.filter(
+        usuario=request.user, estado__in=[UploadJob.RECIBIENDO, UploadJob.PENDIENTE, UploadJob.SUBIENDO]
+    )
 
     context = {
         'videos': page_obj,
-        'total_views': total_views,
-        'total_likes': total_likes,
-        'total_comments': total_comments,
-        'total_videos_count': cantidad_videos
+        'filtros': filtros.urlencode(),
+        'nube_tags': nube_tags,
+        'subidas': subidas,
+        'total_views': totales['vistas'],
+        'total_likes': totales['likes'],
+        'total_comments': totales['comentarios'],
+        'total_videos_count': totales['videos']
     }
     return render(request, 'videos/mis_videos.html', context)
 
+def videos_json(request):
+    """Página de videos en JSON para el scroll infinito de inicio"""
+    pagina = paginar_keyset(
+        Video.objects.only(*CAMPOS_LISTA),
+        despues=request.GET.get('despues'),
+        tamano=VIDEOS_POR_PAGINA
+    )
+    return JsonResponse({
+        'videos': [
+            {
+                'id': video.id,
+                'youtube_id': video.youtube_id,
+                'titulo': video.titulo,
+                'url_thumbnail': video.url_thumbnail,
+                'url_miniatura': reverse('videos:miniatura', args=[video.youtube_id, 320]),
+                'url_miniatura_2x': reverse('videos:miniatura', args=[video.youtube_id, 480]),
+                'canal_nombre': video.canal_nombre,
+                'vistas': video.vistas,
+                'likes': video.likes,
+                'fecha_publicacion': video.fecha_publicacion.isoformat(),
+            }
+            for video in pagina
+        ],
+        'siguiente': pagina.siguiente,
+    })
+
+def miniatura(request, youtube_id, ancho):
+    """
+    Miniatura de un video en WebP al ancho pedido, servida desde el disco local
+
+    La primera vez se descarga de YouTube y se convierte; si eso falla se
+    redirige a la original para que la página no quede sin imagen.
+    """
+    almacen = obtener_almacen()
+    try:
+        contenido = almacen.leer(youtube_id, ancho)  # Sin consultas a la BD si ya está en disco
+    except ValueError:
+        raise Http404("Miniatura no disponible")
+
+    resultado = 'disco'
+    if contenido is None:
+        url = Video.objects.filter(youtube_id=youtube_id).values_list('url_thumbnail', flat=True).first()
+        if not url:
+            raise Http404("Video no encontrado")
+        try:
+            contenido = almacen.generar(youtube_id, ancho, url)
+        except MiniaturaNoDisponible:
+            registro.incrementar('miniaturas_total', resultado='error')
+            if not url.startswith(('https://', 'http://')):
+                raise Http404("Miniatura no disponible")
+            return HttpResponseRedirect(url)
+        resultado = 'generada'
+    registro.incrementar('miniaturas_total', resultado=resultado)
+
+    etiqueta = etag(contenido)
+    respuesta = HttpResponse(contenido, content_type='image/webp', headers={
+        'ETag': etiqueta,
+        'Cache-Control': f"public, max-age={almacen.max_age}",
+    })
+    return get_conditional_response(request, etag=etiqueta, response=respuesta)  # 304 si el navegador ya la tiene
+
 def detalle_video(request, video_id):
     video = get_object_or_404(Video, pk=video_id)
     return render(request, 'videos/detalle_video.html', {'video': video})
@@ -184,84 +291,217 @@ def oauth_callback(request):
         messages.error(request, f"Error en autenticación: {e}")
     return redirect('videos:inicio')
 
+@subida_directa
 @login_required
 def subir_video(request):
-    """Paso 3: Formulario y proceso de subida"""
+    """Paso 3: Formulario y encolado de la subida (la sube el worker procesar_subidas)"""
     creds_data = request.session.get('credentials')
     
     if not creds_data or not creds_data.get('refresh_token'):
         messages.info(request, "Tu sesión de YouTube no permite renovar el acceso. Por favor, autoriza de nuevo.")
         return redirect('videos:autorizar_youtube')
 
+    transmision = settings.YOUTUBE_UPLOAD_TRANSMISION
+
     if request.method == 'POST':
         archivo = request.FILES.get('video')
-        uploaded_file_path = None
+        tamano = request.POST.get('tamano', '')
         
-        if archivo:
-            try:
-                # 1. Guardar temporalmente
-                fs = FileSystemStorage()
-                filename = fs.save(f"temp_{request.user.id}_{archivo.name}", archivo)
-                uploaded_file_path = fs.path(filename)
-
-                # 2. Reconstruir credenciales para que puedan auto-refrescarse
-                credentials = Credentials(
-                    token=creds_data['token'],
-                    refresh_token=creds_data['refresh_token'],
-                    token_uri=creds_data['token_uri'],
-                    client_id=creds_data['client_id'],
-                    client_secret=creds_data['client_secret'],
-                    scopes=creds_data['scopes']
-                )
-
-                # 3. Subida
-                uploader = YouTubeUploadService()
-                response = uploader.subir_video(
-                    credentials=credentials,
-                    archivo_path=uploaded_file_path,
-                    titulo=request.POST.get('titulo'),
-                    descripcion=request.POST.get('descripcion'),
-                    categoria=request.POST.get('categoria'),
-                    privacidad=request.POST.get('privacidad')
-                )
-
-                if 'id' in response:
-                    # Guardar en DB local
-                    snippet = response.get('snippet', {})
-                    thumbs = snippet.get('thumbnails', {})
-                    high_thumb = thumbs.get('high', {}).get('url') or thumbs.get('default', {}).get('url')
-
-                    Video.objects.create(
-                        youtube_id=response['id'],
-                        titulo=snippet.get('title', request.POST.get('titulo')),
-                        descripcion=snippet.get('description', request.POST.get('descripcion')),
-                        url_video=f"https://www.youtube.com/watch?v={response['id']}",
-                        url_thumbnail=high_thumb,
-                        canal_nombre=snippet.get('channelTitle', ''),
-                        fecha_publicacion=snippet.get('publishedAt'),
-                        categoria=request.POST.get('categoria'),
-                        agregado_por=request.user
-                    )
-                    messages.success(request, "¡Video subido con éxito!")
-                    return redirect('videos:mis_videos')
-                else:
-                    messages.error(request, "Error: YouTube no generó un ID de video.")
-
-            except Exception as e:
-                # Si el error es de tokens, limpiar sesión para forzar re-login
-                if "refresh_token" in str(e).lower():
-                    if 'credentials' in request.session: del request.session['credentials']
-                messages.error(request, f"Error crítico: {e}")
+        if archivo or (transmision and request.POST.get('transmision') and tamano.isdigit()):
+            # El worker no tiene acceso a la sesión: las credenciales se guardan en la BD
+            YouTubeCredentials.objects.update_or_create(user=request.user, defaults={'token': creds_data})
+
+            if archivo:
+                # El handler ya escribió el archivo en YOUTUBE_UPLOAD_DIR: se encola tal cual, sin copiarlo
+                archivo.conservar = True
+                archivo_path, estado, bytes_totales = archivo.temporary_file_path(), UploadJob.PENDIENTE, archivo.size
+            else:
+                # Transmisión: el archivo llegará por PUT a transmitir_archivo
+                with crear_archivo_subida() as destino:
+                    archivo_path = destino.name
+                estado, bytes_totales = UploadJob.RECIBIENDO, int(tamano)
+
+            job = UploadJob.objects.create(
+                usuario=request.user,
+                estado=estado,
+                archivo_path=archivo_path,
+                titulo=request.POST.get('titulo'),
+                descripcion=request.POST.get('descripcion', ''),
+                categoria=request.POST.get('categoria'),
+                privacidad=request.POST.get('privacidad'),
+                bytes_totales=bytes_totales
+            )
             
-            finally:
-                # BORRADO SEGURO PARA WINDOWS
-                if uploaded_file_path and os.path.exists(uploaded_file_path):
-                    try:
-                        time.sleep(1.0)
-                        os.remove(uploaded_file_path)
-                    except PermissionError:
-                        pass
+            if request.headers.get('Accept') == 'application/json':
+                datos = {'job_id': job.pk, 'progreso_url': reverse('videos:estado_subida', args=[job.pk])}
+                if estado == UploadJob.RECIBIENDO:
+                    datos['archivo_url'] = reverse('videos:transmitir_archivo', args=[job.pk])
+                return JsonResponse(datos, status=202)
+            
+            messages.success(request, f"Video en cola de subida (#{job.pk}). Puedes seguir navegando.")
+            return redirect('videos:mis_videos')
         else:
             messages.error(request, "Selecciona un archivo.")
 
-    return render(request, 'videos/subir_video.html', {'categorias': YOUTUBE_CATEGORIES})
\ No newline at end of file
+    return render(request, 'videos/subir_video.html', {'categorias': YOUTUBE_CATEGORIES, 'transmision': transmision})
+
+@login_required
+def transmitir_archivo(request, job_id):
+    """Recibe el video como cuerpo crudo (PUT) y lo reenvía a YouTube mientras llega"""
+    if request.method != 'PUT':
+        return HttpResponseNotAllowed(['PUT'])
+    
+    job = get_object_or_404(UploadJob, pk=job_id, usuario=request.user)
+    
+    if request.headers.get('Content-Length') != str(job.bytes_totales):
+        return JsonResponse({'error': 'El tamaño no coincide con el anunciado'}, status=400)
+    
+    # Misma reserva que los workers: una sola transmisión por job aunque el
+    # navegador reintente, y con los límites por usuario, global y de cuota
+    if not reservar_job(
+        job, UploadJob.RECIBIENDO,
+        max_por_usuario=settings.YOUTUBE_UPLOAD_POR_USUARIO,
+        presupuesto=settings.YOUTUBE_PRESUPUESTO_SUBIDAS,
+        max_global=settings.YOUTUBE_UPLOAD_MAX_GLOBAL,
+    ):
+        if UploadJob.objects.filter(pk=job.pk, estado=UploadJob.RECIBIENDO).exists():
+            respuesta = JsonResponse(
+                {'error': 'Demasiadas subidas en curso o cuota del día agotada; reintenta más tarde'}, status=429
+            )
+            respuesta['Retry-After'] = '60'
+            return respuesta
+        return JsonResponse({'error': 'La subida no está esperando el archivo'}, status=409)
+    
+    recibidos = transmitir_job(job, request)
+    if recibidos < job.bytes_totales:
+        job.refresh_from_db(fields=['estado', 'error'])
+        return JsonResponse({'job_id': job.pk, 'estado': job.estado, 'error': job.error}, status=400)
+    
+    # El hilo de subida termina el último fragmento por su cuenta
+    return JsonResponse({
+        'job_id': job.pk,
+        'progreso_url': reverse('videos:estado_subida', args=[job.pk]),
+    }, status=202)
+
+@subida_directa
+@login_required
+def subir_lote(request):
+    """
+    API: encola varios videos en un solo POST, cada uno con sus metadatos
+    
+    Espera los archivos en `videos` (repetido) y opcionalmente `metadatos`: una
+    lista JSON en el mismo orden con titulo/descripcion/categoria/privacidad.
+    Los workers los suben en paralelo respetando los límites por usuario.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    creds_data = request.session.get('credentials')
+    if not creds_data or not creds_data.get('refresh_token'):
+        return JsonResponse({'error': 'Autoriza tu cuenta de YouTube antes de subir'}, status=403)
+    
+    archivos = request.FILES.getlist('videos')
+    if not archivos:
+        return JsonResponse({'error': 'No se recibieron archivos en el campo videos'}, status=400)
+    
+    try:
+        metadatos = json.loads(request.POST.get('metadatos') or '[]')
+    except ValueError:
+        return JsonResponse({'error': 'metadatos no es JSON válido'}, status=400)
+    if not isinstance(metadatos, list) or (metadatos and len(metadatos) != len(archivos)):
+        return JsonResponse({'error': 'metadatos debe ser una lista con un elemento por archivo'}, status=400)
+    
+    YouTubeCredentials.objects.update_or_create(user=request.user, defaults={'token': creds_data})
+    
+    with transaction.atomic():
+        lote = LoteSubida.objects.create(usuario=request.user)
+        for numero, archivo in enumerate(archivos):
+            datos = metadatos[numero] if metadatos else {}
+            UploadJob.objects.create(
+                usuario=request.user,
+                lote=lote,
+                archivo_path=archivo.temporary_file_path(),
+                titulo=datos.get('titulo') or os.path.splitext(archivo.name)[0],  # Por defecto el nombre del archivo
+                descripcion=datos.get('descripcion', ''),
+                categoria=str(datos.get('categoria', '22')),
+                privacidad=datos.get('privacidad', 'private'),
+                bytes_totales=archivo.size
+            )
+    
+    for archivo in archivos:
+        archivo.conservar = True  # Solo tras confirmar la transacción
+    
+    return JsonResponse({
+        'lote_id': lote.pk,
+        'jobs': list(lote.jobs.order_by('pk').values_list('pk', flat=True)),
+        'progreso_url': reverse('videos:estado_lote', args=[lote.pk]),
+    }, status=202)
+
+@login_required
+def estado_lote(request, lote_id):
+    """Progreso agregado de un lote: bytes de todos sus videos y conteo por estado"""
+    lote = get_object_or_404(LoteSubida, pk=lote_id, usuario=request.user)
+    jobs = list(lote.jobs.order_by('pk'))
+    
+    # Los completados cuentan entero (el último fragmento no actualiza bytes_enviados)
+    enviados = sum(job.bytes_totales if job.estado == UploadJob.COMPLETADO else job.bytes_enviados for job in jobs)
+    totales = sum(job.bytes_totales for job in jobs)
+    por_estado = {}
+    for job in jobs:
+        por_estado[job.estado] = por_estado.get(job.estado, 0) + 1
+    
+    return JsonResponse({
+        'lote_id': lote.pk,
+        'progreso': round(enviados / totales, 4) if totales else 0.0,
+        'bytes_enviados': enviados,
+        'bytes_totales': totales,
+        'por_estado': por_estado,
+        'terminado': all(job.estado in (UploadJob.COMPLETADO, UploadJob.ERROR) for job in jobs),
+        'jobs': [
+            {
+                'job_id': job.pk,
+                'titulo': job.titulo,
+                'estado': job.estado,
+                'progreso': round(job.progreso, 4),
+                'video_id': job.video_id,
+                'error': job.error,
+            }
+            for job in jobs
+        ],
+    })
+
+@login_required
+def estado_subida(request, job_id):
+    """Progreso de una subida en cola (JSON para sondeo desde el navegador)"""
+    job = get_object_or_404(UploadJob, pk=job_id, usuario=request.user)
+    return JsonResponse({
+        'job_id': job.pk,
+        'titulo': job.titulo,
+        'estado': job.estado,
+        'progreso': round(job.progreso, 4),
+        'bytes_enviados': job.bytes_enviados,
+        'bytes_totales': job.bytes_totales,
+        'video_id': job.video_id,
+        'error': job.error,
+    })
+
+@staff_member_required
+def estado_cuota(request):
+    """Cuota de la API del día: consumo por método, tokens disponibles y rechazos"""
+    return JsonResponse(obtener_gestor_cuota().estado())
+
+def metricas(request):
+    """
+    Métricas del proceso en formato de texto de Prometheus
+
+    Acceso para staff o con 'Authorization: Bearer <METRICAS_TOKEN>' (el scraper).
+    """
+    token = settings.METRICAS_TOKEN
+    cabecera = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and hmac.compare_digest(cabecera, f"Bearer {token}"))):
+        return HttpResponse(status=403)
+
+    estado = obtener_gestor_cuota().estado()  # Gauges leídos al momento del scrape
+    registro.fijar('youtube_cuota_restante_dia', estado['restante_dia'])
+    registro.fijar('youtube_cuota_tokens', estado['tokens'])
+    return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
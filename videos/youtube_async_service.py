@@ -0,0 +1,201 @@
+import asyncio  # Consultas concurrentes en un solo hilo
+import time  # Plazo de espera de cuota
+
+import httpx  # Cliente HTTP asíncrono con pool de conexiones
+
+from asgiref.sync import sync_to_async  # ORM de Django desde corrutinas
+from django.conf import settings
+
+from .clientes_service import obtener_documento
+from .cuota_service import obtener_gestor_cuota
+from .metricas_service import medir_llamada
+from .normalizacion import mascara_videos
+from .youtube_service import CAMPOS_ESTADISTICAS, TAMANO_LOTE, YouTubeService, obtener_cache_respuestas
+
+
+class YouTubeServiceAsync:
+    """
+    Contraparte asyncio de YouTubeService para consultar muchas cosas a la vez
+
+    Comparte la caché y la normalización con YouTubeService; las peticiones
+    van por un httpx.AsyncClient que reutiliza conexiones, y un semáforo
+    limita cuántas hay en vuelo. La caché es síncrona (con CacheDjango puede
+    ser la de base de datos): cada acceso pasa por sync_to_async. Uso:
+
+        async with YouTubeServiceAsync() as servicio:
+            resultados = await servicio.buscar_varios(['django', 'mysql'])
+
+    Desde una vista síncrona: async_to_sync(funcion_async)(...).
+    """
+
+    def __init__(self, cache=None, max_concurrencia=None):
+        self.cache = cache or obtener_cache_respuestas()
+        self._sincrono = YouTubeService(cache=self.cache)  # Planificación, caché y normalizadores
+        self.max_concurrencia = max_concurrencia or getattr(settings, 'YOUTUBE_ASYNC_CONCURRENCIA', 10)
+        self._semaforo = asyncio.Semaphore(self.max_concurrencia)
+        self._cliente = None  # httpx.AsyncClient, se crea al entrar al contexto
+
+    async def __aenter__(self):
+        documento = obtener_documento(settings.YOUTUBE_API_SERVICE_NAME, settings.YOUTUBE_API_VERSION)
+        self._cliente = httpx.AsyncClient(
+            base_url=documento['baseUrl'],  # https://youtube.googleapis.com/youtube/v3/
+            params={'key': settings.YOUTUBE_API_KEY},
+            # Google solo comprime si el User-Agent también dice "gzip"; httpx descomprime solo
+            headers={'Accept-Encoding': 'gzip', 'User-Agent': 'videos-youtube-async (gzip)'},
+            limits=httpx.Limits(
+                max_connections=self.max_concurrencia,
+                max_keepalive_connections=self.max_concurrencia
+            ),
+            timeout=60
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._cliente.aclose()
+        self._cliente = None
+
+    async def _get(self, recurso, **params):
+        """GET a un recurso de la API (search, videos, ...) respetando el semáforo"""
+        if self._cliente is None:
+            raise RuntimeError("Usa 'async with YouTubeServiceAsync() as servicio'")
+
+        params = {clave: valor for clave, valor in params.items() if valor is not None}
+        await self._reservar_cuota(f'youtube.{recurso}.list')
+        async with self._semaforo:
+            with medir_llamada(f'youtube.{recurso}.list') as medicion:  # Sin contar la espera del semáforo
+                respuesta = await self._cliente.get(recurso, params=params)
+                medicion['recibidos'] = respuesta.num_bytes_downloaded  # Bytes en el cable (comprimidos)
+                respuesta.raise_for_status()
+        return respuesta.json()
+
+    @staticmethod
+    async def _reservar_cuota(metodo):
+        """
+        GestorCuota.consumir para corrutinas: la reserva (un UPDATE) va por el
+        hilo de la petición y la espera de tokens (ESPERA_MAXIMA) es un
+        asyncio.sleep, sin ocupar hilos ni conexiones a la BD mientras tanto
+        """
+        gestor = obtener_gestor_cuota()
+        plazo = time.monotonic() + gestor.espera_maxima
+        while (espera := await sync_to_async(gestor.reservar)(metodo)) != 0:
+            if espera is None or time.monotonic() + espera > plazo:
+                raise await sync_to_async(gestor.rechazar)(metodo, gestor.costo(metodo), espera)
+            await asyncio.sleep(espera)
+
+    async def buscar_videos(self, query, max_resultados=10, orden='relevance', campos=None):
+        """
+        Busca videos en YouTube (corrutina; misma caché que YouTubeService)
+
+        Args:
+            campos: Uso de CAMPOS_POR_USO ('lista') o campos que lee el llamador (None = todos)
+
+        Returns:
+            list: Lista de diccionarios con información de videos
+        """
+        params = self._sincrono._params_busqueda(query, max_resultados, orden)
+        video_ids = await sync_to_async(self.cache.obtener)('busqueda', **params)
+
+        if video_ids is None:
+            respuesta = await self._get(
+                'search',
+                q=query,
+                part='id',  # Los detalles salen de videos.list (o de la caché)
+                fields='items(id/videoId)',
+                type='video',
+                maxResults=max_resultados,
+                order=orden,
+                regionCode='HN'
+            )
+            video_ids = [item['id']['videoId'] for item in respuesta.get('items', [])]
+            await sync_to_async(self.cache.guardar)('busqueda', video_ids, **params)
+
+        return await self.obtener_detalles_videos(video_ids, campos) if video_ids else []
+
+    async def obtener_detalles_videos(self, video_ids, campos=None):
+        """
+        Información detallada de videos en el orden de entrada (corrutina)
+
+        Igual que YouTubeService.obtener_detalles_videos, pero los lotes de 50
+        se piden concurrentemente en el event loop en lugar de en hilos.
+        """
+        plan = await sync_to_async(self._sincrono._planificar_detalles)(video_ids, campos)  # Consulta la BD
+
+        items_completos, items_estadisticas = await asyncio.gather(
+            self._consultar_videos(plan['desconocidos'], *mascara_videos(plan['campos_api'])),
+            self._consultar_videos(plan['vencidos'], *mascara_videos(CAMPOS_ESTADISTICAS))
+        )
+        # Guarda los videos nuevos en la caché
+        return await sync_to_async(self._sincrono._completar_detalles)(plan, items_completos, items_estadisticas)
+
+    async def _consultar_videos(self, video_ids, part, fields=None):
+        """videos.list en lotes de 50, todos en vuelo a la vez (acotados por el semáforo)"""
+        lotes = [video_ids[i:i + TAMANO_LOTE] for i in range(0, len(video_ids), TAMANO_LOTE)]
+        respuestas = await asyncio.gather(*(
+            self._get('videos', id=','.join(lote), part=part, fields=fields) for lote in lotes
+        ))
+        return [item for respuesta in respuestas for item in respuesta.get('items', [])]
+
+    async def obtener_playlist_subidas(self, canal_id):
+        """Playlist de subidas ('uploads') del canal, cacheada con el TTL de 'canal'"""
+        playlist_id = await sync_to_async(self.cache.obtener)('canal', canal=canal_id)
+        if playlist_id is None:
+            respuesta = await self._get(
+                'channels', id=canal_id, part='contentDetails', fields='items(contentDetails/relatedPlaylists/uploads)'
+            )
+            items = respuesta.get('items', [])
+            if not items:
+                raise ValueError(f"Canal no encontrado: {canal_id}")
+            playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
+            await sync_to_async(self.cache.guardar)('canal', playlist_id, canal=canal_id)
+        return playlist_id
+
+    async def obtener_videos_canal(self, canal_id, max_resultados=20, campos=None):
+        """
+        Videos más recientes de un canal vía playlistItems (1 unidad por página)
+
+        Las páginas dependen del nextPageToken anterior, así que se recorren en
+        orden; los detalles de todas se piden juntos al final.
+        """
+        playlist_id = await self.obtener_playlist_subidas(canal_id)
+        video_ids = []
+        token = None
+
+        while len(video_ids) < max_resultados:
+            respuesta = await self._get(
+                'playlistItems',
+                playlistId=playlist_id,
+                part='contentDetails',
+                fields='nextPageToken,items(contentDetails/videoId)',
+                maxResults=min(TAMANO_LOTE, max_resultados - len(video_ids)),
+                pageToken=token
+            )
+            video_ids += [item['contentDetails']['videoId'] for item in respuesta.get('items', [])]
+            token = respuesta.get('nextPageToken')
+            if not token:
+                break
+
+        return await self.obtener_detalles_videos(video_ids[:max_resultados], campos)
+
+    async def buscar_varios(self, queries, max_resultados=10, orden='relevance', campos=None):
+        """
+        Varias búsquedas concurrentes: el costo en tiempo es ~el de la más lenta
+
+        Returns:
+            dict: {query: lista de videos}
+        """
+        resultados = await asyncio.gather(*(
+            self.buscar_videos(query, max_resultados, orden, campos) for query in queries
+        ))
+        return dict(zip(queries, resultados))
+
+    async def videos_de_canales(self, canal_ids, max_resultados=20, campos=None):
+        """
+        Videos recientes de varios canales a la vez
+
+        Returns:
+            dict: {canal_id: lista de videos}
+        """
+        resultados = await asyncio.gather(*(
+            self.obtener_videos_canal(canal_id, max_resultados, campos) for canal_id in canal_ids
+        ))
+        return dict(zip(canal_ids, resultados))
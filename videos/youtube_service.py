@@ -1,20 +1,236 @@
-from googleapiclient.discovery import build  # Constructor de servicio Google
+import contextvars  # Atribución de cuota en los hilos del pool
+import hashlib  # Hash de claves de caché
+import json  # Serialización de parámetros
+import threading  # Bloqueo para la caché en memoria
+import time  # Reloj monotónico para TTL
+from concurrent.futures import ThreadPoolExecutor  # Lotes en paralelo
+
+from cachetools import TLRUCache  # Caché LRU con expiración por entrada
 from django.conf import settings  # Configuración
-from datetime import datetime  # Manejo de fechas
-import isodate  # Para parsear duración ISO 8601
+from django.core.cache import caches  # Caché compartida de Django
+from django.db import close_old_connections, connection  # Conexiones de los hilos propios
+from .clientes_service import cliente_api  # Clientes de la API reutilizados por hilo
+from .cuota_service import ejecutar  # Reserva la cuota antes de cada llamada
+from .normalizacion import CAMPOS, VideoNormalizado, mascara_videos  # Registro compacto y máscaras de campos
+
+
+TAMANO_LOTE = 50  # Máximo de IDs por llamada a videos.list
+
+# Campos que consume cada uso (ver normalizacion.CAMPOS); a la API solo se piden esos (part + fields)
+CAMPOS_POR_USO = {
+    'detalle': CAMPOS,  # Ingesta y vista de detalle: todo lo que se guarda en Video
+    'lista': (  # Grillas y resultados de búsqueda
+        'titulo', 'canal_nombre', 'url_thumbnail', 'fecha_publicacion', 'duracion_segundos', 'vistas', 'likes',
+    ),
+    'estadisticas': ('vistas', 'likes', 'comentarios'),  # refrescar_estadisticas
+}
+CAMPOS_ESTADISTICAS = frozenset(CAMPOS_POR_USO['estadisticas'])
+
+
+def resolver_campos(campos):
+    """frozenset de campos a partir de un uso ('lista'), un iterable de campos o None (todos)"""
+    if campos is None:
+        return frozenset(CAMPOS)
+    if isinstance(campos, str):
+        return frozenset(CAMPOS_POR_USO[campos])
+    return frozenset(campos)
+
+_pool = None  # Pool compartido para los lotes de videos.list
+_pool_lock = threading.Lock()
+
+
+def _pool_lotes():
+    """
+    Pool de hilos de larga vida para consultar lotes en paralelo
+
+    Un pool nuevo por llamada crearía hilos nuevos y, con ellos, conexiones
+    nuevas: los clientes y el keep-alive son por hilo (ver clientes_service).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'YOUTUBE_MAX_HILOS', 8), thread_name_prefix='youtube-lotes'
+            )
+    return _pool
+
+
+class CacheMemoria:
+    """Caché local al proceso con TTL por entrada y desalojo LRU"""
+
+    def __init__(self, max_entradas=1000):
+        # La expiración de cada entrada se guarda junto al valor: (ttl, valor)
+        self._cache = TLRUCache(
+            maxsize=max_entradas,  # Límite de entradas (desaloja la menos usada)
+            ttu=lambda clave, valor, ahora: ahora + valor[0],  # Expira a los ttl segundos
+            timer=time.monotonic
+        )
+        self._lock = threading.Lock()  # cachetools no es thread-safe
+
+    def get(self, clave, default=None):
+        with self._lock:
+            entrada = self._cache.get(clave)
+        return default if entrada is None else entrada[1]
+
+    def set(self, clave, valor, ttl):
+        with self._lock:
+            self._cache[clave] = (ttl, valor)
+
+    def get_many(self, claves):
+        with self._lock:
+            entradas = {clave: self._cache.get(clave) for clave in claves}
+        return {clave: entrada[1] for clave, entrada in entradas.items() if entrada is not None}
+
+    def set_many(self, valores, ttl):
+        with self._lock:
+            for clave, valor in valores.items():
+                self._cache[clave] = (ttl, valor)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class CacheDjango:
+    """Caché respaldada por el framework de caché de Django (compartida entre workers)"""
+
+    def __init__(self, alias='default'):
+        self._alias = alias  # Alias definido en settings.CACHES
+
+    @property
+    def _cache(self):
+        return caches[self._alias]  # Resuelve por hilo, como recomienda Django
+
+    def get(self, clave, default=None):
+        return self._cache.get(clave, default)
+
+    def set(self, clave, valor, ttl):
+        self._cache.set(clave, valor, timeout=ttl)
+
+    def get_many(self, claves):
+        return self._cache.get_many(claves)  # Una sola ida y vuelta al backend
+
+    def set_many(self, valores, ttl):
+        self._cache.set_many(valores, timeout=ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class CacheRespuestas:
+    """
+    Capa de caché para respuestas de YouTube Data API
+
+    Las claves se construyen a partir de los parámetros normalizados de la
+    petición, de modo que 'Django ' y 'django' comparten entrada. Cada tipo
+    de respuesta ('busqueda', 'detalles', 'canal') tiene su propio TTL. Los detalles
+    se guardan por video, con la marca de tiempo de sus estadísticas para
+    refrescarlas por separado ('estadisticas').
+    """
+
+    _FALTA = object()  # Centinela para distinguir None de ausencia
+    VERSION_VIDEOS = 2  # Subirla al cambiar la forma de las entradas por video (v2: VideoNormalizado, antes dict)
+
+    def __init__(self, backend, ttls, prefijo='yt'):
+        self.backend = backend  # CacheMemoria o CacheDjango
+        self.ttls = ttls  # {'busqueda': s, 'detalles': s, 'estadisticas': s}
+        self.prefijo = prefijo
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalizar_query(query):
+        """Minúsculas y espacios colapsados para que búsquedas equivalentes coincidan"""
+        return ' '.join(str(query).lower().split())
+
+    def clave(self, tipo, **params):
+        """Clave estable y corta (apta para memcached) a partir de los parámetros"""
+        crudo = json.dumps(params, sort_keys=True, default=str)  # Orden determinista
+        digest = hashlib.sha1(crudo.encode('utf-8')).hexdigest()
+        return f"{self.prefijo}:{tipo}:{digest}"
+
+    def obtener(self, tipo, **params):
+        """Retorna el valor cacheado o None si no existe o expiró"""
+        valor = self.backend.get(self.clave(tipo, **params), self._FALTA)
+        with self._lock:
+            if valor is self._FALTA:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+        return valor
+
+    def guardar(self, tipo, valor, **params):
+        self.backend.set(self.clave(tipo, **params), valor, self.ttls[tipo])
+
+    def clave_video(self, video_id):
+        """Clave de la entrada de un video; incluye la versión para no leer entradas de otro formato"""
+        return f"{self.prefijo}:video:v{self.VERSION_VIDEOS}:{video_id}"
+
+    def obtener_videos(self, video_ids):
+        """Entradas por video presentes en caché: {youtube_id: entrada}"""
+        claves = {self.clave_video(video_id): video_id for video_id in video_ids}
+        encontrados = self.backend.get_many(list(claves))
+        with self._lock:
+            self.aciertos += len(encontrados)
+            self.fallos += len(claves) - len(encontrados)
+        return {claves[clave]: entrada for clave, entrada in encontrados.items()}
+
+    def guardar_videos(self, entradas):
+        """Guarda entradas por video (vencen con el TTL de 'detalles')"""
+        if entradas:
+            valores = {self.clave_video(video_id): entrada for video_id, entrada in entradas.items()}
+            self.backend.set_many(valores, self.ttls['detalles'])
+
+    def estadisticas(self):
+        """Contadores de aciertos/fallos de este proceso"""
+        total = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / total if total else 0.0,
+        }
+
+
+_cache_por_defecto = None  # Instancia compartida por todos los YouTubeService del proceso
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_respuestas():
+    """Construye (una sola vez) la caché configurada en settings.YOUTUBE_CACHE"""
+    global _cache_por_defecto
+    with _cache_lock:
+        if _cache_por_defecto is None:
+            config = getattr(settings, 'YOUTUBE_CACHE', {})
+            if config.get('BACKEND', 'memoria') == 'django':
+                backend = CacheDjango(config.get('ALIAS', 'default'))
+            else:
+                backend = CacheMemoria(config.get('MAX_ENTRADAS', 1000))
+            _cache_por_defecto = CacheRespuestas(
+                backend,
+                ttls={
+                    'busqueda': config.get('TTL_BUSQUEDA', 300),  # 5 minutos
+                    'detalles': config.get('TTL_DETALLES', 86400),  # 1 día (snippet, contentDetails)
+                    'estadisticas': config.get('TTL_ESTADISTICAS', 900),  # 15 minutos
+                    'canal': config.get('TTL_CANAL', 604800),  # 1 semana (playlist de subidas)
+                }
+            )
+        return _cache_por_defecto
+
 
 class YouTubeService:
     """Servicio para interactuar con YouTube Data API v3"""
     
-    def __init__(self):
-        # Crear cliente de YouTube API con API Key
-        self.youtube = build(  # Construye servicio de YouTube
-            settings.YOUTUBE_API_SERVICE_NAME,  # 'youtube'
-            settings.YOUTUBE_API_VERSION,  # 'v3'
-            developerKey=settings.YOUTUBE_API_KEY  # API Key
-        )
+    def __init__(self, cache=None):
+        # Caché de respuestas (compartida por defecto entre instancias)
+        self.cache = cache or obtener_cache_respuestas()
+    
+    @property
+    def youtube(self):
+        """Cliente de YouTube API con API Key del hilo actual (ver clientes_service)"""
+        return cliente_api()
     
-    def buscar_videos(self, query, max_resultados=10, orden='relevance'):
+    def buscar_videos(self, query, max_resultados=10, orden='relevance', campos=None):
         """
         Busca videos en YouTube
         
@@ -22,100 +238,383 @@ class YouTubeService:
             query: Texto a buscar
             max_resultados: Cantidad máxima de resultados (1-50)
             orden: relevance, date, rating, title, viewCount
+            campos: Uso de CAMPOS_POR_USO ('lista') o campos que lee el llamador (None = todos)
         
         Returns:
             list: Lista de diccionarios con información de videos
         """
         
-        # Llamar endpoint search.list
-        search_response = self.youtube.search().list(  # Ejecuta búsqueda
-            q=query,  # Término de búsqueda
-            part='id,snippet',  # Partes a retornar
-            type='video',  # Solo videos (no canales ni playlists)
-            maxResults=max_resultados,  # Límite de resultados
-            order=orden,  # Criterio de ordenamiento
-            regionCode='HN'  # Región Honduras (opcional)
-        ).execute()  # Ejecuta la petición
+        params = self._params_busqueda(query, max_resultados, orden)
+        video_ids = self.cache.obtener('busqueda', **params)  # IDs de una búsqueda previa
         
-        # Extraer IDs de videos encontrados
-        video_ids = [item['id']['videoId'] for item in search_response.get('items', [])]  # Lista de IDs
+        if video_ids is None:
+            # Llamar endpoint search.list
+            search_response = ejecutar(self.youtube.search().list(  # Ejecuta búsqueda (100 unidades)
+                q=query,  # Término de búsqueda
+                part='id',  # Los detalles salen de videos.list (o de la caché)
+                fields='items(id/videoId)',  # Solo se leen los IDs
+                type='video',  # Solo videos (no canales ni playlists)
+                maxResults=max_resultados,  # Límite de resultados
+                order=orden,  # Criterio de ordenamiento
+                regionCode='HN'  # Región Honduras (opcional)
+            ))
+            
+            # Extraer IDs de videos encontrados
+            video_ids = [item['id']['videoId'] for item in search_response.get('items', [])]  # Lista de IDs
+            self.cache.guardar('busqueda', video_ids, **params)
         
         # Obtener detalles completos de los videos
         if video_ids:
-            videos_detalle = self.obtener_detalles_videos(video_ids)  # Llama método interno
+            videos_detalle = self.obtener_detalles_videos(video_ids, campos)  # Llama método interno
             return videos_detalle
         
         return []  # Sin resultados
     
-    def obtener_detalles_videos(self, video_ids):
+    def _params_busqueda(self, query, max_resultados, orden):
+        """Parámetros normalizados que identifican la búsqueda en caché"""
+        return {
+            'q': self.cache.normalizar_query(query),
+            'max': int(max_resultados),
+            'orden': orden,
+            'region': 'HN',
+        }
+    
+    def obtener_detalles_videos(self, video_ids, campos=None):
         """
         Obtiene información detallada de videos
         
+        Acepta cualquier cantidad de IDs: se dividen en lotes de 50 (límite de
+        videos.list) que se consultan en paralelo. Snippet y contentDetails
+        casi no cambian, así que se sirven desde la caché por video o desde la
+        tabla Video; a la API solo se piden los IDs desconocidos y las
+        estadísticas vencidas, y de ellos solo las partes y campos (fields) que
+        usa el llamador.
+        
         Args:
-            video_ids: Lista de IDs de videos o string único
+            video_ids: Iterable de IDs de videos o string único
+            campos: Uso de CAMPOS_POR_USO ('lista', 'detalle') o campos de
+                normalizacion.CAMPOS que lee el llamador (None = todos)
         
         Returns:
-            list: Información completa de videos
+            list: VideoNormalizado (se usan como dict) en el orden de entrada
+        """
+        
+        plan = self._planificar_detalles(video_ids, campos)
+        
+        return self._completar_detalles(
+            plan,
+            self._consultar_videos(plan['desconocidos'], *mascara_videos(plan['campos_api'])),  # IDs nuevos
+            self._consultar_videos(plan['vencidos'], *mascara_videos(CAMPOS_ESTADISTICAS))  # Estadísticas vencidas
+        )
+    
+    def _planificar_detalles(self, video_ids, campos=None):
+        """
+        Resuelve desde caché y BD lo que se pueda y decide qué pedir a la API
+        
+        Una entrada cacheada con menos campos de los pedidos (la guardó otro
+        uso, p. ej. 'lista') cuenta como desconocida y se vuelve a pedir con la
+        unión de sus campos y los pedidos, así la entrada solo crece.
+        
+        Returns:
+            dict: video_ids, campos, entradas, nuevas (a guardar en caché),
+            desconocidos, campos_api (a pedir para los desconocidos), vencidos
+            y ahora (marca de tiempo de la consulta)
         """
         
         # Convertir a lista si es string
         if isinstance(video_ids, str):
             video_ids = [video_ids]  # Convierte a lista
+        video_ids = list(dict.fromkeys(video_ids))  # Sin duplicados, conserva orden
+        campos = resolver_campos(campos)
+        
+        ahora = time.time()
+        entradas = self.cache.obtener_videos(video_ids)  # {id: {'video': dict, 'stats_en': ts}}
+        nuevas = {}  # Entradas a (re)guardar en caché
+        
+        # Lo que no está en caché puede estar ya en la base de datos local
+        faltantes = [video_id for video_id in video_ids if video_id not in entradas]
+        if faltantes:
+            desde_bd = self._entradas_desde_bd(faltantes)
+            entradas.update(desde_bd)
+            nuevas.update(desde_bd)
+        
+        # Entradas que no tienen todos los campos pedidos: se piden de nuevo, ampliadas
+        campos_api = set(campos)
+        incompletas = set()
+        for video_id, entrada in entradas.items():
+            if not campos <= entrada['video'].keys():
+                incompletas.add(video_id)
+                campos_api.update(entrada['video'].keys())
+        
+        refrescar_estadisticas = bool(campos & CAMPOS_ESTADISTICAS)  # Si no se leen, no importa que venzan
+        return {
+            'video_ids': video_ids,
+            'campos': campos,
+            'entradas': entradas,
+            'nuevas': nuevas,
+            'desconocidos': [
+                video_id for video_id in video_ids if video_id not in entradas or video_id in incompletas
+            ],
+            'campos_api': frozenset(campos_api),
+            'vencidos': [
+                video_id for video_id in video_ids
+                if refrescar_estadisticas and video_id in entradas and video_id not in incompletas
+                and ahora - entradas[video_id]['stats_en'] > self.cache.ttls['estadisticas']
+            ],
+            'ahora': ahora,
+        }
+    
+    def _completar_detalles(self, plan, items_completos, items_estadisticas):
+        """Incorpora las respuestas de la API al plan, actualiza la caché y arma el resultado"""
+        entradas, nuevas, ahora = plan['entradas'], plan['nuevas'], plan['ahora']
+        
+        for item in items_completos:
+            entradas[item['id']] = nuevas[item['id']] = {
+                'video': VideoNormalizado.desde_item(item, plan['campos_api']),  # Expone solo lo pedido
+                'stats_en': ahora,
+            }
+        
+        for item in items_estadisticas:
+            entrada = entradas[item['id']]
+            entrada['video'].actualizar(**self._normalizar_estadisticas(item.get('statistics', {})))
+            entrada['stats_en'] = ahora
+            nuevas[item['id']] = entrada
+        
+        self.cache.guardar_videos(nuevas)
+        
+        # Copias para que el llamador no modifique las entradas cacheadas
+        campos = plan['campos']
+        return [entradas[video_id]['video'].copia(campos) for video_id in plan['video_ids'] if video_id in entradas]
+    
+    def obtener_estadisticas(self, video_ids):
+        """
+        Consulta solo la parte statistics, sin pasar por la caché
+        
+        Args:
+            video_ids: Lista de IDs (cualquier cantidad, se consulta en lotes de 50)
+        
+        Returns:
+            dict: {youtube_id: {'vistas', 'likes', 'comentarios'}} de los videos que existen
+        """
+        return {
+            item['id']: self._normalizar_estadisticas(item.get('statistics', {}))
+            for item in self._consultar_videos(list(video_ids), *mascara_videos(CAMPOS_ESTADISTICAS))
+        }
+    
+    def _entradas_desde_bd(self, video_ids):
+        """Construye entradas de caché a partir de videos ya guardados en la tabla Video"""
+        from .models import Video  # Import diferido: evita cargar modelos al importar el servicio
+        
+        entradas = {}
+        filas = Video.objects.filter(youtube_id__in=video_ids).exclude(canal_id='').exclude(duracion='')
+        for video in filas.iterator():
+            entradas[video.youtube_id] = {
+                'video': VideoNormalizado.desde_modelo(video),
+                # Última vez que se refrescaron (o guardaron) las estadísticas
+                'stats_en': (video.estadisticas_actualizadas or video.actualizado).timestamp(),
+            }
+        return entradas
+    
+    @staticmethod
+    def _hasta_primer_conocido(video_ids):
+        """IDs anteriores al primero que ya está guardado en la tabla Video"""
+        from .models import Video
+        
+        conocidos = set(Video.objects.filter(youtube_id__in=video_ids).values_list('youtube_id', flat=True))
+        for posicion, video_id in enumerate(video_ids):
+            if video_id in conocidos:
+                return video_ids[:posicion]
+        return video_ids
+    
+    def _consultar_videos(self, video_ids, part, fields=None):
+        """Llama videos.list en lotes de 50 (en paralelo si hay varios) y retorna los items"""
+        
+        # Dividir en lotes de 50 IDs
+        lotes = [video_ids[i:i + TAMANO_LOTE] for i in range(0, len(video_ids), TAMANO_LOTE)]
+        
+        if len(lotes) <= 1:
+            resultados = [self._obtener_lote(lote, part, fields) for lote in lotes]  # Sin pool para un solo lote
+        else:
+            # Cada hilo del pool usa su propio cliente y conexión (self.youtube es por hilo)
+            contexto = contextvars.copy_context()  # a_cuenta_de() del llamador vale también en los hilos
+
+            def en_hilo(lote):
+                try:
+                    return contexto.copy().run(self._obtener_lote, lote, part, fields)
+                finally:
+                    # Hilos de larga vida sin ciclo de petición: Django no cierra sus conexiones
+                    # (la reserva de cuota consulta la BD); se respeta CONN_MAX_AGE
+                    close_old_connections()
+
+            resultados = list(_pool_lotes().map(en_hilo, lotes))
+        
+        return [item for lote in resultados for item in lote]
+    
+    def _obtener_lote(self, video_ids, part, fields=None):
+        """Llama videos.list para un lote de hasta 50 IDs"""
         
         # Llamar endpoint videos.list
-        videos_response = self.youtube.videos().list(  # Obtiene detalles
+        videos_response = ejecutar(self.youtube.videos().list(  # Obtiene detalles
             id=','.join(video_ids),  # IDs separados por coma
-            part='snippet,contentDetails,statistics'  # Incluye snippet, duración y stats
-        ).execute()
+            part=part,  # Solo las partes necesarias
+            fields=fields  # Y dentro de ellas solo los campos que se leen (respuesta parcial)
+        ))
         
-        videos = []  # Lista para almacenar resultados
+        return videos_response.get('items', [])
+    
+    @staticmethod
+    def _normalizar_estadisticas(statistics):
+        """Extrae los contadores de la parte statistics"""
+        return {
+            'vistas': int(statistics.get('viewCount', 0)),  # Visualizaciones
+            'likes': int(statistics.get('likeCount', 0)),  # Me gusta
+            'comentarios': int(statistics.get('commentCount', 0)),  # Comentarios
+        }
+    
+    @staticmethod
+    def _normalizar_video(item):
+        """Convierte un item de videos.list en el VideoNormalizado usado por la app"""
+        return VideoNormalizado.desde_item(item)
+    
+    def obtener_videos_canal(self, canal_id, max_resultados=20, campos=None):
+        """
+        Obtiene videos de un canal específico (más recientes primero)
         
-        for item in videos_response.get('items', []):  # Itera resultados
-            snippet = item['snippet']  # Información básica
-            statistics = item.get('statistics', {})  # Estadísticas (puede no existir)
-            content = item['contentDetails']  # Detalles de contenido
-            
-            # Parsear duración ISO 8601 (PT15M30S → 15:30)
-            duracion_iso = content.get('duration', 'PT0S')  # Obtiene duración
-            duracion_segundos = isodate.parse_duration(duracion_iso).total_seconds()  # Convierte a segundos
-            
-            video_data = {  # Construye diccionario con datos
-                'youtube_id': item['id'],  # ID del video
-                'titulo': snippet['title'],  # Título
-                'descripcion': snippet['description'],  # Descripción
-                'canal_id': snippet['channelId'],  # ID del canal
-                'canal_nombre': snippet['channelTitle'],  # Nombre del canal
-                'fecha_publicacion': datetime.fromisoformat(  # Convierte a datetime
-                    snippet['publishedAt'].replace('Z', '+00:00')
-                ),
-                'url_thumbnail': snippet['thumbnails']['high']['url'],  # Miniatura alta resolución
-                'url_video': f"https://www.youtube.com/watch?v={item['id']}",  # URL completa
-                'duracion': duracion_iso,  # Duración en formato ISO
-                'duracion_segundos': int(duracion_segundos),  # Duración en segundos
-                'vistas': int(statistics.get('viewCount', 0)),  # Visualizaciones
-                'likes': int(statistics.get('likeCount', 0)),  # Me gusta
-                'comentarios': int(statistics.get('commentCount', 0)),  # Comentarios
-                'etiquetas': ','.join(snippet.get('tags', [])),  # Tags separados por coma
-            }
+        Usa la playlist de subidas del canal (playlistItems.list, 1 unidad de
+        cuota por página) en lugar de search.list (100 unidades).
+        """
+        return list(self.iterar_videos_canal(canal_id, max_total=max_resultados, campos=campos))
+    
+    def obtener_playlist_subidas(self, canal_id):
+        """
+        Resuelve la playlist de subidas ('uploads') de un canal
+        
+        El resultado no cambia, así que se cachea con el TTL de 'canal'.
+        """
+        playlist_id = self.cache.obtener('canal', canal=canal_id)
+        if playlist_id is None:
+            respuesta = ejecutar(self.youtube.channels().list(
+                id=canal_id,
+                part='contentDetails',
+                fields='items(contentDetails/relatedPlaylists/uploads)'
+            ))
             
-            videos.append(video_data)  # Agrega a la lista
+            items = respuesta.get('items', [])
+            if not items:
+                raise ValueError(f"Canal no encontrado: {canal_id}")
+            playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
+            self.cache.guardar('canal', playlist_id, canal=canal_id)
         
-        return videos  # Retorna lista de videos
+        return playlist_id
     
-    def obtener_videos_canal(self, canal_id, max_resultados=20):
-        """Obtiene videos de un canal específico"""
+    def iterar_busqueda(self, query, orden='relevance', max_total=None, campos=None):
+        """
+        Generador de resultados de búsqueda que recorre todas las páginas
         
-        search_response = self.youtube.search().list(
-            channelId=canal_id,  # Filtrar por canal
-            part='id',
-            type='video',
-            order='date',  # Más recientes primero
-            maxResults=max_resultados
-        ).execute()
+        Sigue nextPageToken bajo demanda y precarga la página siguiente
+        (búsqueda + detalles) mientras el llamador consume la actual.
         
-        video_ids = [item['id']['videoId'] for item in search_response.get('items', [])]
+        Args:
+            query: Texto a buscar
+            orden: relevance, date, rating, title, viewCount
+            max_total: Límite de videos a entregar (None = todos los disponibles)
+            campos: Uso de CAMPOS_POR_USO o campos que lee el llamador (None = todos)
         
-        if video_ids:
-            return self.obtener_detalles_videos(video_ids)
+        Yields:
+            dict: Información completa de cada video
+        """
+        
+        def pagina(token):
+            return self.youtube.search().list(
+                q=query,
+                part='id',  # Solo se necesitan los IDs
+                fields='nextPageToken,items(id/videoId)',
+                type='video',
+                maxResults=min(TAMANO_LOTE, max_total or TAMANO_LOTE),
+                order=orden,
+                regionCode='HN',
+                pageToken=token  # None en la primera página
+            )
+        
+        return self._iterar_paginas(pagina, lambda item: item['id']['videoId'], max_total, campos=campos)
+    
+    def iterar_videos_canal(self, canal_id, max_total=None, incremental=False, campos=None):
+        """
+        Generador con todos los videos de un canal (más recientes primero)
+        
+        Recorre la playlist de subidas con playlistItems.list (1 unidad por
+        página), sin el tope de ~500 resultados de search.list.
+        
+        Args:
+            canal_id: ID del canal de YouTube
+            max_total: Límite de videos a entregar
+            incremental: Detenerse al llegar a un video ya guardado en Video
+            campos: Uso de CAMPOS_POR_USO o campos que lee el llamador (None = todos)
+        
+        Yields:
+            dict: Información completa de cada video
+        """
+        playlist_id = self.obtener_playlist_subidas(canal_id)
+        
+        def pagina(token):
+            return self.youtube.playlistItems().list(
+                playlistId=playlist_id,
+                part='contentDetails',  # Solo se necesita contentDetails.videoId
+                fields='nextPageToken,items(contentDetails/videoId)',
+                maxResults=min(TAMANO_LOTE, max_total or TAMANO_LOTE),
+                pageToken=token
+            )
+        
+        return self._iterar_paginas(
+            pagina, lambda item: item['contentDetails']['videoId'], max_total, incremental=incremental, campos=campos
+        )
+    
+    def _iterar_paginas(self, construir_peticion, extraer_id, max_total=None, incremental=False, campos=None):
+        """
+        Recorre una lista paginada de la API entregando videos uno a uno
+        
+        Args:
+            construir_peticion: Función token -> petición de la API sin ejecutar
+            extraer_id: Función item -> youtube_id
+            max_total: Límite de videos a entregar
+            incremental: Cortar en el primer video que ya existe en la tabla Video
+            campos: Campos que se piden a obtener_detalles_videos
+        """
+        
+        def cargar(token):
+            # Se ejecuta en el hilo de precarga, con su propio cliente HTTP y su propia conexión a la BD
+            try:
+                respuesta = ejecutar(construir_peticion(token))
+                video_ids = [extraer_id(item) for item in respuesta.get('items', [])]
+                siguiente_token = respuesta.get('nextPageToken')
+                
+                if incremental:
+                    nuevos = self._hasta_primer_conocido(video_ids)
+                    if len(nuevos) < len(video_ids):
+                        video_ids, siguiente_token = nuevos, None  # Lo demás ya se sincronizó
+                
+                return siguiente_token, self.obtener_detalles_videos(video_ids, campos)
+            finally:
+                connection.close()  # Django no cierra las conexiones de hilos propios
         
-        return []
\ No newline at end of file
+        pool = ThreadPoolExecutor(max_workers=1)  # Un hilo basta para adelantar una página
+        contexto = contextvars.copy_context()  # Las reservas de cuota se atribuyen al llamador
+        futuro = pool.submit(contexto.copy().run, cargar, None)
+        entregados = 0
+        try:
+            while futuro is not None:
+                siguiente_token, videos = futuro.result()
+                faltan = max_total is None or entregados + len(videos) < max_total
+                
+                # Pedir la siguiente página antes de entregar la actual
+                futuro = None
+                if siguiente_token and faltan:
+                    futuro = pool.submit(contexto.copy().run, cargar, siguiente_token)
+                
+                for video in videos:
+                    yield video
+                    entregados += 1
+                    if max_total is not None and entregados >= max_total:
+                        return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)  # Descarta la precarga si el llamador se detiene
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'videos.middleware.MetricasMiddleware',  # Primero: mide también sesión, auth y CSRF
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +88,16 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 
+# --- CACHÉ ---
+# Compartida por todos los procesos (workers web, procesar_subidas, refrescar_estadisticas): ahí viven
+# el balde de cuota de la API y los totales que invalidan las señales y la ingesta, así todos los
+# procesos gastan del mismo límite diario y una invalidación llega a todos los workers.
+# Con LocMemCache cada proceso tendría su propia copia. Por defecto en la BD: crear la tabla una vez con
+# `python manage.py createcachetable`. Con Redis: CACHE_URL=redis://localhost:6379/1
+CACHES = {
+    'default': config.cache('CACHE_URL', default='dbcache://yt_cache'),
+}
+
 # --- ARCHIVOS ESTÁTICOS ---
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -96,6 +107,93 @@ YOUTUBE_API_KEY = config('YOUTUBE_API_KEY')
 YOUTUBE_API_SERVICE_NAME = 'youtube'
 YOUTUBE_API_VERSION = 'v3'
 
+# Copia en disco del documento discovery si la librería no trae una (evita descargarlo en cada arranque)
+YOUTUBE_DISCOVERY_DIR = config('YOUTUBE_DISCOVERY_DIR', default=str(BASE_DIR / '.cache' / 'discovery'))
+
+# Caché de respuestas de la API ('memoria' por proceso o 'django' compartida)
+YOUTUBE_CACHE = {
+    'BACKEND': config('YOUTUBE_CACHE_BACKEND', default='memoria'),
+    'ALIAS': 'default',  # Alias de CACHES cuando BACKEND='django'
+    'TTL_BUSQUEDA': config.int('YOUTUBE_CACHE_TTL_BUSQUEDA', default=300),
+    'TTL_DETALLES': config.int('YOUTUBE_CACHE_TTL_DETALLES', default=86400),
+    'TTL_ESTADISTICAS': config.int('YOUTUBE_CACHE_TTL_ESTADISTICAS', default=900),
+    'TTL_CANAL': config.int('YOUTUBE_CACHE_TTL_CANAL', default=604800),
+    'MAX_ENTRADAS': config.int('YOUTUBE_CACHE_MAX_ENTRADAS', default=1000),
+}
+
+# Hilos para consultar lotes de videos.list en paralelo
+YOUTUBE_MAX_HILOS = config.int('YOUTUBE_MAX_HILOS', default=8)
+
+# Peticiones simultáneas de YouTubeServiceAsync (semáforo y tamaño del pool de conexiones)
+YOUTUBE_ASYNC_CONCURRENCIA = config.int('YOUTUBE_ASYNC_CONCURRENCIA', default=10)
+
+# Token bucket de cuota de la API compartido por todos los workers, procesar_subidas y
+# refrescar_estadisticas (una fila CuotaDiaria por día, descontada con un UPDATE atómico)
+YOUTUBE_CUOTA = {
+    'LIMITE_DIARIO': config.int('YOUTUBE_CUOTA_DIARIA', default=10000),  # Cuota asignada al proyecto
+    'RAFAGA': config.int('YOUTUBE_CUOTA_RAFAGA', default=5000),  # Unidades usables de golpe (~3 inserts)
+    'ESPERA_MAXIMA': config.float('YOUTUBE_CUOTA_ESPERA_MAXIMA', default=0),  # Segundos a esperar tokens antes de rechazar
+}
+
+# Unidades de cuota diarias para refrescar_estadisticas (1 unidad = 50 videos)
+YOUTUBE_PRESUPUESTO_ESTADISTICAS = config.int('YOUTUBE_PRESUPUESTO_ESTADISTICAS', default=2000)
+
+# Reintentos consecutivos por fragmento de subida ante errores 5xx o de conexión
+YOUTUBE_UPLOAD_REINTENTOS = config.int('YOUTUBE_UPLOAD_REINTENTOS', default=5)
+
+# Fragmentos de subida: el tamaño se adapta al throughput entre MINIMO y MAXIMO (múltiplos de 256 KiB)
+YOUTUBE_UPLOAD_FRAGMENTOS = {
+    'INICIAL': config.int('YOUTUBE_UPLOAD_FRAGMENTO_INICIAL', default=8 * 1024 * 1024),  # 8 MiB
+    'MINIMO': config.int('YOUTUBE_UPLOAD_FRAGMENTO_MINIMO', default=256 * 1024),  # 256 KiB
+    'MAXIMO': config.int('YOUTUBE_UPLOAD_FRAGMENTO_MAXIMO', default=64 * 1024 * 1024),  # 64 MiB (memoria por fragmento)
+    'SEGUNDOS_OBJETIVO': config.float('YOUTUBE_UPLOAD_SEGUNDOS_FRAGMENTO', default=5.0),
+}
+
+# Subidas: hilos de cada worker, simultáneas por usuario y en total (todos los workers y transmisiones)
+# y cuota diaria para videos.insert (1600 c/u)
+YOUTUBE_UPLOAD_HILOS = config.int('YOUTUBE_UPLOAD_HILOS', default=4)
+YOUTUBE_UPLOAD_POR_USUARIO = config.int('YOUTUBE_UPLOAD_POR_USUARIO', default=2)
+YOUTUBE_UPLOAD_MAX_GLOBAL = config.int('YOUTUBE_UPLOAD_MAX_GLOBAL', default=8)
+YOUTUBE_PRESUPUESTO_SUBIDAS = config.int('YOUTUBE_PRESUPUESTO_SUBIDAS', default=6400)
+
+# Directorio donde se reciben los videos (el handler escribe aquí directamente: sin copia extra)
+YOUTUBE_UPLOAD_DIR = config('YOUTUBE_UPLOAD_DIR', default=str(BASE_DIR / 'media' / 'subidas'))
+
+# Modo opcional: reenviar a YouTube mientras el navegador todavía está enviando el archivo
+YOUTUBE_UPLOAD_TRANSMISION = config.bool('YOUTUBE_UPLOAD_TRANSMISION', default=False)
+
+# Miniaturas en WebP redimensionadas y servidas desde disco (/miniaturas/<id>/<ancho>.webp) con LRU acotado
+YOUTUBE_MINIATURAS = {
+    'DIR': config('YOUTUBE_MINIATURAS_DIR', default=str(BASE_DIR / 'media' / 'miniaturas')),
+    'MAX_BYTES': config.int('YOUTUBE_MINIATURAS_MAX_BYTES', default=512 * 1024 * 1024),  # ~25.000 videos
+    'ANCHOS': (160, 320, 480),  # Variantes permitidas (mis_videos, grilla, grilla en pantallas densas)
+    'CALIDAD': config.int('YOUTUBE_MINIATURAS_CALIDAD', default=80),
+    'MAX_AGE': config.int('YOUTUBE_MINIATURAS_MAX_AGE', default=7 * 86400),  # Cache-Control del navegador
+    'PRECARGAR': config.bool('YOUTUBE_MINIATURAS_PRECARGAR', default=False),  # Generarlas al ingerir videos
+}
+
+# Métricas en /metricas/ (formato Prometheus): staff o 'Authorization: Bearer <token>'
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Logs estructurados (una línea JSON) de peticiones y, en DEBUG, de cada llamada a la API
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'videos.metricas_service.FormatoJSON'},
+    },
+    'handlers': {
+        'metricas': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'videos.metricas': {
+            'handlers': ['metricas'],
+            'level': config('METRICAS_LOG_NIVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # --- OAUTH ---
 GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = config('GOOGLE_CLIENT_SECRET')